@@ -11,8 +11,11 @@ https://docs.djangoproject.com/en/4.0/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -48,6 +51,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'generator.middleware.MemoryDiagnosticsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -90,9 +94,38 @@ DATABASES = {
         "PASSWORD": os.environ.get("POSTGRES_PASSWORD", "password"),
         "HOST": os.environ.get("SQL_HOST", "localhost"),
         "PORT": os.environ.get("SQL_PORT", "5432"),
+        # Keep connections open between requests instead of reconnecting every time.  This is
+        # one persistent connection per worker thread, not a pool.  Connections are checked
+        # before reuse so a restarted database doesn't cause errors.
+        "CONN_MAX_AGE": int(os.environ.get("SQL_CONN_MAX_AGE", default=60)),
+        "CONN_HEALTH_CHECKS": bool(int(os.environ.get("SQL_CONN_HEALTH_CHECKS", default=1))),
     }
 }
 
+# Optional read replica.  When SQL_REPLICA_HOST is set, the read-only share, spoiler
+# log and seed image views read from the replica (see generator/routers.py).  It uses
+# the same engine, database name, and credentials as the default database.
+if os.environ.get("SQL_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": os.environ["SQL_REPLICA_HOST"],
+        "PORT": os.environ.get("SQL_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ['generator.routers.ReplicaRouter']
+
+# SQLite connection tuning (see generator/sqlite.py).  Ignored when running on Postgres.
+# Write-ahead logging lets reads continue while a seed is being stored.  The busy timeout
+# is in milliseconds, the mmap size in bytes, and a negative cache size is in KiB.
+SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT = int(os.environ.get("SQLITE_BUSY_TIMEOUT", default=10000))
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", default=256 * 1024 * 1024))
+SQLITE_CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE", default=-64000))
+# Serialize game inserts within each worker process.
+SQLITE_WRITE_LOCK = bool(int(os.environ.get("SQLITE_WRITE_LOCK", default=1)))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
@@ -129,13 +162,172 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/4.0/howto/static-files/
 
 STATIC_URL = 'static/'
-STATIC_ROOT = BASE_DIR / "staticfiles"
+STATIC_ROOT = os.environ.get("STATIC_ROOT", BASE_DIR / "staticfiles")
+
+# Staging and production use generator.storage.CompressedManifestStaticFilesStorage,
+# which needs the static files to have been collected when the docker image was built.
+STATICFILES_STORAGE = os.environ.get("STATICFILES_STORAGE", "django.contrib.staticfiles.storage.StaticFilesStorage")
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Caches
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+#
+# The rate limit cache must be shared by every worker on the node.  The default is a
+# file based cache, which should be pointed at a tmpfs (ex: /dev/shm) in production.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "ratelimit": {
+        "BACKEND": os.environ.get("RATELIMIT_CACHE_BACKEND", "django.core.cache.backends.filebased.FileBasedCache"),
+        "LOCATION": os.environ.get("RATELIMIT_CACHE_LOCATION", os.path.join(tempfile.gettempdir(), "ctjot_ratelimit")),
+    },
+}
+
+
+# Rate limiting and admission control for the seed generation and download endpoints.
+# Rates are in requests per second, bursts are the bucket sizes.
+
+RATELIMIT_ENABLED = int(os.environ.get("RATELIMIT_ENABLED", default=1))
+RATELIMIT_CACHE = "ratelimit"
+RATELIMIT_STATE_TIMEOUT = 3600
+RATELIMIT_TRUST_X_FORWARDED_FOR = int(os.environ.get("RATELIMIT_TRUST_X_FORWARDED_FOR", default=0))
+RATELIMIT_SCOPES = {
+    "generate": {
+        "ip_rate": float(os.environ.get("RATELIMIT_GENERATE_IP_RATE", default=0.2)),
+        "ip_burst": float(os.environ.get("RATELIMIT_GENERATE_IP_BURST", default=5)),
+        "global_rate": float(os.environ.get("RATELIMIT_GENERATE_GLOBAL_RATE", default=4)),
+        "global_burst": float(os.environ.get("RATELIMIT_GENERATE_GLOBAL_BURST", default=20)),
+    },
+    "download": {
+        "ip_rate": float(os.environ.get("RATELIMIT_DOWNLOAD_IP_RATE", default=0.5)),
+        "ip_burst": float(os.environ.get("RATELIMIT_DOWNLOAD_IP_BURST", default=10)),
+        "global_rate": float(os.environ.get("RATELIMIT_DOWNLOAD_GLOBAL_RATE", default=10)),
+        "global_burst": float(os.environ.get("RATELIMIT_DOWNLOAD_GLOBAL_BURST", default=40)),
+    },
+    # Seed bundles take one token per seed, so the bursts must be at least BUNDLE_MAX_SEEDS (checked below).
+    "bundle": {
+        "ip_rate": float(os.environ.get("RATELIMIT_BUNDLE_IP_RATE", default=0.1)),
+        "ip_burst": float(os.environ.get("RATELIMIT_BUNDLE_IP_BURST", default=50)),
+        "global_rate": float(os.environ.get("RATELIMIT_BUNDLE_GLOBAL_RATE", default=1)),
+        "global_burst": float(os.environ.get("RATELIMIT_BUNDLE_GLOBAL_BURST", default=100)),
+    },
+    # The options page asks for new mystery odds at most every 200ms while a slider moves.
+    "mystery_odds": {
+        "ip_rate": float(os.environ.get("RATELIMIT_MYSTERY_ODDS_IP_RATE", default=2)),
+        "ip_burst": float(os.environ.get("RATELIMIT_MYSTERY_ODDS_IP_BURST", default=30)),
+        "global_rate": float(os.environ.get("RATELIMIT_MYSTERY_ODDS_GLOBAL_RATE", default=20)),
+        "global_burst": float(os.environ.get("RATELIMIT_MYSTERY_ODDS_GLOBAL_BURST", default=100)),
+    },
+}
+# A rate of 0 would never refill its bucket.  Set RATELIMIT_ENABLED=0 to turn rate limiting off instead.
+for _scope, _limits in RATELIMIT_SCOPES.items():
+    for _name, _value in _limits.items():
+        if _value <= 0:
+            raise ImproperlyConfigured(f'Rate limit {_scope} {_name} must be greater than 0, not {_value}.')
+
+# Clients that may read /admission/metrics/ without being logged in as staff.
+INTERNAL_IPS = os.environ.get("INTERNAL_IPS", "127.0.0.1 ::1").split(" ")
+
+# Run seed generation in a short-lived child process with a deadline (seconds) and a
+# limit on how much memory (MB) it may allocate on top of what the child starts with.
+GENERATION_SANDBOX = int(os.environ.get("GENERATION_SANDBOX", default=0))
+GENERATION_SANDBOX_TIMEOUT = int(os.environ.get("GENERATION_SANDBOX_TIMEOUT", default=60))
+GENERATION_SANDBOX_MEMORY_LIMIT = int(os.environ.get("GENERATION_SANDBOX_MEMORY_LIMIT", default=2048))
+
+# Whether the gunicorn warm-up generates a throwaway seed to load the randomizer's data
+# before the workers are forked.  This adds a full seed generation to every server start.
+WARMUP_GENERATE_SEED = bool(int(os.environ.get("WARMUP_GENERATE_SEED", default=0)))
+
+# Worker memory diagnostics (see generator/middleware.py).  When enabled, the RSS growth
+# per view is written to MEMORY_DIAGNOSTICS_DIR every MEMORY_SNAPSHOT_INTERVAL requests.
+MEMORY_DIAGNOSTICS = bool(int(os.environ.get("MEMORY_DIAGNOSTICS", default=0)))
+# Also write tracemalloc snapshot diffs.  Tracing slows the worker down a lot, so only
+# enable it while looking for a leak.
+MEMORY_TRACEMALLOC = bool(int(os.environ.get("MEMORY_TRACEMALLOC", default=0)))
+MEMORY_DIAGNOSTICS_DIR = os.environ.get("MEMORY_DIAGNOSTICS_DIR", os.path.join(tempfile.gettempdir(), "ctjot_memory"))
+MEMORY_SNAPSHOT_INTERVAL = int(os.environ.get("MEMORY_SNAPSHOT_INTERVAL", default=500))
+MEMORY_SNAPSHOT_TOP = int(os.environ.get("MEMORY_SNAPSHOT_TOP", default=25))
+MEMORY_TRACEMALLOC_FRAMES = int(os.environ.get("MEMORY_TRACEMALLOC_FRAMES", default=8))
+
+# Workers whose RSS passes this many MB after a request are shut down gracefully and
+# replaced by gunicorn.  0 disables recycling.
+MEMORY_RECYCLE_RSS = int(os.environ.get("MEMORY_RECYCLE_RSS", default=0))
+
+# Where cached generated artifacts (ROM patches, spoiler logs, etc) are stored: "local" for
+# the ARTIFACT_ROOT directory or "s3" for an S3-compatible bucket, such as MinIO, shared by
+# several web nodes.  The s3 store needs boto3.
+ARTIFACT_STORE = os.environ.get("ARTIFACT_STORE", "local")
+ARTIFACT_ROOT = os.environ.get("ARTIFACT_ROOT", BASE_DIR / "artifacts")
+ARTIFACT_S3_PREFIX = os.environ.get("ARTIFACT_S3_PREFIX", "artifacts/")
+
+# Where the vanilla inputs (ct.sfc and names.txt) are read from: "local" for the INPUT_ROOT
+# directory or "s3" for the same bucket as the artifacts.
+INPUT_STORE = os.environ.get("INPUT_STORE", "local")
+INPUT_ROOT = os.environ.get("INPUT_ROOT", BASE_DIR)
+INPUT_S3_PREFIX = os.environ.get("INPUT_S3_PREFIX", "inputs/")
+
+# S3 bucket for the s3 stores.  Leave S3_ENDPOINT_URL unset for AWS.  Credentials are read
+# by boto3 from AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY.
+S3_BUCKET = os.environ.get("S3_BUCKET", "ctjot")
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL")
+S3_REGION = os.environ.get("S3_REGION")
+
+# Number of background threads per worker used for async JSON API generation jobs.
+API_JOB_WORKERS = int(os.environ.get("API_JOB_WORKERS", default=1))
+# Jobs only live in the worker that queued them.  A job still unfinished after this many
+# seconds was lost with its worker and is reported as failed.
+API_JOB_TIMEOUT = int(os.environ.get("API_JOB_TIMEOUT", default=600))
+
+# Number of decoded settings objects cached per worker for practice seed generation.
+SETTINGS_CACHE_SIZE = int(os.environ.get("SETTINGS_CACHE_SIZE", default=256))
+
+# Practice seed pool tuning.
+PRACTICE_POOL_CLAIM_ATTEMPTS = 3
+PRACTICE_FAMILY_LIMIT = 100
+
+# Game config storage mode.  Either "full" to store the pickled config for every game,
+# or "replay" to store only the settings, seed, and nonce and rebuild configs on demand.
+# Rebuilt configs are cached per worker.  Replay mode games can only be rebuilt by the
+# randomizer version that created them, so deploy.sh stores their configs with the
+# materialize_configs command whenever a deploy changes the randomizer version.
+GAME_STORAGE_MODE = os.environ.get("GAME_STORAGE_MODE", "full")
+REPLAY_CACHE_SIZE = int(os.environ.get("REPLAY_CACHE_SIZE", default=32))
+
+# Number of parsed JSON spoiler logs and encoded spoiler log projections cached per worker.
+SPOILER_CACHE_SIZE = int(os.environ.get("SPOILER_CACHE_SIZE", default=128))
+
+# Number of sampled rolls used to estimate the mystery seed odds on the options page,
+# how many weight combinations are cached per worker, and how long browsers may cache them.
+MYSTERY_ODDS_SAMPLES = int(os.environ.get("MYSTERY_ODDS_SAMPLES", default=100000))
+MYSTERY_ODDS_CACHE_SIZE = int(os.environ.get("MYSTERY_ODDS_CACHE_SIZE", default=256))
+MYSTERY_ODDS_MAX_AGE = 86400
+
+# Seed bundles for tournaments.  ROMs in a bundle are patched by a pool of BUNDLE_WORKERS
+# processes per web worker, shared by all of its bundles.  BUNDLE_MAX_SEEDS limits the
+# seeds per bundle.
+BUNDLE_WORKERS = int(os.environ.get("BUNDLE_WORKERS", default=2))
+BUNDLE_MAX_SEEDS = int(os.environ.get("BUNDLE_MAX_SEEDS", default=50))
+# Bundles take one rate limit token per seed, so a bundle bigger than a bucket could never be admitted.
+for _name in ('ip_burst', 'global_burst'):
+    if RATELIMIT_SCOPES['bundle'][_name] < BUNDLE_MAX_SEEDS:
+        raise ImproperlyConfigured(f'Rate limit bundle {_name} must be at least BUNDLE_MAX_SEEDS ({BUNDLE_MAX_SEEDS}).')
+BUNDLE_COMPRESS_LEVEL = int(os.environ.get("BUNDLE_COMPRESS_LEVEL", default=6))
+
+# Game retention.  Games older than ARCHIVE_AFTER_DAYS that have not been accessed in
+# ARCHIVE_IDLE_DAYS are moved to the archive table by the archive_games command.
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", default=90))
+ARCHIVE_IDLE_DAYS = int(os.environ.get("ARCHIVE_IDLE_DAYS", default=30))
+
+# Share link access times are buffered and written in batches.
+ACCESS_LOG_FLUSH_SIZE = 100
+ACCESS_LOG_FLUSH_INTERVAL = 60
+
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_METHODS = ["GET", "OPTIONS"]
 CORS_URLS_REGEX = r"^/spoiler_log/.*\.json$"
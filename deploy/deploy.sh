@@ -70,6 +70,41 @@ migrate_dokuwiki_data() {
   sudo chown -R 1000:911 deploy/wiki_config/dokuwiki/lib/
 }
 
+#
+# Store the configs of games that were saved in replay mode before the randomizer
+# version changes.  Replay mode games can only be rebuilt by the randomizer version
+# that created them, so this runs in the old web container, after the new image is
+# built but before it replaces the old container.  Nothing is stored if the new
+# image has the same randomizer version.
+#
+# Prerequisite:
+#     deploy/docker-compose.yml points at the deployment being replaced.
+#
+materialize_replay_configs() {
+
+  # Nothing to do on the first deployment
+  if [[ ! -e deploy/docker-compose.yml ]] || \
+     [[ -z $(docker-compose -f deploy/docker-compose.yml ps -q web-generator) ]]; then
+    return
+  fi
+
+  echo "Storing replay mode configs..."
+  new_version=$(docker-compose -f deploy/docker-compose.yml run --rm --no-deps -T --entrypoint python \
+    web-generator manage.py materialize_configs --print-version | tail -n 1 | tr -d '\r')
+  if [[ -z $new_version ]]; then
+    echo "Could not get the randomizer version of the new image."
+    exit 1
+  fi
+
+  # The old container may be stopped, so start it if needed.
+  docker-compose -f deploy/docker-compose.yml start db web-generator
+  if ! docker-compose -f deploy/docker-compose.yml exec -T web-generator \
+       python manage.py materialize_configs --unless-version "$new_version"; then
+    echo "Storing replay mode configs failed.  The old deployment is still running."
+    exit 1
+  fi
+}
+
 #
 # Deploy the web generator in a production environment.
 #
@@ -102,10 +137,14 @@ deploy_production() {
   # Create volume directories needed by the containers
   mkdir deploy/wiki_config
 
+  # Build the new images first so replay mode configs can be stored by the old
+  # container before it is replaced.
+  docker-compose -f deploy/docker-compose.prod.yml build
+  materialize_replay_configs
+
   ln -sf $PWD/deploy/docker-compose.prod.yml $PWD/deploy/docker-compose.yml
 
-  # Build and run the containers
-  docker-compose -f deploy/docker-compose.yml build
+  # Run the containers
   docker-compose -f deploy/docker-compose.yml up -d
 }
 
@@ -123,10 +162,14 @@ deploy_staging() {
   # Create volume directories needed by the containers
   mkdir deploy/wiki_config
 
+  # Build the new images first so replay mode configs can be stored by the old
+  # container before it is replaced.
+  docker-compose -f deploy/docker-compose.staging.yml build
+  materialize_replay_configs
+
   ln -sf $PWD/deploy/docker-compose.staging.yml $PWD/deploy/docker-compose.yml
 
-  # Build and run the containers
-  docker-compose -f deploy/docker-compose.yml build
+  # Run the containers
   docker-compose -f deploy/docker-compose.yml up -d
 }
 
@@ -138,10 +181,14 @@ deploy_staging() {
 #
 deploy_dev() {
 
+  # Build the new images first so replay mode configs can be stored by the old
+  # container before it is replaced.
+  docker-compose -f deploy/docker-compose.dev.yml build
+  materialize_replay_configs
+
   ln -sf $PWD/deploy/docker-compose.dev.yml $PWD/deploy/docker-compose.yml
 
-  # Build and run the containers
-  docker-compose -f deploy/docker-compose.yml build
+  # Run the containers
   docker-compose -f deploy/docker-compose.yml up -d
 }
 
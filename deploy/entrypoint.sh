@@ -1,18 +1,29 @@
 #!/bin/sh
 
+# Wait for the database, giving up after DB_WAIT_TIMEOUT seconds so that a database
+# that never comes up fails the container instead of hanging it.
 if [ "$DATABASE" = "postgres" ]
 then
     echo "Waiting for postgres..."
+    python manage.py wait_for_db --timeout "${DB_WAIT_TIMEOUT:-60}" || exit 1
+fi
 
-    while ! nc -z $SQL_HOST $SQL_PORT; do
-      sleep 0.1
-    done
-
-    echo "PostgreSQL started"
+# Apply migrations only if there are unapplied ones.  Set MIGRATE_ON_START=0 to run
+# them as a separate step instead:
+#   docker-compose -f deploy/docker-compose.yml run --rm web-generator python manage.py migrate
+if [ "${MIGRATE_ON_START:-1}" = "1" ] && ! python manage.py migrate --check > /dev/null 2>&1
+then
+    python manage.py migrate --no-input
 fi
 
-python manage.py migrate
-python manage.py collectstatic --no-input --clear
+# Static files are collected when the image is built.  Copy them into the static
+# volume only if they changed since the last copy.  Old hashed files are left in
+# place so that pages already open in a browser keep working during a deploy.
+if [ -f static_build/staticfiles.json ] && ! cmp -s static_build/staticfiles.json staticfiles/.copied_manifest.json
+then
+    echo "Updating static files..."
+    cp -R static_build/. staticfiles/ && cp static_build/staticfiles.json staticfiles/.copied_manifest.json
+fi
 
 exec "$@"
 
@@ -0,0 +1,61 @@
+#
+# Gunicorn configuration for the web generator.
+#
+# The app is loaded and warmed up once in the master process, then the workers are
+# forked from it.  The randomizer modules, vanilla ROM, and randomizer data are shared
+# between the workers copy-on-write instead of being loaded by each worker on its
+# first requests.  Warm status and per-worker memory are reported at /ready/.
+#
+# Usage: gunicorn ctjot.wsgi:application --config deploy/gunicorn.conf.py
+#
+
+import gc
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 3))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+preload_app = True
+
+
+def on_starting(server):
+    # With preload_app the Django app has already been loaded at this point.
+    from django.db import connections
+    from generator.views import fail_orphaned_jobs
+    from generator.warmup import warm_up
+
+    state = warm_up()
+    if state['warm']:
+        server.log.info('Warm-up finished in %ss: %s', state['warmup_seconds'], state['steps'])
+    else:
+        server.log.error(state['error'])
+
+    # No worker is running yet, so async jobs left unfinished by the previous server
+    # can never finish.
+    failed = fail_orphaned_jobs()
+    if failed:
+        server.log.warning('Marked %d unfinished async jobs from the previous server as failed', failed)
+
+    # Don't share database connections opened during warm-up with the workers.
+    connections.close_all()
+
+    # Move everything loaded so far out of the garbage collector's view so that
+    # collections in the workers don't touch (and un-share) those pages.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from django.conf import settings
+    from generator.sandbox import start_sandbox_server
+    from generator.warmup import mark_worker_started
+    mark_worker_started()
+
+    # Start the worker's sandbox forkserver now so the first seed doesn't wait for it.
+    if settings.GENERATION_SANDBOX:
+        start_sandbox_server()
+
+
+def worker_exit(server, worker):
+    # Write the share link access times buffered by this worker.
+    from generator.archive import access_log
+    access_log.flush()
@@ -1,3 +1,37 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import BossPlacement, CharacterPlacement, KeyItemPlacement
+
+
+class PlacementAdmin(admin.ModelAdmin):
+    """
+    Read-only view of the placement index.  Search by share ID, location, or placed value
+    to find non-race seeds with a placement.
+    """
+    date_hierarchy = 'creation_date'
+    ordering = ['-creation_date']
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(KeyItemPlacement)
+class KeyItemPlacementAdmin(PlacementAdmin):
+    list_display = ['share_id', 'location', 'key_item', 'creation_date']
+    search_fields = ['share_id', 'location', 'key_item']
+
+
+@admin.register(CharacterPlacement)
+class CharacterPlacementAdmin(PlacementAdmin):
+    list_display = ['share_id', 'location', 'character', 'creation_date']
+    search_fields = ['share_id', 'location', 'character']
+
+
+@admin.register(BossPlacement)
+class BossPlacementAdmin(PlacementAdmin):
+    list_display = ['share_id', 'location', 'boss', 'creation_date']
+    search_fields = ['share_id', 'location', 'boss']
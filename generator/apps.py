@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.core.signals import request_finished
+from django.db.backends.signals import connection_created
 
 
 class GeneratorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'generator'
+
+    def ready(self):
+        from .archive import flush_access_log
+        from .sqlite import configure_sqlite_connection
+        connection_created.connect(configure_sqlite_connection, dispatch_uid='generator_sqlite_pragmas')
+        request_finished.connect(flush_access_log, dispatch_uid='generator_access_log')
@@ -0,0 +1,204 @@
+# Django libraries
+from django.conf import settings as conf
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from .models import ArchivedGame, Blob, Game
+from .placements import placement_categories
+from .routers import get_read_alias
+
+# Python standard libraries
+import datetime
+import lzma
+import os
+import pickle
+import threading
+import time
+
+
+#
+# Retention and archival of old games.
+#
+# Games that are older than the retention period and have not been accessed
+# recently are moved into the ArchivedGame table by the archive_games command.
+# Lookups through get_game fall back to the archive transparently.
+#
+
+
+class AccessLog:
+    """
+    Buffer of recently accessed share IDs.
+
+    Access times are only needed at day granularity for archiving decisions, so
+    rather than writing to the database on every page view, accesses are collected
+    in memory and written with a single UPDATE once the buffer is full or the flush
+    interval has passed.  The buffer is checked when a request finishes.
+
+    Processes forked from the one that owns the buffer, like gunicorn workers and
+    sandboxed generation processes, start with an empty buffer so that the same
+    accesses are never written by more than one process.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        Drop the buffered share IDs.  This is run in the child after a fork.
+        """
+        self.lock = threading.Lock()
+        self.share_ids = set()
+        self.last_flush = time.monotonic()
+
+    def record(self, share_id: str):
+        """
+        Record an access to the given share ID.
+
+        :param share_id: Share ID of the game that was accessed
+        """
+        with self.lock:
+            self.share_ids.add(share_id)
+
+    def flush_if_due(self):
+        """
+        Write the buffered access times to the database if the buffer is full or the
+        flush interval has passed.
+        """
+        with self.lock:
+            due = len(self.share_ids) >= conf.ACCESS_LOG_FLUSH_SIZE or \
+                (self.share_ids and time.monotonic() - self.last_flush >= conf.ACCESS_LOG_FLUSH_INTERVAL)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered access times to the database.
+        """
+        with self.lock:
+            share_ids = self.share_ids
+            self.share_ids = set()
+            self.last_flush = time.monotonic()
+        if share_ids:
+            Game.objects.filter(share_id__in=share_ids).update(last_access=timezone.now())
+
+
+access_log = AccessLog()
+os.register_at_fork(after_in_child=access_log.reset)
+
+
+def flush_access_log(sender, **kwargs):
+    """
+    Receiver for the request_finished signal that flushes the access log when it is due.
+    """
+    access_log.flush_if_due()
+
+
+def pack_game(game: Game) -> bytes:
+    """
+    Compress a game's settings and configuration blobs for the archive.
+
+    :param game: Game object to pack
+    :return: Compressed archive data
+    """
+    return lzma.compress(pickle.dumps((game.get_settings_data(), game.get_configuration_data())))
+
+
+def unpack_game(archived_game: ArchivedGame) -> Game:
+    """
+    Rebuild a Game object from an archived game.  The returned object is not saved.
+
+    :param archived_game: ArchivedGame object to unpack
+    :return: Game object with the archived data
+    """
+    settings, configuration = pickle.loads(lzma.decompress(archived_game.data))
+    return Game(share_id=archived_game.share_id,
+                race_seed=archived_game.race_seed,
+                seed_nonce=archived_game.seed_nonce,
+                parent_share_id=archived_game.parent_share_id,
+                creation_date=archived_game.creation_date,
+                last_access=archived_game.last_access,
+                randomizer_version=archived_game.randomizer_version,
+                settings=settings,
+                configuration=configuration)
+
+
+def get_game(share_id: str) -> Game:
+    """
+    Get the game with the given share ID from either the Game table or the archive.
+
+    Raises Game.DoesNotExist if the share ID is in neither.
+
+    :param share_id: Share ID of the game
+    :return: Game object for the share ID
+    """
+    games = Game.objects.select_related('settings_blob', 'configuration_blob')
+    game = games.filter(share_id=share_id).first()
+
+    # A game that was just generated may not have reached a read replica yet.
+    if game is None and get_read_alias() != DEFAULT_DB_ALIAS:
+        game = games.using(DEFAULT_DB_ALIAS).filter(share_id=share_id).first()
+
+    if game is None:
+        try:
+            game = unpack_game(ArchivedGame.objects.get(share_id=share_id))
+        except ArchivedGame.DoesNotExist:
+            raise Game.DoesNotExist()
+
+    access_log.record(share_id)
+    return game
+
+
+def archive_games(age_days: int, idle_days: int, batch_size: int) -> int:
+    """
+    Move old games that have not been accessed recently into the archive.
+
+    Pooled practice seeds are never archived.  A game whose share ID is already in the
+    archive is left in the Game table rather than being deleted without a copy.  Archived
+    games are removed from the placement index.
+
+    :param age_days: Minimum age in days of a game to archive
+    :param idle_days: Minimum number of days since the game was last accessed
+    :param batch_size: Number of games to move per transaction
+    :return: Number of games archived
+    """
+    access_log.flush()
+    now = timezone.now()
+    candidates = Game.objects.filter(
+        creation_date__lt=now - datetime.timedelta(days=age_days),
+        pooled=False
+    ).exclude(
+        last_access__gte=now - datetime.timedelta(days=idle_days)
+    ).select_related('settings_blob', 'configuration_blob').order_by('id')
+
+    archived = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            batch = list(candidates.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            archived_ids = set(ArchivedGame.objects.filter(
+                share_id__in=[game.share_id for game in batch]).values_list('share_id', flat=True))
+            batch = [game for game in batch if game.share_id not in archived_ids]
+            ArchivedGame.objects.bulk_create([
+                ArchivedGame(share_id=game.share_id,
+                             race_seed=game.race_seed,
+                             seed_nonce=game.seed_nonce,
+                             parent_share_id=game.parent_share_id,
+                             creation_date=game.creation_date,
+                             last_access=game.last_access,
+                             randomizer_version=game.randomizer_version,
+                             data=pack_game(game))
+                for game in batch
+            ])
+            Game.objects.filter(id__in=[game.id for game in batch]).delete()
+            for model, _, _ in placement_categories.values():
+                model.objects.filter(share_id__in=[game.share_id for game in batch]).delete()
+        archived += len(batch)
+
+    # Remove any blobs that are no longer shared by a game.  Recent blobs are kept
+    # since a game that is being created right now may not reference its blobs yet.
+    if archived:
+        Blob.objects.filter(settings_games=None, configuration_games=None,
+                            creation_date__lt=now - datetime.timedelta(days=1)).delete()
+    return archived
@@ -0,0 +1,242 @@
+# Django libraries
+from django.conf import settings as conf
+from django.core.exceptions import ImproperlyConfigured
+
+# Python standard libraries
+import functools
+import io
+import os
+import pathlib
+import tempfile
+
+# Other libraries
+import boto3
+from botocore.exceptions import ClientError
+
+
+#
+# Cache of generated artifacts (ROM patches, spoiler logs, etc) and the vanilla inputs
+# (ct.sfc, names.txt) that seeds are generated from.
+#
+# Artifacts are immutable once written and are addressed by a relative key such as
+# "seeds/<share_id>/base.patch".  Both kinds of files live in a store, which is either
+# a local directory or a bucket on an S3-compatible service such as MinIO.  Several web
+# nodes that point at the same bucket share one cache of artifacts.
+#
+# Local writes go through a temporary file and a rename so that concurrent readers never
+# see a partial artifact.  S3 writes are atomic on their own.
+#
+
+# S3 error codes for an object that does not exist.
+S3_MISSING_CODES = ('NoSuchKey', '404')
+
+
+class ArtifactReader(io.BufferedReader):
+    """
+    Buffered binary file object for reading a stored file, with the file's size.
+    """
+    def __init__(self, raw: io.RawIOBase, size: int):
+        super().__init__(raw)
+        self.size = size
+
+
+class _S3Body(io.RawIOBase):
+    """
+    Raw stream over the body of an S3 object.
+    """
+    def __init__(self, body):
+        super().__init__()
+        self.body = body
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self.body.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.body.close()
+        super().close()
+
+
+class LocalStore:
+    """
+    Store files in a directory on the local filesystem.
+    """
+    def __init__(self, root):
+        self.root = pathlib.Path(root).resolve()
+
+    def _get_path(self, key: str) -> pathlib.Path:
+        path = (self.root / key).resolve()
+        if self.root not in path.parents:
+            raise ValueError('Invalid artifact key: ' + key)
+        return path
+
+    def get(self, key: str) -> bytes | None:
+        try:
+            return self._get_path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def open(self, key: str) -> ArtifactReader | None:
+        try:
+            raw = io.FileIO(self._get_path(key), 'rb')
+        except FileNotFoundError:
+            return None
+        return ArtifactReader(raw, os.fstat(raw.fileno()).st_size)
+
+    def exists(self, key: str) -> bool:
+        return self._get_path(key).is_file()
+
+    def put(self, key: str, data: bytes):
+        path = self._get_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+class S3Store:
+    """
+    Store files under a prefix in an S3 bucket.
+
+    Credentials are found by boto3 in the usual places, such as the AWS_ACCESS_KEY_ID and
+    AWS_SECRET_ACCESS_KEY environment variables.
+    """
+    def __init__(self, bucket: str, prefix: str, endpoint_url: str | None = None, region: str | None = None):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region)
+
+    def _get_name(self, key: str) -> str:
+        if key.startswith('/') or '..' in key.split('/'):
+            raise ValueError('Invalid artifact key: ' + key)
+        return self.prefix + key
+
+    def _get_object(self, key: str) -> dict | None:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._get_name(key))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in S3_MISSING_CODES:
+                return None
+            raise
+
+    def get(self, key: str) -> bytes | None:
+        s3_object = self._get_object(key)
+        if s3_object is None:
+            return None
+        with s3_object['Body'] as body:
+            return body.read()
+
+    def open(self, key: str) -> ArtifactReader | None:
+        s3_object = self._get_object(key)
+        if s3_object is None:
+            return None
+        return ArtifactReader(_S3Body(s3_object['Body']), s3_object['ContentLength'])
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._get_name(key))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in S3_MISSING_CODES:
+                return False
+            raise
+        return True
+
+    def put(self, key: str, data: bytes):
+        self.client.put_object(Bucket=self.bucket, Key=self._get_name(key), Body=data)
+
+
+@functools.cache
+def _get_store(backend: str, root: str, prefix: str) -> LocalStore | S3Store:
+    """
+    Get a store, creating it once per process.
+
+    Stores are cached by their settings so that tests can override them.
+
+    :param backend: "local" or "s3"
+    :param root: Directory of the local store
+    :param prefix: Prefix of the object names in the S3 bucket
+    :return: Store object
+    """
+    if backend == 'local':
+        return LocalStore(root)
+    if backend == 's3':
+        return S3Store(conf.S3_BUCKET, prefix, conf.S3_ENDPOINT_URL, conf.S3_REGION)
+    raise ImproperlyConfigured(f'Unknown store "{backend}".  Must be "local" or "s3".')
+
+
+# S3 clients keep a pool of open connections that must not be shared with forked
+# processes, such as gunicorn workers forked from the preloaded master.
+os.register_at_fork(after_in_child=_get_store.cache_clear)
+
+
+def get_artifact_store() -> LocalStore | S3Store:
+    """
+    Get the store for generated artifacts.
+
+    :return: Store set by ARTIFACT_STORE
+    """
+    return _get_store(conf.ARTIFACT_STORE, str(conf.ARTIFACT_ROOT), conf.ARTIFACT_S3_PREFIX)
+
+
+def get_input_store() -> LocalStore | S3Store:
+    """
+    Get the store for the vanilla inputs.
+
+    :return: Store set by INPUT_STORE
+    """
+    return _get_store(conf.INPUT_STORE, str(conf.INPUT_ROOT), conf.INPUT_S3_PREFIX)
+
+
+def get_artifact(key: str) -> bytes | None:
+    """
+    Read an artifact from the cache.
+
+    :param key: Artifact key
+    :return: Artifact data, or None if it is not cached
+    """
+    return get_artifact_store().get(key)
+
+
+def open_artifact(key: str) -> ArtifactReader | None:
+    """
+    Open an artifact for streaming.  The caller is responsible for closing the file.
+
+    :param key: Artifact key
+    :return: Binary file object for the artifact, or None if it is not cached
+    """
+    return get_artifact_store().open(key)
+
+
+def put_artifact(key: str, data: bytes):
+    """
+    Write an artifact to the cache.
+
+    :param key: Artifact key
+    :param data: Artifact data
+    """
+    get_artifact_store().put(key, data)
+
+
+def get_input(name: str) -> bytes:
+    """
+    Read a vanilla input file, such as ct.sfc.
+
+    Raises FileNotFoundError if the file is not in the input store.
+
+    :param name: File name
+    :return: File data
+    """
+    data = get_input_store().get(name)
+    if data is None:
+        raise FileNotFoundError(f'{name} is not in the input store.')
+    return data
@@ -0,0 +1,184 @@
+# Django libraries
+from django.conf import settings as conf
+
+from .artifacts import get_artifact
+from .forms import RomForm
+from .models import Game
+from .sandbox import get_context
+from .spoilers import build_spoiler_log, get_spoiler_log_key
+
+# Python standard libraries
+from concurrent.futures import ProcessPoolExecutor
+import functools
+import io
+import os
+import zipfile
+
+
+#
+# Seed bundles.
+#
+# A bundle is a ZIP file with the patched ROM, spoiler logs, and seed image of several
+# seeds, for tournament organizers who need many seeds at once.  The ZIP is written as
+# it is streamed to the client, one file at a time, so it is never held in memory.
+#
+# ROMs are patched by a small pool of processes started from each web worker's sandbox
+# forkserver (see sandbox.py), shared by all of the worker's bundles, so that seeds that don't have a cached base image yet are
+# generated in parallel.  At most a few patched ROMs are held in memory waiting for their
+# turn in the stream.
+#
+
+BUNDLE_CHUNK_SIZE = 64 * 1024
+
+
+class ZipStream(io.RawIOBase):
+    """
+    Write-only stream that collects what zipfile writes to it until it is read out.
+
+    zipfile falls back to writing data descriptors when its output is not seekable,
+    so the archive can be streamed without knowing file sizes up front.
+    """
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def read_out(self) -> bytes:
+        """
+        Get everything written since the last call.
+
+        :return: Data written to the stream
+        """
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+@functools.cache
+def _get_bundle_executor() -> ProcessPoolExecutor:
+    """
+    Get the pool of processes that patch bundle ROMs.
+
+    The pool is created on first use in each web worker, so it is never forked from the
+    gunicorn master, and it is shared by every bundle the worker streams.
+
+    :return: ProcessPoolExecutor with BUNDLE_WORKERS processes
+    """
+    # The pool processes come from the single-threaded forkserver, so they don't inherit
+    # the web worker's threads, locks, or database connections.
+    return ProcessPoolExecutor(max_workers=conf.BUNDLE_WORKERS, mp_context=get_context())
+
+
+# A pool inherited through a fork belongs to the parent process.
+os.register_at_fork(after_in_child=_get_bundle_executor.cache_clear)
+
+
+def _detach_game(game: Game) -> Game:
+    """
+    Copy the data a pool process needs from a game into an unsaved Game object.
+
+    Binary fields read from Postgres are memoryviews, which can't be pickled.
+
+    :param game: Game object, with its settings and configuration blobs already loaded
+    :return: Unsaved Game object with the settings and configuration stored inline
+    """
+    return Game(share_id=game.share_id, settings=game.get_settings_data(),
+                configuration=game.get_configuration_data(), race_seed=game.race_seed,
+                seed_nonce=game.seed_nonce, randomizer_version=game.randomizer_version)
+
+
+def _patch_bundle_rom(game: Game, cosmetics: dict, rom_bytes: bytearray) -> tuple[bytes, str]:
+    # Imported here since the views module imports this one.
+    from .views import get_patched_rom
+    # Only the form's cleaned data is used.  The uploaded ROM in the form can't be pickled.
+    form = RomForm()
+    form.cleaned_data = cosmetics
+    patched_rom, file_name = get_patched_rom(game, form, rom_bytes)
+    return bytes(patched_rom), file_name
+
+
+def _patched_roms(games: list[Game], form: RomForm, rom_bytes: bytearray):
+    """
+    Patch the ROM of each game in the worker's bundle pool.
+
+    :param games: Game objects, with their settings and configuration blobs already loaded
+    :param form: RomForm with the user's cosmetic settings
+    :param rom_bytes: Validated vanilla ROM data from the user
+    :return: Generator of (game, ROM data, file name) tuples, in the same order as the games
+    """
+    executor = _get_bundle_executor()
+    cosmetics = {field: value for field, value in form.cleaned_data.items() if field != 'rom_file'}
+    futures = {}
+    next_index = 0
+    try:
+        for index, game in enumerate(games):
+            # Keep the pool busy without piling up ROMs that can't be streamed yet.
+            while next_index < len(games) and next_index < index + conf.BUNDLE_WORKERS * 2:
+                futures[next_index] = executor.submit(_patch_bundle_rom, _detach_game(games[next_index]),
+                                                         cosmetics, rom_bytes)
+                next_index += 1
+            patched_rom, file_name = futures.pop(index).result()
+            yield game, patched_rom, file_name
+    finally:
+        # Don't patch the rest of the ROMs if the client went away or a ROM failed.
+        for future in futures.values():
+            future.cancel()
+
+
+def _get_spoiler_log(game: Game, log_format: str) -> bytes:
+    # build_spoiler_log writes the log and its compressed copies to the artifact store,
+    # the same as when it is built for a spoiler log download.
+    data = get_artifact(get_spoiler_log_key(game.share_id, log_format))
+    if data is None:
+        data = build_spoiler_log(game, log_format)
+    return data
+
+
+def _write_file(archive: zipfile.ZipFile, stream: ZipStream, name: str, data: bytes,
+                compress_type: int = zipfile.ZIP_DEFLATED):
+    """
+    Add a file to a streamed archive, yielding the archive data as it is written.
+    """
+    info = zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+    info.compress_type = compress_type
+    with archive.open(info, 'w') as entry:
+        for offset in range(0, len(data), BUNDLE_CHUNK_SIZE):
+            entry.write(data[offset:offset + BUNDLE_CHUNK_SIZE])
+            yield stream.read_out()
+    yield stream.read_out()
+
+
+def stream_bundle(games: list[Game], form: RomForm, rom_bytes: bytearray, get_seed_image):
+    """
+    Stream a ZIP archive with the patched ROM, spoiler logs (for non-race seeds), and
+    seed image of each game.
+
+    Files are placed in a directory named after each seed's share ID.  Exceptions raised
+    while a ROM is patched end the stream, leaving the client with a truncated archive.
+
+    :param games: Game objects, with their settings and configuration blobs already loaded
+    :param form: RomForm with the user's cosmetic settings
+    :param rom_bytes: Validated vanilla ROM data from the user
+    :param get_seed_image: Function that returns the PNG seed image for a share ID
+    :return: Generator of ZIP archive data
+    """
+    stream = ZipStream()
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED,
+                         compresslevel=conf.BUNDLE_COMPRESS_LEVEL) as archive:
+        for game, patched_rom, file_name in _patched_roms(games, form, rom_bytes):
+            directory = game.share_id + '/'
+            yield from _write_file(archive, stream, directory + file_name, patched_rom)
+            if not game.race_seed:
+                for log_format in ('txt', 'json'):
+                    yield from _write_file(archive, stream, f'{directory}spoiler_log_{game.share_id}.{log_format}',
+                                           _get_spoiler_log(game, log_format))
+            # PNG data is already compressed.
+            yield from _write_file(archive, stream, f'{directory}{game.share_id}.png', get_seed_image(game.share_id),
+                                   zipfile.ZIP_STORED)
+    yield stream.read_out()
@@ -0,0 +1,93 @@
+# Django libraries
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import patch_vary_headers
+
+# Python standard libraries
+import gzip
+
+# Other libraries
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+#
+# Content negotiation for precompressed responses.
+#
+# Responses that are the same for every request (spoiler logs, the options page) are
+# compressed once and the stored variant matching the client's Accept-Encoding is sent.
+#
+
+# Content encoding to artifact key suffix and compression function, in order of preference.
+content_encodings = {
+    'gzip': ('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))
+}
+if brotli is not None:
+    content_encodings = {'br': ('.br', brotli.compress), **content_encodings}
+
+
+def parse_quality_header(value: str) -> dict[str, float]:
+    """
+    Parse a header with quality values, such as Accept or Accept-Encoding.
+
+    :param value: Header value
+    :return: Dictionary of lowercase header item to its quality value
+    """
+    accepted = {}
+    for item in value.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            param = param.strip()
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        accepted[name.strip().lower()] = quality
+    return accepted
+
+
+def get_accepted_encoding(request: HttpRequest) -> str | None:
+    """
+    Pick the preferred content encoding accepted by the client.
+
+    :param request: Request with an optional Accept-Encoding header
+    :return: Content encoding to use, or None to send uncompressed data
+    """
+    accepted = parse_quality_header(request.headers.get('Accept-Encoding', ''))
+    for encoding in content_encodings:
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def compress_variants(data: bytes) -> dict[str | None, bytes]:
+    """
+    Compress data with every supported content encoding.
+
+    :param data: Uncompressed data
+    :return: Dictionary of content encoding to compressed data.  The None key holds the uncompressed data.
+    """
+    variants = {encoding: compress(data) for encoding, (suffix, compress) in content_encodings.items()}
+    variants[None] = data
+    return variants
+
+
+def precompressed_response(request: HttpRequest, variants: dict[str | None, bytes],
+                           content_type: str) -> HttpResponse:
+    """
+    Respond with the precompressed variant that best matches the client's Accept-Encoding.
+
+    :param request: Request being served
+    :param variants: Dictionary from compress_variants
+    :param content_type: Content type of the uncompressed data
+    :return: HttpResponse with the selected variant
+    """
+    encoding = get_accepted_encoding(request)
+    response = HttpResponse(variants[encoding], content_type=content_type)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
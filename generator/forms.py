@@ -1,4 +1,5 @@
 from django import forms
+from django.conf import settings as conf
 
 
 #
@@ -39,6 +40,23 @@ class RomForm(forms.Form):
     battle_gauge_style = forms.IntegerField(required=False)
 
 
+#
+# Form for downloading a bundle of several seeds with the same cosmetic settings.
+# Share IDs are separated by whitespace or commas.
+#
+class BundleForm(RomForm):
+    share_id = None
+    share_ids = forms.CharField(widget=forms.Textarea(), required=True)
+
+    def clean_share_ids(self):
+        share_ids = list(dict.fromkeys(self.cleaned_data['share_ids'].replace(',', ' ').split()))
+        if not share_ids:
+            raise forms.ValidationError('Enter at least one share ID.')
+        if len(share_ids) > conf.BUNDLE_MAX_SEEDS:
+            raise forms.ValidationError(f'A bundle can have at most {conf.BUNDLE_MAX_SEEDS} seeds.')
+        return share_ids
+
+
 #
 # Form class for version 3.2.0 of the randomizer.
 #
@@ -133,3 +151,18 @@ class GenerateForm(forms.Form):
     mystery_epoch_fail = forms.IntegerField()
     mystery_gear_rando = forms.IntegerField()
     mystery_heal_rando = forms.IntegerField()
+
+    def clean(self):
+        """
+        Reject setting combinations the randomizer can't generate before any
+        randomizer work is done.
+        """
+        # Imported here since the validation rules depend on the randomizer
+        # interface, which in turn imports this module.
+        from .validation import validate_settings_data
+
+        cleaned_data = super().clean()
+        for field, messages in validate_settings_data(cleaned_data).items():
+            for message in messages:
+                self.add_error(field, message)
+        return cleaned_data
@@ -0,0 +1,25 @@
+from django.conf import settings as conf
+from django.core.management.base import BaseCommand
+
+from generator.archive import archive_games
+
+
+class Command(BaseCommand):
+    """
+    Move old, idle games out of the Game table and into the compressed archive table.
+
+    This is meant to be run on a schedule (ex: nightly from cron).  Archived games are
+    still available through their share links.
+    """
+    help = 'Archive games older than the retention period that have not been accessed recently.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=conf.ARCHIVE_AFTER_DAYS,
+                            help='Minimum age in days of a game to archive')
+        parser.add_argument('--idle-days', type=int, default=conf.ARCHIVE_IDLE_DAYS,
+                            help='Minimum number of days since the game was last accessed')
+        parser.add_argument('--batch-size', type=int, default=500, help='Number of games to move per transaction')
+
+    def handle(self, *args, **options):
+        archived = archive_games(options['days'], options['idle_days'], options['batch_size'])
+        self.stdout.write(f'Archived {archived} games')
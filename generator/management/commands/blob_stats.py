@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+
+from generator.models import Blob, Game
+
+
+class Command(BaseCommand):
+    """
+    Report how well the content-addressed blob table is deduplicating game data.
+    """
+    help = 'Report the dedupe ratio of stored settings and configuration blobs.'
+
+    def handle(self, *args, **options):
+        stored = Blob.objects.aggregate(count=Count('digest'), size=Sum('size'))
+        settings = Game.objects.aggregate(count=Count('settings_blob'), size=Sum('settings_blob__size'))
+        configs = Game.objects.aggregate(count=Count('configuration_blob'), size=Sum('configuration_blob__size'))
+        inline = Game.objects.filter(settings__isnull=False).count()
+
+        referenced_count = settings['count'] + configs['count']
+        referenced_size = (settings['size'] or 0) + (configs['size'] or 0)
+        stored_size = stored['size'] or 0
+
+        self.stdout.write(f'Blobs stored:      {stored["count"]} ({stored_size} bytes)')
+        self.stdout.write(f'Blob references:   {referenced_count} ({referenced_size} bytes)')
+        if stored['count']:
+            self.stdout.write(f'Dedupe ratio:      {referenced_count / stored["count"]:.2f}x by count, '
+                              f'{referenced_size / max(stored_size, 1):.2f}x by size')
+            self.stdout.write(f'Bytes saved:       {referenced_size - stored_size}')
+        if inline:
+            self.stdout.write(f'Games not yet backfilled: {inline}')
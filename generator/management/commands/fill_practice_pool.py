@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from generator.models import Game
+from generator.randomizerinterface import InvalidSettingsException
+from generator.views import InvalidGameIdException, generate_seed_from_id
+
+
+class Command(BaseCommand):
+    """
+    Pre-generate practice seeds for popular share IDs ahead of time (ex: before a race).
+
+    Practice seed requests for these share IDs are served from the pool until it is empty
+    and then fall back to generating a new seed on demand.
+    """
+    help = 'Pre-generate a pool of practice seeds for the given share IDs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('share_ids', nargs='+', type=str, help='Share IDs of the parent seeds')
+        parser.add_argument('--size', type=int, default=10, help='Number of unclaimed practice seeds to keep per share ID')
+
+    def handle(self, *args, **options):
+        for share_id in options['share_ids']:
+            pooled_count = Game.objects.filter(parent_share_id=share_id, pooled=True).count()
+            try:
+                for _ in range(options['size'] - pooled_count):
+                    generate_seed_from_id(share_id, pooled=True)
+            except (InvalidGameIdException, InvalidSettingsException) as e:
+                raise CommandError(str(e))
+
+            self.stdout.write(f'{share_id}: {max(options["size"], pooled_count)} pooled practice seeds')
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from generator.models import Game, KeyItemPlacement
+from generator.placements import get_placements, save_placements
+from generator.replay import ReplayVersionException, get_config
+
+
+class Command(BaseCommand):
+    """
+    Add the placements of existing non-race games to the placement index.  Pooled practice
+    seeds are indexed when they are claimed.
+
+    New games are indexed when they are generated, and migration 0011 indexes the games
+    that existed before the index.  The migration can't rebuild the configs of games
+    stored in replay mode, so run this once afterwards if GAME_STORAGE_MODE is "replay".
+    """
+    help = 'Index the key item, character, and boss placements of existing non-race games.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Number of games to load and index per transaction')
+
+    def handle(self, *args, **options):
+        indexed = 0
+        skipped = 0
+        last_id = 0
+        while True:
+            batch = list(Game.objects.filter(race_seed=False, pooled=False, id__gt=last_id)
+                         .select_related('settings_blob', 'configuration_blob')
+                         .order_by('id')[:options['batch_size']])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            already_indexed = set(KeyItemPlacement.objects.filter(share_id__in=[game.share_id for game in batch])
+                                  .values_list('share_id', flat=True))
+            placements = {}
+            for game in batch:
+                if game.share_id in already_indexed:
+                    continue
+                try:
+                    game_placements = get_placements(game, get_config(game))
+                except ReplayVersionException:
+                    skipped += 1
+                    continue
+                for model, objects in game_placements.items():
+                    placements.setdefault(model, []).extend(objects)
+                indexed += 1
+            save_placements(placements)
+
+        self.stdout.write(f'Indexed {indexed} games, skipped {skipped} replay mode games from another randomizer version')
@@ -0,0 +1,403 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import Client, override_settings
+from django.test.utils import setup_databases, teardown_databases
+
+from generator.randomizerinterface import RandomizerInterface
+from generator.views import DownloadSeedView
+
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import http.cookiejar
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from unittest import mock
+
+
+# Settings presets used for generate requests, applied on top of the default settings.
+# These loosely follow the preset buttons on the options page.
+presets = {
+    'standard': {},
+    'race': {'spoiler_log': False},
+    'new_player': {'early_pendant': True, 'unlocked_magic': True, 'enemy_difficulty': 'normal',
+                   'item_difficulty': 'easy'},
+    'lost_worlds': {'game_mode': 'lost_worlds'},
+    'hard': {'enemy_difficulty': 'hard', 'item_difficulty': 'hard', 'boss_scaling': True},
+    'chronosanity': {'chronosanity': True, 'boss_rando': True, 'duplicate_characters': True}
+}
+
+default_mix = 'generate=2,share=20,json_spoiler=30,seed_image=10,download=3,practice=2,options=5'
+
+# Size of a headerless Chrono Trigger ROM, used for the --fake-rom upload.
+ROM_SIZE = 0x400000
+
+
+@contextlib.contextmanager
+def throwaway_database():
+    """
+    Run with a new, migrated test database in place of the configured one, the same way
+    the test runner does.  The database is destroyed afterwards.
+
+    SQLite test databases are normally in memory.  Here a temporary file is used instead
+    so that the client threads can share it.
+    """
+    test_settings = connections[DEFAULT_DB_ALIAS].settings_dict['TEST']
+    test_name = test_settings.get('NAME')
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if connections[DEFAULT_DB_ALIAS].vendor == 'sqlite' and not test_name:
+            test_settings['NAME'] = os.path.join(temp_dir, 'loadtest.sqlite3')
+        try:
+            old_config = setup_databases(verbosity=0, interactive=False, serialized_aliases=set())
+            try:
+                yield
+            finally:
+                teardown_databases(old_config, verbosity=0)
+        finally:
+            test_settings['NAME'] = test_name
+
+
+@contextlib.contextmanager
+def fake_rom_check():
+    """
+    Accept any uploaded ROM and patch the server's own vanilla ROM in its place, so that
+    download requests can be tested without a copy of the ROM on the client side.
+    """
+    def read_rom(rom_file):
+        rom_file.read()
+        return bytearray(RandomizerInterface.get_base_rom())
+
+    with mock.patch.object(DownloadSeedView, 'read_and_validate_rom_file', side_effect=read_rom):
+        yield
+
+
+class InProcessTarget:
+    """
+    Send requests to the app in this process through the Django test client.
+    """
+    def __init__(self):
+        self.local = threading.local()
+
+    def request(self, method: str, path: str, data: dict = None, files: dict = None,
+                headers: dict = None) -> tuple[int, int, str]:
+        if not hasattr(self.local, 'client'):
+            self.local.client = Client()
+        data = dict(data or {})
+        for name, (file_name, content) in (files or {}).items():
+            data[name] = io.BytesIO(content)
+            data[name].name = file_name
+        headers = {'HTTP_' + name.upper().replace('-', '_'): value for name, value in (headers or {}).items()}
+        if method == 'POST':
+            response = self.local.client.post(path, data, **headers)
+        else:
+            response = self.local.client.get(path, data, **headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response.status_code, len(body), response.get('Location', '')
+
+
+class HttpTarget:
+    """
+    Send requests to a running server (ex: a local gunicorn) over HTTP.
+    Each thread keeps its own cookies so that CSRF protected forms can be posted.
+    """
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip('/')
+        self.local = threading.local()
+
+    def get_opener(self):
+        if not hasattr(self.local, 'opener'):
+            self.local.cookies = http.cookiejar.CookieJar()
+            self.local.opener = urllib.request.build_opener(
+                urllib.request.HTTPCookieProcessor(self.local.cookies), NoRedirectHandler())
+            # Pick up a CSRF cookie for the forms.
+            self.local.opener.open(self.base_url + '/options/').read()
+        return self.local.opener
+
+    def request(self, method: str, path: str, data: dict = None, files: dict = None,
+                headers: dict = None) -> tuple[int, int, str]:
+        opener = self.get_opener()
+        url = self.base_url + path
+        headers = dict(headers or {})
+        body = None
+        if method == 'GET' and data:
+            url += '?' + urllib.parse.urlencode(data)
+        elif method == 'POST':
+            csrf_token = next((cookie.value for cookie in self.local.cookies if cookie.name == 'csrftoken'), '')
+            body, content_type = encode_multipart({**(data or {}), 'csrfmiddlewaretoken': csrf_token}, files or {})
+            headers['Content-Type'] = content_type
+
+        request = urllib.request.Request(url, data=body, headers=headers, method=method)
+        try:
+            with opener.open(request) as response:
+                return response.status, len(response.read()), response.headers.get('Location', '')
+        except urllib.error.HTTPError as e:
+            return e.code, len(e.read()), e.headers.get('Location', '')
+
+
+class NoRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """
+    Report redirects as responses instead of following them, like the Django test client.
+    """
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+def encode_multipart(fields: dict, files: dict) -> tuple[bytes, str]:
+    """
+    Encode form fields and files as multipart/form-data.
+
+    :param fields: Dictionary of form field name to value
+    :param files: Dictionary of form field name to a tuple of file name and content
+    :return: Tuple of the request body and its content type
+    """
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (file_name, content) in files.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{file_name}"\r\n'
+                     f'Content-Type: application/octet-stream\r\n\r\n'.encode() + content + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), 'multipart/form-data; boundary=' + boundary
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """
+    Get a percentile of a sorted list with the nearest rank method.
+
+    :param sorted_values: Sorted list of values
+    :param fraction: Percentile as a fraction (ex: 0.99)
+    :return: Value at the percentile
+    """
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))]
+
+
+class LoadTest:
+    """
+    Weighted random traffic against a target, with per endpoint latency and status tracking.
+    """
+    def __init__(self, target, rom: bytes | None):
+        self.target = target
+        self.rom = rom
+        self.share_ids = []
+        self.lock = threading.Lock()
+        self.results = {}
+        self.endpoints = {
+            'options': self.options,
+            'generate': self.generate,
+            'share': self.share,
+            'json_spoiler': self.json_spoiler,
+            'seed_image': self.seed_image,
+            'download': self.download,
+            'practice': self.practice
+        }
+
+    def random_share_id(self) -> str:
+        with self.lock:
+            return random.choice(self.share_ids)
+
+    def add_share_id(self, location: str):
+        # Generate and practice requests redirect to /share/<share_id>
+        path = urllib.parse.urlparse(location).path
+        if path.startswith('/share/'):
+            with self.lock:
+                self.share_ids.append(path.rstrip('/').rsplit('/', 1)[-1])
+
+    def options(self):
+        return self.target.request('GET', '/options/', headers={'Accept-Encoding': 'gzip, br'})
+
+    def generate(self, preset: str = None):
+        preset = preset or random.choice(list(presets))
+        data = {**RandomizerInterface.get_default_settings_data(), 'seed': '', 'spoiler_log': True,
+                **presets[preset]}
+        result = self.target.request('POST', '/generate-rom/', data)
+        self.add_share_id(result[2])
+        return result
+
+    def share(self):
+        return self.target.request('GET', f'/share/{self.random_share_id()}/')
+
+    def json_spoiler(self):
+        return self.target.request('GET', f'/spoiler_log/{self.random_share_id()}.json',
+                                   headers={'Accept-Encoding': 'gzip'})
+
+    def seed_image(self):
+        return self.target.request('GET', f'/seedimg/{self.random_share_id()}.png')
+
+    def download(self):
+        return self.target.request('POST', '/seed/', {'share_id': self.random_share_id()}, {'rom_file': ('ct.sfc', self.rom)})
+
+    def practice(self):
+        result = self.target.request('GET', f'/practice/{self.random_share_id()}/')
+        self.add_share_id(result[2])
+        return result
+
+    def record(self, endpoint: str, start: float, status: int | None, size: int):
+        latency = time.perf_counter() - start
+        with self.lock:
+            result = self.results.setdefault(endpoint, {'latencies': [], 'statuses': {}, 'bytes': 0})
+            result['latencies'].append(latency)
+            result['statuses'][status] = result['statuses'].get(status, 0) + 1
+            result['bytes'] += size
+
+    def call(self, endpoint: str, *args):
+        start = time.perf_counter()
+        try:
+            status, size, _ = self.endpoints[endpoint](*args)
+        except Exception:
+            status, size = None, 0
+        self.record(endpoint, start, status, size)
+
+    def run(self, mix: dict[str, int], concurrency: int, duration: float, max_requests: int | None) -> float:
+        """
+        Send weighted random requests from several threads until the duration or request count is reached.
+
+        :return: Elapsed wall clock time in seconds
+        """
+        names = list(mix)
+        weights = [mix[name] for name in names]
+        deadline = time.perf_counter() + duration
+        counter = iter(range(max_requests)) if max_requests else None
+
+        def worker():
+            while time.perf_counter() < deadline:
+                if counter is not None and next(counter, None) is None:
+                    return
+                self.call(random.choices(names, weights)[0])
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [executor.submit(worker) for _ in range(concurrency)]:
+                future.result()
+        return time.perf_counter() - start
+
+    def report(self, elapsed: float) -> dict:
+        """
+        Summarize the results per endpoint.
+
+        A request is an error if it raised an exception or returned a 5xx status.
+        Rate limited (429) responses are counted separately.
+        """
+        report = {'elapsed_seconds': round(elapsed, 3), 'endpoints': {}}
+        total = 0
+        for endpoint, result in sorted(self.results.items()):
+            latencies = sorted(result['latencies'])
+            count = len(latencies)
+            total += count
+            errors = sum(n for status, n in result['statuses'].items() if status is None or status >= 500)
+            report['endpoints'][endpoint] = {
+                'requests': count,
+                'throughput_rps': round(count / elapsed, 2) if elapsed else 0,
+                'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+                'p90_ms': round(percentile(latencies, 0.90) * 1000, 1),
+                'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+                'max_ms': round(latencies[-1] * 1000, 1),
+                'error_rate': round(errors / count, 4),
+                'rate_limited': result['statuses'].get(429, 0),
+                'statuses': {str(status): n for status, n in sorted(result['statuses'].items(), key=str)},
+                'bytes': result['bytes']
+            }
+        report['requests'] = total
+        report['throughput_rps'] = round(total / elapsed, 2) if elapsed else 0
+        return report
+
+
+class Command(BaseCommand):
+    """
+    Drive a realistic mix of traffic at the web generator and report throughput, latency
+    percentiles, and error rates per endpoint.
+
+    By default requests go through the Django test client in this process, against a
+    throwaway test database that is created and migrated for the run.  Use --url to load
+    a running server such as a local gunicorn.
+    """
+    help = 'Run a load test with a configurable traffic mix and report per endpoint statistics.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', type=str, help='Base URL of a running server.  Defaults to in-process requests.')
+        parser.add_argument('--mix', type=str, default=default_mix,
+                            help=f'Comma separated endpoint=weight list (default: {default_mix})')
+        parser.add_argument('--concurrency', type=int, default=4, help='Number of concurrent clients')
+        parser.add_argument('--duration', type=float, default=30, help='Length of the test in seconds')
+        parser.add_argument('--requests', type=int, help='Stop after this many requests')
+        parser.add_argument('--seeds', type=int, default=5, help='Number of seeds to generate before the test')
+        parser.add_argument('--rom', type=str, default='ct.sfc', help='Vanilla ROM uploaded by download requests')
+        parser.add_argument('--fake-rom', action='store_true',
+                            help='Upload a stub ROM and skip the vanilla ROM check (in-process only).  '
+                                 'Seeds are patched onto the server\'s own ct.sfc instead.')
+        parser.add_argument('--use-configured-database', action='store_true',
+                            help='Write the test seeds to the configured database instead of a throwaway '
+                                 'test database (in-process only)')
+        parser.add_argument('--keep-rate-limits', action='store_true',
+                            help='Leave rate limiting on for in-process requests')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        try:
+            mix = {name: int(weight) for name, weight in
+                   (item.split('=') for item in options['mix'].split(',') if item)}
+        except ValueError:
+            raise CommandError('Invalid --mix, expected endpoint=weight pairs.')
+
+        if options['url'] and (options['fake_rom'] or options['use_configured_database']):
+            raise CommandError('--fake-rom and --use-configured-database only apply to in-process requests.')
+
+        rom = None
+        if mix.get('download') and options['fake_rom']:
+            rom = bytes(ROM_SIZE)
+        elif mix.get('download'):
+            try:
+                with open(options['rom'], 'rb') as rom_file:
+                    rom = rom_file.read()
+            except OSError as e:
+                raise CommandError(f'Download requests need a vanilla ROM: {e}')
+
+        target = HttpTarget(options['url']) if options['url'] else InProcessTarget()
+        load_test = LoadTest(target, rom)
+        unknown = set(mix) - set(load_test.endpoints)
+        if unknown:
+            raise CommandError('Unknown endpoints in --mix: ' + ', '.join(sorted(unknown)) +
+                               '.  Choose from: ' + ', '.join(load_test.endpoints))
+
+        # All in-process requests come from the same address, so the rate limits would
+        # only measure themselves.
+        rate_limits = override_settings() if options['url'] or options['keep_rate_limits'] \
+            else override_settings(RATELIMIT_ENABLED=False)
+        # Never write the test seeds to the configured database unless asked to.
+        database = contextlib.nullcontext() if options['url'] or options['use_configured_database'] \
+            else throwaway_database()
+        rom_check = fake_rom_check() if options['fake_rom'] else contextlib.nullcontext()
+        with database, rate_limits, rom_check:
+            # Seeds for the share, spoiler, image, download and practice requests.
+            for _ in range(options['seeds']):
+                load_test.generate('standard')
+            if not load_test.share_ids:
+                raise CommandError('Could not generate any seeds to run the test against.')
+            load_test.results.clear()
+
+            elapsed = load_test.run(mix, options['concurrency'], options['duration'], options['requests'])
+
+        report = load_test.report(elapsed)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f'{report["requests"]} requests in {report["elapsed_seconds"]}s '
+                          f'({report["throughput_rps"]} req/s) with {options["concurrency"]} clients')
+        self.stdout.write(f'{"endpoint":<14}{"reqs":>7}{"req/s":>9}{"p50 ms":>9}{"p90 ms":>9}'
+                          f'{"p99 ms":>9}{"max ms":>9}{"errors":>8}{"429s":>6}  statuses')
+        for endpoint, stats in report['endpoints'].items():
+            statuses = ' '.join(f'{status}:{n}' for status, n in stats['statuses'].items())
+            self.stdout.write(f'{endpoint:<14}{stats["requests"]:>7}{stats["throughput_rps"]:>9}'
+                              f'{stats["p50_ms"]:>9}{stats["p90_ms"]:>9}{stats["p99_ms"]:>9}'
+                              f'{stats["max_ms"]:>9}{stats["error_rate"]:>8.1%}{stats["rate_limited"]:>6}  {statuses}')
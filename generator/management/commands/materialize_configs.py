@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+
+from generator.models import Blob, Game
+from generator.randomizerinterface import RandomizerInterface
+from generator.replay import ReplayVersionException, get_config_data
+from generator.sandbox import GenerationFailedException, GenerationTimeoutException
+
+
+class Command(BaseCommand):
+    """
+    Rebuild and store the configs of games that were stored in replay mode.
+
+    Replay mode games can only be rebuilt by the randomizer version that created them.
+    Run this before updating the randomizer submodule so those games keep working.
+    deploy.sh runs it in the old container with --unless-version set to the version
+    in the newly built image, so configs are only stored when the version changes.
+    """
+    help = 'Store the config blob for every game that was stored in replay mode.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Number of games to load per query')
+        parser.add_argument('--unless-version', help='Do nothing if the randomizer version is this version')
+        parser.add_argument('--print-version', action='store_true', help='Print the randomizer version and exit')
+
+    def handle(self, *args, **options):
+        version = RandomizerInterface.get_randomizer_version()
+        if options['print_version']:
+            self.stdout.write(version)
+            return
+        if options['unless_version'] == version:
+            self.stdout.write(f'Randomizer version {version} is unchanged, no configs stored')
+            return
+
+        stored = 0
+        skipped = 0
+        last_id = 0
+        while True:
+            batch = list(Game.objects.filter(configuration__isnull=True, configuration_blob__isnull=True,
+                                             id__gt=last_id).order_by('id')[:options['batch_size']])
+            if not batch:
+                break
+            for game in batch:
+                last_id = game.id
+                try:
+                    blob = Blob.store(get_config_data(game))
+                except (ReplayVersionException, GenerationTimeoutException, GenerationFailedException):
+                    skipped += 1
+                    continue
+                Game.objects.filter(id=game.id).update(configuration_blob=blob)
+                stored += 1
+
+        self.stdout.write(f'Stored {stored} configs with randomizer version {version}, skipped {skipped}')
@@ -0,0 +1,231 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from generator.forms import GenerateForm
+from generator.randomizerinterface import RandomizerInterface
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import csv
+import io
+import json
+import os
+import traceback
+
+import numpy as np
+
+
+# Spoiler log categories to count, with the row (location) and column (placed value)
+# keys of their get_web_spoiler_log entries.
+categories = {
+    'key_items': ('location', 'key'),
+    'characters': ('location', 'character'),
+    'bosses': ('location', 'boss')
+}
+
+
+class Heatmap:
+    """
+    Count matrix of how often each value was placed at each location.
+
+    Rows and columns are added as new locations and values show up, so the matrix only
+    grows with the number of distinct placements and not with the number of seeds.
+    """
+    def __init__(self):
+        self.rows = {}
+        self.columns = {}
+        self.counts = np.zeros((0, 0), dtype=np.int64)
+
+    def _indices(self, labels: dict[str, int], names) -> np.ndarray:
+        return np.array([labels.setdefault(name, len(labels)) for name in names], dtype=np.intp)
+
+    def _grow(self):
+        rows, columns = len(self.rows), len(self.columns)
+        if self.counts.shape != (rows, columns):
+            self.counts = np.pad(self.counts, ((0, rows - self.counts.shape[0]), (0, columns - self.counts.shape[1])))
+
+    def add_placements(self, placements: list[tuple[str, str]]):
+        """
+        Count a list of (location, value) placements.
+
+        :param placements: List of (location, value) pairs
+        """
+        if not placements:
+            return
+        locations, values = zip(*placements)
+        row_indices = self._indices(self.rows, locations)
+        column_indices = self._indices(self.columns, values)
+        self._grow()
+        np.add.at(self.counts, (row_indices, column_indices), 1)
+
+    def merge(self, other: 'Heatmap'):
+        """
+        Add the counts of another heatmap to this one.
+
+        :param other: Heatmap to add
+        """
+        row_indices = self._indices(self.rows, other.rows)
+        column_indices = self._indices(self.columns, other.columns)
+        self._grow()
+        self.counts[np.ix_(row_indices, column_indices)] += other.counts
+
+    def to_dict(self, seeds: int) -> dict:
+        """
+        Get the heatmap as a JSON serializable dictionary.
+
+        :param seeds: Number of seeds counted, used for the frequencies
+        :return: Dictionary of row labels, column labels, counts, and frequencies
+        """
+        return {
+            'rows': list(self.rows),
+            'columns': list(self.columns),
+            'counts': self.counts.tolist(),
+            'frequencies': np.round(self.counts / max(seeds, 1), 6).tolist()
+        }
+
+    def nonzero(self):
+        """
+        Iterate over the (location, value, count) of every placement that was counted.
+        """
+        rows, columns = list(self.rows), list(self.columns)
+        for row, column in zip(*np.nonzero(self.counts)):
+            yield rows[row], columns[column], int(self.counts[row, column])
+
+
+def count_seeds(data: dict, seed_prefix: str | None, start: int, count: int) -> tuple[dict[str, Heatmap], int, str]:
+    """
+    Generate a batch of configs and count their placements.
+
+    This runs in the worker processes, so it only returns the small count matrices.
+
+    :param data: Validated settings data keyed by GenerateForm field name
+    :param seed_prefix: Seed values are this prefix followed by the seed number, or random if None
+    :param start: Number of the first seed in the batch
+    :param count: Number of seeds in the batch
+    :return: Tuple of heatmaps by category, number of failed seeds, and the first failure
+    """
+    heatmaps = {category: Heatmap() for category in categories}
+    failed = 0
+    first_error = ''
+    for number in range(start, start + count):
+        seed = f'{seed_prefix}{number}' if seed_prefix is not None else ''
+        try:
+            interface = RandomizerInterface(RandomizerInterface.get_base_rom())
+            interface.randomizer.settings = RandomizerInterface.convert_data_to_settings({**data, 'seed': seed})
+            interface.randomizer.set_random_config()
+            spoiler_log = RandomizerInterface.get_web_spoiler_log(interface.randomizer.config)
+        except Exception:
+            failed += 1
+            first_error = first_error or traceback.format_exc()
+            continue
+
+        for category, (row_key, column_key) in categories.items():
+            heatmaps[category].add_placements([(entry[row_key], entry[column_key]) for entry in spoiler_log[category]])
+
+    return heatmaps, failed, first_error
+
+
+class Command(BaseCommand):
+    """
+    Generate many seeds for one set of settings and report how often each key item,
+    character, and boss ends up at each location.
+
+    Seeds are generated in batches by a pool of worker processes.  Each batch is reduced
+    to count matrices before it is sent back, and at most a few batches are in flight at
+    a time, so memory use does not depend on the number of seeds.
+    """
+    help = 'Report key item, character, and boss placement frequencies over many generated seeds.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--settings-file', type=str,
+                            help='JSON settings document using the options form field names.  '
+                                 'Missing fields use the default settings.')
+        parser.add_argument('--seeds', type=int, default=1000, help='Number of seeds to generate')
+        parser.add_argument('--seed-prefix', type=str,
+                            help='Use this prefix followed by the seed number as the seed values, '
+                                 'so runs can be repeated.  Defaults to random seed values.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of worker processes')
+        parser.add_argument('--batch-size', type=int, default=100, help='Number of seeds per worker batch')
+        parser.add_argument('--format', choices=('json', 'csv'), default='json', help='Output format')
+        parser.add_argument('--output', type=str, help='Output file.  Defaults to stdout.')
+
+    def handle(self, *args, **options):
+        document = {}
+        if options['settings_file']:
+            try:
+                with open(options['settings_file']) as infile:
+                    document = json.load(infile)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Could not read settings document: {e}')
+            if not isinstance(document, dict):
+                raise CommandError('Settings document must be a JSON object.')
+
+        form = GenerateForm({**RandomizerInterface.get_default_settings_data(), **document})
+        if not form.is_valid():
+            raise CommandError('Invalid settings:\n' + '\n'.join(
+                f'{field}: {" ".join(messages)}' for field, messages in form.errors.items()))
+        data = {**form.cleaned_data}
+        data.pop('seed', None)
+
+        if options['seeds'] < 1 or options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--seeds, --batch-size and --workers must be at least 1.')
+
+        # Load the vanilla ROM before the workers are forked so they share it.
+        RandomizerInterface.get_base_rom()
+
+        batches = [(start, min(options['batch_size'], options['seeds'] - start))
+                   for start in range(0, options['seeds'], options['batch_size'])]
+        heatmaps = {category: Heatmap() for category in categories}
+        failed = 0
+        first_error = ''
+
+        def add_result(result):
+            nonlocal failed, first_error
+            batch_heatmaps, batch_failed, batch_error = result
+            for category, heatmap in batch_heatmaps.items():
+                heatmaps[category].merge(heatmap)
+            failed += batch_failed
+            first_error = first_error or batch_error
+
+        if options['workers'] == 1:
+            for start, count in batches:
+                add_result(count_seeds(data, options['seed_prefix'], start, count))
+        else:
+            with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+                pending = set()
+                for start, count in batches:
+                    if len(pending) >= options['workers'] * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            add_result(future.result())
+                    pending.add(executor.submit(count_seeds, data, options['seed_prefix'], start, count))
+                for future in wait(pending).done:
+                    add_result(future.result())
+
+        generated = options['seeds'] - failed
+        if not generated:
+            raise CommandError('Every seed failed to generate:\n' + first_error)
+        if failed:
+            self.stderr.write(f'{failed} of {options["seeds"]} seeds failed to generate.  First failure:\n'
+                              + first_error)
+
+        # Without --output, the report is collected in memory and written to self.stdout so
+        # that call_command(stdout=...) captures it.
+        outfile = open(options['output'], 'w', newline='') if options['output'] else io.StringIO(newline='')
+        try:
+            if options['format'] == 'json':
+                json.dump({
+                    'seeds': generated,
+                    'failed': failed,
+                    'settings': document,
+                    'heatmaps': {category: heatmap.to_dict(generated) for category, heatmap in heatmaps.items()}
+                }, outfile)
+                outfile.write('\n')
+            else:
+                writer = csv.writer(outfile)
+                writer.writerow(['category', 'location', 'value', 'count', 'frequency'])
+                for category, heatmap in heatmaps.items():
+                    for location, value, count in heatmap.nonzero():
+                        writer.writerow([category, location, value, count, round(count / generated, 6)])
+            if not options['output']:
+                self.stdout.write(outfile.getvalue(), ending='')
+        finally:
+            outfile.close()
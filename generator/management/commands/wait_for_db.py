@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+
+class Command(BaseCommand):
+    """
+    Wait until the database accepts connections.
+
+    This is run by the container entrypoint before migrations so the web container can
+    start at the same time as the database container.  It gives up after the timeout
+    rather than waiting forever for a database that will never come up.
+    """
+    help = 'Wait for the database to accept connections.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--timeout', type=float, default=60, help='Seconds to wait before giving up')
+        parser.add_argument('--interval', type=float, default=0.2, help='Seconds to wait between attempts')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias to wait for')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        deadline = time.monotonic() + options['timeout']
+        while True:
+            try:
+                connection.ensure_connection()
+                break
+            except OperationalError as e:
+                if time.monotonic() + options['interval'] > deadline:
+                    raise CommandError(f'Database was not available after {options["timeout"]} seconds: {e}')
+                time.sleep(options['interval'])
+        connection.close()
+        self.stdout.write('Database is available')
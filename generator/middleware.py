@@ -0,0 +1,156 @@
+# Django libraries
+from django.conf import settings as conf
+from django.core.exceptions import MiddlewareNotUsed
+
+from .warmup import get_memory_usage, get_rss
+
+# Python standard libraries
+import collections
+import datetime
+import logging
+import os
+import signal
+import threading
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+
+#
+# Worker memory diagnostics.
+#
+# With MEMORY_DIAGNOSTICS enabled, the RSS of the worker is sampled once after every
+# request and the growth since the previous sample is totalled per view.  The totals are
+# written to MEMORY_DIAGNOSTICS_DIR every MEMORY_SNAPSHOT_INTERVAL requests.  With
+# MEMORY_TRACEMALLOC also enabled, a tracemalloc snapshot is compared with the previous
+# one and the allocations that grew the most are written along with the totals.
+#
+# The RSS is read from /proc/self/statm, which is much cheaper than the smaps_rollup
+# read behind the PSS figures in the readiness endpoint.
+#
+# With MEMORY_RECYCLE_RSS set, a worker whose RSS passes that many MB after a request
+# sends itself SIGTERM.  Gunicorn workers finish the request in progress and exit, and
+# the master starts a fresh one in their place.
+#
+
+class MemoryDiagnosticsMiddleware:
+    """
+    Middleware that samples worker memory usage, writes tracemalloc snapshot diffs, and
+    recycles the worker when it uses too much memory.
+    """
+    def __init__(self, get_response):
+        if not conf.MEMORY_DIAGNOSTICS and not conf.MEMORY_RECYCLE_RSS:
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.snapshot_count = 0
+        self.previous_snapshot = None
+        self.recycling = False
+        self.last_rss = get_rss()
+        # View name -> [requests, total RSS growth in bytes]
+        self.view_growth = collections.defaultdict(lambda: [0, 0])
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        rss = get_rss()
+
+        if conf.MEMORY_DIAGNOSTICS:
+            self.record_request(request, rss)
+
+        if conf.MEMORY_RECYCLE_RSS and rss > conf.MEMORY_RECYCLE_RSS * 1024 * 1024:
+            self.recycle_worker(rss)
+
+        return response
+
+    def record_request(self, request, rss: int):
+        """
+        Add the RSS growth since the previous request to the view's total and write the
+        diagnostics when they are due.
+
+        :param request: Request that was just handled
+        :param rss: RSS after the request, in bytes
+        """
+        match = request.resolver_match
+        view_name = match.view_name if match is not None else 'unresolved'
+
+        with self.lock:
+            # Start tracing on the first request rather than at import time so that it
+            # happens in the worker and not in the gunicorn master.
+            if conf.MEMORY_TRACEMALLOC and not tracemalloc.is_tracing():
+                tracemalloc.start(conf.MEMORY_TRACEMALLOC_FRAMES)
+                self.previous_snapshot = take_snapshot()
+
+            self.view_growth[view_name][0] += 1
+            self.view_growth[view_name][1] += rss - self.last_rss
+            self.last_rss = rss
+            self.request_count += 1
+            if self.request_count % conf.MEMORY_SNAPSHOT_INTERVAL == 0:
+                self.write_snapshot_diff()
+
+    def write_snapshot_diff(self):
+        """
+        Write the per-view RSS growth to the diagnostics directory, along with the
+        allocations that grew the most since the previous tracemalloc snapshot if
+        tracing is enabled.
+        """
+        self.snapshot_count += 1
+
+        memory = get_memory_usage()
+        lines = [
+            f'Time: {datetime.datetime.now().isoformat()}',
+            f'PID: {os.getpid()}',
+            f'Requests: {self.request_count}',
+            f'RSS: {memory["rss_bytes"]}',
+            f'PSS: {memory["pss_bytes"]}',
+            '',
+            'RSS growth by view (requests, bytes):'
+        ]
+        for view_name, (requests, growth) in sorted(self.view_growth.items(), key=lambda item: -item[1][1]):
+            lines.append(f'  {view_name}: {requests}, {growth}')
+
+        if tracemalloc.is_tracing():
+            snapshot = take_snapshot()
+            key_type = 'lineno' if conf.MEMORY_TRACEMALLOC_FRAMES == 1 else 'traceback'
+            stats = snapshot.compare_to(self.previous_snapshot, key_type)
+            self.previous_snapshot = snapshot
+
+            lines += ['', f'Traced: {tracemalloc.get_traced_memory()[0]}',
+                      '', f'Top {conf.MEMORY_SNAPSHOT_TOP} allocation changes since the previous snapshot:']
+            for stat in stats[:conf.MEMORY_SNAPSHOT_TOP]:
+                lines.append(str(stat))
+                if key_type == 'traceback':
+                    lines += stat.traceback.format()
+
+        os.makedirs(conf.MEMORY_DIAGNOSTICS_DIR, exist_ok=True)
+        path = os.path.join(conf.MEMORY_DIAGNOSTICS_DIR, f'memory-{os.getpid()}-{self.snapshot_count:04d}.txt')
+        with open(path, 'w') as outfile:
+            outfile.write('\n'.join(lines) + '\n')
+
+    def recycle_worker(self, rss: int):
+        """
+        Ask this worker to shut down gracefully once the current request is done.
+
+        :param rss: Current RSS of the worker, in bytes
+        """
+        with self.lock:
+            if self.recycling:
+                return
+            self.recycling = True
+
+        logger.warning('Worker %d RSS is %d MB, over the %d MB limit.  Recycling the worker.',
+                       os.getpid(), rss // (1024 * 1024), conf.MEMORY_RECYCLE_RSS)
+        os.kill(os.getpid(), signal.SIGTERM)
+
+
+def take_snapshot() -> tracemalloc.Snapshot:
+    """
+    Take a tracemalloc snapshot, leaving out tracemalloc's own allocations.
+
+    :return: Filtered snapshot
+    """
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<unknown>')
+    ))
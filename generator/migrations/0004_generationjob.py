@@ -0,0 +1,24 @@
+# Generated by Django 4.1.5 on 2026-10-19 08:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generator', '0003_game_seed_nonce'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenerationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_id', models.CharField(max_length=15, unique=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('complete', 'Complete'), ('failed', 'Failed')], default='pending', max_length=8)),
+                ('share_id', models.CharField(blank=True, default='', max_length=15)),
+                ('error_text', models.TextField(blank=True, default='')),
+                ('creation_date', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.1.5 on 2026-10-19 08:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generator', '0004_generationjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='parent_share_id',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=15),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='pooled',
+            field=models.BooleanField(default=False),
+        ),
+    ]
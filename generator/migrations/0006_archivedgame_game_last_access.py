@@ -0,0 +1,32 @@
+# Generated by Django 4.1.5 on 2026-10-19 08:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generator', '0005_game_parent_share_id_pooled'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedGame',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('share_id', models.CharField(max_length=15, unique=True)),
+                ('race_seed', models.BooleanField(default=False)),
+                ('seed_nonce', models.CharField(blank=True, default='', max_length=15)),
+                ('parent_share_id', models.CharField(blank=True, default='', max_length=15)),
+                ('creation_date', models.DateTimeField()),
+                ('last_access', models.DateTimeField(blank=True, null=True)),
+                ('archive_date', models.DateTimeField(auto_now_add=True)),
+                ('data', models.BinaryField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='last_access',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.1.5 on 2026-10-19 08:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generator', '0006_archivedgame_game_last_access'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedgame',
+            name='randomizer_version',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='randomizer_version',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AlterField(
+            model_name='game',
+            name='configuration',
+            field=models.BinaryField(null=True),
+        ),
+    ]
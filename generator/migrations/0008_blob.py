@@ -0,0 +1,38 @@
+# Generated by Django 4.1.5 on 2026-10-19 08:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generator', '0007_game_replay_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('size', models.IntegerField()),
+                ('data', models.BinaryField()),
+                ('creation_date', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='game',
+            name='settings',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='configuration_blob',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='configuration_games', to='generator.blob'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='settings_blob',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='settings_games', to='generator.blob'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Moves the inline settings and configuration data of existing games into
+# the content-addressed Blob table, one batch of games per transaction.
+# Reversing the migration copies the blob data back inline before 0008 drops
+# the blob columns, so rolling back does not lose any game data.
+
+import hashlib
+
+from django.db import migrations, transaction
+
+BATCH_SIZE = 500
+
+
+def backfill_blobs(apps, schema_editor):
+    Game = apps.get_model('generator', 'Game')
+    Blob = apps.get_model('generator', 'Blob')
+
+    def store(data):
+        data = bytes(data)
+        digest = hashlib.sha256(data).hexdigest()
+        Blob.objects.get_or_create(digest=digest, defaults={'size': len(data), 'data': data})
+        return digest
+
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            batch = list(Game.objects.filter(id__gt=last_id, settings__isnull=False).order_by('id')[:BATCH_SIZE])
+            if not batch:
+                break
+            for game in batch:
+                game.settings_blob_id = store(game.settings)
+                game.settings = None
+                if game.configuration is not None:
+                    game.configuration_blob_id = store(game.configuration)
+                    game.configuration = None
+            Game.objects.bulk_update(batch, ['settings', 'settings_blob', 'configuration', 'configuration_blob'])
+        last_id = batch[-1].id
+
+
+def restore_inline_data(apps, schema_editor):
+    Game = apps.get_model('generator', 'Game')
+
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            batch = list(Game.objects.filter(id__gt=last_id, settings_blob__isnull=False)
+                         .select_related('settings_blob', 'configuration_blob').order_by('id')[:BATCH_SIZE])
+            if not batch:
+                break
+            for game in batch:
+                game.settings = game.settings_blob.data
+                game.settings_blob = None
+                if game.configuration_blob is not None:
+                    game.configuration = game.configuration_blob.data
+                    game.configuration_blob = None
+            Game.objects.bulk_update(batch, ['settings', 'settings_blob', 'configuration', 'configuration_blob'])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('generator', '0008_blob'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_blobs, restore_inline_data),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.1.5 on 2026-10-19 08:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generator', '0009_backfill_blobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BossPlacement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('share_id', models.CharField(db_index=True, max_length=15)),
+                ('location', models.CharField(max_length=100)),
+                ('creation_date', models.DateTimeField()),
+                ('boss', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CharacterPlacement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('share_id', models.CharField(db_index=True, max_length=15)),
+                ('location', models.CharField(max_length=100)),
+                ('creation_date', models.DateTimeField()),
+                ('character', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='KeyItemPlacement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('share_id', models.CharField(db_index=True, max_length=15)),
+                ('location', models.CharField(max_length=100)),
+                ('creation_date', models.DateTimeField()),
+                ('key_item', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='keyitemplacement',
+            index=models.Index(fields=['location', 'key_item', '-creation_date'], name='generator_k_locatio_d2e363_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='keyitemplacement',
+            index=models.Index(fields=['key_item', '-creation_date'], name='generator_k_key_ite_34638c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='characterplacement',
+            index=models.Index(fields=['location', 'character', '-creation_date'], name='generator_c_locatio_7c675c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='characterplacement',
+            index=models.Index(fields=['character', '-creation_date'], name='generator_c_charact_74cc72_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bossplacement',
+            index=models.Index(fields=['location', 'boss', '-creation_date'], name='generator_b_locatio_a3f442_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bossplacement',
+            index=models.Index(fields=['boss', '-creation_date'], name='generator_b_boss_8c7ec7_idx'),
+        ),
+    ]
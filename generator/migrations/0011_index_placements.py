@@ -0,0 +1,74 @@
+# Adds the placements of games created before the placement index existed, one
+# batch of games per transaction.  Race seeds and pooled practice seeds are never
+# indexed here, the same as for new games.  Games stored in replay mode have no
+# config to read, so they are left for the index_placements command, which can
+# rebuild their configs.  Reversing the migration leaves the index as it is,
+# since reversing 0010 drops the placement tables.
+
+import pickle
+
+from django.db import migrations, transaction
+
+BATCH_SIZE = 100
+
+# Placement model name -> (model field of the placed value, web spoiler log category, web spoiler log key)
+PLACEMENT_MODELS = {
+    'KeyItemPlacement': ('key_item', 'key_items', 'key'),
+    'CharacterPlacement': ('character', 'characters', 'character'),
+    'BossPlacement': ('boss', 'bosses', 'boss'),
+}
+
+
+def index_existing_games(apps, schema_editor):
+    # Imported here so that only this migration needs the randomizer.
+    from generator.randomizerinterface import RandomizerInterface
+
+    Game = apps.get_model('generator', 'Game')
+    KeyItemPlacement = apps.get_model('generator', 'KeyItemPlacement')
+    models = {apps.get_model('generator', name): fields for name, fields in PLACEMENT_MODELS.items()}
+
+    games = Game.objects.filter(race_seed=False, pooled=False).select_related('configuration_blob').order_by('id')
+    last_id = 0
+    while True:
+        batch = list(games.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        # Games generated since 0010 was applied are already indexed.
+        indexed = set(KeyItemPlacement.objects.filter(share_id__in=[game.share_id for game in batch])
+                      .values_list('share_id', flat=True))
+        placements = {model: [] for model in models}
+        for game in batch:
+            if game.share_id in indexed:
+                continue
+            if game.configuration is not None:
+                config = game.configuration
+            elif game.configuration_blob is not None:
+                config = game.configuration_blob.data
+            else:
+                continue
+
+            spoiler_log = RandomizerInterface.get_web_spoiler_log(pickle.loads(bytes(config)))
+            for model, (field, category, spoiler_key) in models.items():
+                placements[model].extend(
+                    model(share_id=game.share_id, creation_date=game.creation_date,
+                          location=entry['location'], **{field: entry[spoiler_key]})
+                    for entry in spoiler_log[category])
+
+        with transaction.atomic():
+            for model, objects in placements.items():
+                model.objects.bulk_create(objects)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('generator', '0010_placement_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_existing_games, migrations.RunPython.noop),
+    ]
@@ -1,15 +1,185 @@
-from django.db import models
+from django.db import IntegrityError, models
+
+from .sqlite import serialize_writes
+
+# Python standard libraries
+import hashlib
+
+
+#
+# Model to hold content-addressed settings and configuration data.
+# Identical blobs are stored once and shared by every game that uses them.
+#
+class Blob(models.Model):
+    digest = models.CharField(max_length=64, primary_key=True)
+    size = models.IntegerField()
+    data = models.BinaryField()
+    creation_date = models.DateTimeField(auto_now_add=True)
+
+    @classmethod
+    def store(cls, data: bytes) -> 'Blob':
+        """
+        Get the blob holding the given data, creating it if it doesn't exist yet.
+
+        :param data: Data to store
+        :return: Blob object for the data
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        try:
+            blob, _ = cls.objects.get_or_create(digest=digest, defaults={'size': len(data), 'data': data})
+        except IntegrityError:
+            # Another worker stored the same data first.
+            blob = cls.objects.get(digest=digest)
+        return blob
 
 
 #
 # Model to hold randomized game data.
 # Holds ID, game settings, and game configuration.
 #
+# Settings and configuration data are stored in the content-addressed Blob table.
+# Games created before blobs were introduced may still hold the data inline until
+# the backfill migration moves it.  Use get_settings_data and get_configuration_data
+# to read it either way.
+#
+# Practice seeds record the share ID of the seed they were created from.
+# Pooled practice seeds have been pre-generated but not yet handed out.
+# The last access time is updated in batches and is used to decide when
+# a game can be moved to the archive.
+#
+# Games stored in replay mode have no configuration blob.  Their config is
+# rebuilt from the settings, seed, and nonce using the randomizer version
+# recorded when the game was created.
+#
 class Game(models.Model):
     share_id = models.CharField(max_length=15)
-    settings = models.BinaryField()
+    settings = models.BinaryField(null=True)
+    settings_blob = models.ForeignKey(Blob, null=True, on_delete=models.PROTECT, related_name='settings_games')
     race_seed = models.BooleanField(default=False)
-    configuration = models.BinaryField()
+    configuration = models.BinaryField(null=True)
+    configuration_blob = models.ForeignKey(Blob, null=True, on_delete=models.PROTECT,
+                                           related_name='configuration_games')
     creation_date = models.DateTimeField(auto_now=True)
     seed_nonce = models.CharField(max_length=15, blank=True, default='')
+    parent_share_id = models.CharField(max_length=15, blank=True, default='', db_index=True)
+    pooled = models.BooleanField(default=False)
+    last_access = models.DateTimeField(null=True, blank=True)
+    randomizer_version = models.CharField(max_length=40, blank=True, default='')
+
+    @classmethod
+    def create(cls, settings: bytes, configuration: bytes | None, **kwargs) -> 'Game':
+        """
+        Create and save a game, storing its settings and configuration as shared blobs.
+
+        :param settings: Pickled settings data
+        :param configuration: Pickled configuration data, or None for replay mode games
+        :param kwargs: Values for the game's other fields
+        :return: Game object that has been created and stored in the database
+        """
+        # The blobs and the game are written in one transaction, one writer at a time on SQLite.
+        with serialize_writes():
+            return cls.objects.create(
+                settings_blob=Blob.store(settings),
+                configuration_blob=Blob.store(configuration) if configuration is not None else None,
+                **kwargs)
+
+    def get_settings_data(self) -> bytes:
+        """
+        Get the pickled settings data for this game.
+
+        :return: Pickled RandoSettings data
+        """
+        if self.settings is not None:
+            return bytes(self.settings)
+        return bytes(self.settings_blob.data)
+
+    def get_configuration_data(self) -> bytes | None:
+        """
+        Get the pickled configuration data for this game.
+
+        :return: Pickled RandoConfig data, or None if the game was stored in replay mode
+        """
+        if self.configuration is not None:
+            return bytes(self.configuration)
+        if self.configuration_blob_id is not None:
+            return bytes(self.configuration_blob.data)
+        return None
+
+
+#
+# Model to track seed generation requests made through the JSON API in async mode.
+# Holds the job ID, its current status, and the share ID of the resulting game.
+#
+class GenerationJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    COMPLETE = 'complete'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (COMPLETE, 'Complete'),
+        (FAILED, 'Failed'),
+    ]
+
+    job_id = models.CharField(max_length=15, unique=True)
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES, default=PENDING)
+    share_id = models.CharField(max_length=15, blank=True, default='')
+    error_text = models.TextField(blank=True, default='')
+    creation_date = models.DateTimeField(auto_now_add=True)
+
+
+#
+# Model to hold games that have been moved out of the Game table by the archive_games command.
+# The settings and configuration blobs are stored together as a single compressed pickle.
+#
+class ArchivedGame(models.Model):
+    share_id = models.CharField(max_length=15, unique=True)
+    race_seed = models.BooleanField(default=False)
+    seed_nonce = models.CharField(max_length=15, blank=True, default='')
+    parent_share_id = models.CharField(max_length=15, blank=True, default='')
+    creation_date = models.DateTimeField()
+    last_access = models.DateTimeField(null=True, blank=True)
+    randomizer_version = models.CharField(max_length=40, blank=True, default='')
+    archive_date = models.DateTimeField(auto_now_add=True)
+    data = models.BinaryField()
+
+
+#
+# Index of the key item, character, and boss placements of non-race seeds.
+# Filled in when a seed is generated from the same data as the web spoiler log,
+# so seeds can be searched by placement without unpickling their configs.
+# Race seeds are never indexed.
+#
+class Placement(models.Model):
+    share_id = models.CharField(max_length=15, db_index=True)
+    location = models.CharField(max_length=100)
+    creation_date = models.DateTimeField()
+
+    class Meta:
+        abstract = True
+
+
+class KeyItemPlacement(Placement):
+    key_item = models.CharField(max_length=100)
+
+    class Meta:
+        indexes = [models.Index(fields=['location', 'key_item', '-creation_date']),
+                   models.Index(fields=['key_item', '-creation_date'])]
+
+
+# The location of a character placement is the recruit spot.
+class CharacterPlacement(Placement):
+    character = models.CharField(max_length=100)
+
+    class Meta:
+        indexes = [models.Index(fields=['location', 'character', '-creation_date']),
+                   models.Index(fields=['character', '-creation_date'])]
+
+
+class BossPlacement(Placement):
+    boss = models.CharField(max_length=100)
 
+    class Meta:
+        indexes = [models.Index(fields=['location', 'boss', '-creation_date']),
+                   models.Index(fields=['boss', '-creation_date'])]
@@ -0,0 +1,77 @@
+# Django libraries
+from django.conf import settings as conf
+
+from .randomizerinterface import mystery_flag_field_map, mystery_freq_field_map
+
+# Python standard libraries
+import functools
+
+# Other libraries
+import numpy as np
+
+
+#
+# Mystery seed odds.
+#
+# A mystery seed picks its game mode, item and enemy difficulty, tech order, and shop
+# prices by weighted choice from the weights on the mystery tab, then turns each mystery
+# flag on with its own probability.  The odds are estimated by sampling those rolls in
+# bulk with NumPy, without running the randomizer.  Any adjustments the randomizer makes
+# to the rolled settings afterwards are not included.
+#
+
+# Form fields of each group of relative weights, keyed by MysterySettings attribute.
+mystery_choice_fields = {attribute: tuple(freq_fields.values())
+                         for attribute, freq_fields in mystery_freq_field_map.items()}
+
+# Form fields of the flag percentages.
+mystery_flag_fields = tuple(mystery_flag_field_map.values())
+
+# Every mystery weight field, in the order get_mystery_odds expects them.
+mystery_fields = tuple(field for fields in mystery_choice_fields.values() for field in fields) + \
+    mystery_flag_fields
+
+# Fixed so that every worker gives the same answer for the same weights.
+MYSTERY_ODDS_RNG_SEED = 0
+ODDS_DECIMALS = 4
+
+
+@functools.lru_cache(maxsize=conf.MYSTERY_ODDS_CACHE_SIZE)
+def get_mystery_odds(weights: tuple[int, ...]) -> dict:
+    """
+    Estimate the odds of each mystery setting for the given mystery weights.
+
+    The weights must already be valid (see validation._check_mystery).
+
+    :param weights: Value of each field in mystery_fields, in the same order
+    :return: Dictionary with the number of samples, the odds of each choice by group, the
+             odds of each flag, the odds of each pair of flags being rolled together, and
+             the odds of rolling each number of flags
+    """
+    values = dict(zip(mystery_fields, weights))
+    samples = conf.MYSTERY_ODDS_SAMPLES
+    rng = np.random.default_rng(MYSTERY_ODDS_RNG_SEED)
+
+    choices = {}
+    for attribute, fields in mystery_choice_fields.items():
+        group_weights = np.array([values[field] for field in fields], dtype=np.float64)
+        rolls = rng.choice(len(fields), size=samples, p=group_weights / group_weights.sum())
+        counts = np.bincount(rolls, minlength=len(fields))
+        choices[attribute] = dict(zip(fields, (counts / samples).round(ODDS_DECIMALS).tolist()))
+
+    # One row per sample, one column per flag.
+    probabilities = np.array([values[field] for field in mystery_flag_fields]) / 100
+    rolls = rng.random((samples, len(mystery_flag_fields))) < probabilities
+    # Counting co-occurrences is a matrix product, which is much faster in float32.
+    as_float = rolls.astype(np.float32)
+    pair_counts = (as_float.T @ as_float).astype(np.float64)
+
+    return {
+        'samples': samples,
+        'choices': choices,
+        'flags': dict(zip(mystery_flag_fields, rolls.mean(axis=0).round(ODDS_DECIMALS).tolist())),
+        'flag_fields': mystery_flag_fields,
+        'flag_pairs': (pair_counts / samples).round(ODDS_DECIMALS).tolist(),
+        'flag_counts': (np.bincount(rolls.sum(axis=1), minlength=len(mystery_flag_fields) + 1) / samples)
+        .round(ODDS_DECIMALS).tolist()
+    }
@@ -0,0 +1,86 @@
+from .models import BossPlacement, CharacterPlacement, Game, KeyItemPlacement
+from .randomizerinterface import RandomizerInterface
+from .sqlite import serialize_writes
+
+
+#
+# Spoiler data index.
+#
+# The key item, character, and boss placements of every non-race seed are written to
+# the placement tables when the seed is generated, or for a pooled practice seed, when
+# it is claimed from the pool.  They come from the same data as the web spoiler log.
+# Race seeds are never indexed, so their placements can't be found through a search.
+#
+
+# Category name -> (placement model, model field of the placed value, web spoiler log key of the placed value)
+placement_categories = {
+    'key_items': (KeyItemPlacement, 'key_item', 'key'),
+    'characters': (CharacterPlacement, 'character', 'character'),
+    'bosses': (BossPlacement, 'boss', 'boss')
+}
+
+PLACEMENT_SEARCH_LIMIT = 50
+PLACEMENT_SEARCH_MAX_LIMIT = 500
+
+
+def get_placements(game: Game, config) -> dict:
+    """
+    Build the unsaved placement objects for a game.
+
+    :param game: Game object that has been stored in the database
+    :param config: RandoConfig object for the game
+    :return: Dictionary of placement model to a list of placement objects
+    """
+    spoiler_log = RandomizerInterface.get_web_spoiler_log(config)
+    return {
+        model: [model(share_id=game.share_id, creation_date=game.creation_date,
+                      location=entry['location'], **{field: entry[spoiler_key]})
+                for entry in spoiler_log[category]]
+        for category, (model, field, spoiler_key) in placement_categories.items()
+    }
+
+
+def save_placements(placements: dict):
+    """
+    Write placement objects to the placement index in a single transaction.
+
+    :param placements: Dictionary of placement model to a list of placement objects
+    """
+    with serialize_writes():
+        for model, objects in placements.items():
+            model.objects.bulk_create(objects)
+
+
+def index_placements(game: Game, config):
+    """
+    Add the placements of a newly generated game to the placement index.
+
+    Race seeds are skipped.  Pooled practice seeds must not be indexed until they are
+    claimed, since their placements would otherwise be searchable before anyone has them.
+
+    :param game: Game object that has been stored in the database
+    :param config: RandoConfig object for the game
+    """
+    if game.race_seed:
+        return
+    save_placements(get_placements(game, config))
+
+
+def find_placements(category: str, location: str | None, value: str | None, limit: int) -> list[dict]:
+    """
+    Find the most recent non-race seeds with a placement.
+
+    :param category: One of the placement_categories keys
+    :param location: Location or recruit spot to match, or None for any
+    :param value: Key item, character, or boss to match, or None for any
+    :param limit: Maximum number of placements to return
+    :return: List of placement dictionaries, newest first
+    """
+    model, field, _ = placement_categories[category]
+    placements = model.objects.all()
+    if location is not None:
+        placements = placements.filter(location=location)
+    if value is not None:
+        placements = placements.filter(**{field: value})
+    return list(placements.order_by('-creation_date')
+                .values('share_id', 'location', field, 'creation_date')[:limit])
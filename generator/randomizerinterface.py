@@ -1,13 +1,20 @@
 # Python types
 from __future__ import annotations
+import datetime
+import functools
+import hashlib
 import io
+import operator
 import os.path
+import pathlib
+import pickle
 import random
 import sys
-import datetime
 
 # Web types
+from .artifacts import get_input
 from .forms import GenerateForm, RomForm
+from .sandbox import run_sandboxed
 from django.conf import settings as conf
 
 # Add the randomizer to the system path here.  This code assumes that the
@@ -15,7 +22,9 @@ from django.conf import settings as conf
 sys.path.append(os.path.join(conf.BASE_DIR, 'jetsoftime', 'sourcefiles'))
 
 # Randomizer types
+import cosmetichacks
 import ctenums
+import ctrom
 import randoconfig
 import randomizer
 import randosettings as rset
@@ -49,6 +58,164 @@ tech_order_map = {
 }
 
 
+# Form fields that select a single enum value.
+# Maps the form field name to the Settings attribute it populates and the
+# string to enum lookup table for its values.
+enum_field_map = {
+    'item_difficulty': ('item_difficulty', difficulty_map),
+    'enemy_difficulty': ('enemy_difficulty', difficulty_map),
+    'game_mode': ('game_mode', game_mode_map),
+    'shop_prices': ('shopprices', shop_price_map),
+    'tech_rando': ('techorder', tech_order_map)
+}
+
+# Boolean form fields that each enable a single game flag.
+flag_field_map = {
+    'disable_glitches': rset.GameFlags.FIX_GLITCH,
+    'boss_rando': rset.GameFlags.BOSS_RANDO,
+    'boss_scaling': rset.GameFlags.BOSS_SCALE,
+    'zeal': rset.GameFlags.ZEAL_END,
+    'early_pendant': rset.GameFlags.FAST_PENDANT,
+    'locked_chars': rset.GameFlags.LOCKED_CHARS,
+    'unlocked_magic': rset.GameFlags.UNLOCKED_MAGIC,
+    'tab_treasures': rset.GameFlags.TAB_TREASURES,
+    'chronosanity': rset.GameFlags.CHRONOSANITY,
+    'duplicate_characters': rset.GameFlags.DUPLICATE_CHARS,
+    'healing_item_rando': rset.GameFlags.HEALING_ITEM_RANDO,
+    'gear_rando': rset.GameFlags.GEAR_RANDO,
+    'mystery_seed': rset.GameFlags.MYSTERY,
+    'epoch_fail': rset.GameFlags.EPOCH_FAIL,
+    # Duplicate characters
+    'duplicate_duals': rset.GameFlags.DUPLICATE_TECHS,
+    # Boss rando
+    'boss_spot_hp': rset.GameFlags.BOSS_SPOT_HP,
+    # Quality of life
+    'sightscope_always_on': rset.GameFlags.VISIBLE_HEALTH,
+    'boss_sightscope': rset.GameFlags.BOSS_SIGHTSCOPE,
+    'fast_tabs': rset.GameFlags.FAST_TABS,
+    'free_menu_glitch': rset.GameFlags.FREE_MENU_GLITCH,
+    # Extra
+    'bucket_fragments': rset.GameFlags.BUCKET_FRAGMENTS,
+    'use_antilife': rset.GameFlags.USE_ANTILIFE,
+    'tackle_effects': rset.GameFlags.TACKLE_EFFECTS_ON,
+    'starters_sufficient': rset.GameFlags.STARTERS_SUFFICIENT
+}
+
+# TabSettings attribute to form field
+tab_field_map = {
+    'power_min': 'power_tab_min',
+    'power_max': 'power_tab_max',
+    'magic_min': 'magic_tab_min',
+    'magic_max': 'magic_tab_max',
+    'speed_min': 'speed_tab_min',
+    'speed_max': 'speed_tab_max'
+}
+
+# MysterySettings frequency attribute to a map of enum value -> form field
+mystery_freq_field_map = {
+    'game_mode_freqs': {
+        rset.GameMode.STANDARD: 'mystery_game_mode_standard',
+        rset.GameMode.LOST_WORLDS: 'mystery_game_mode_lw',
+        rset.GameMode.LEGACY_OF_CYRUS: 'mystery_game_mode_loc',
+        rset.GameMode.ICE_AGE: 'mystery_game_mode_ia'
+    },
+    'item_difficulty_freqs': {
+        rset.Difficulty.EASY: 'mystery_item_difficulty_easy',
+        rset.Difficulty.NORMAL: 'mystery_item_difficulty_normal',
+        rset.Difficulty.HARD: 'mystery_item_difficulty_hard'
+    },
+    'enemy_difficulty_freqs': {
+        rset.Difficulty.NORMAL: 'mystery_enemy_difficulty_normal',
+        rset.Difficulty.HARD: 'mystery_enemy_difficulty_hard'
+    },
+    'tech_order_freqs': {
+        rset.TechOrder.NORMAL: 'mystery_tech_order_normal',
+        rset.TechOrder.BALANCED_RANDOM: 'mystery_tech_order_full_random',
+        rset.TechOrder.FULL_RANDOM: 'mystery_tech_order_balanced_random'
+    },
+    'shop_price_freqs': {
+        rset.ShopPrices.NORMAL: 'mystery_shop_prices_normal',
+        rset.ShopPrices.MOSTLY_RANDOM: 'mystery_shop_prices_random',
+        rset.ShopPrices.FULLY_RANDOM: 'mystery_shop_prices_mostly_random',
+        rset.ShopPrices.FREE: 'mystery_shop_prices_free'
+    }
+}
+
+# Mystery flag probabilities.  The form value is a percentage.
+mystery_flag_field_map = {
+    rset.GameFlags.TAB_TREASURES: 'mystery_tab_treasures',
+    rset.GameFlags.UNLOCKED_MAGIC: 'mystery_unlock_magic',
+    rset.GameFlags.BUCKET_FRAGMENTS: 'mystery_bucket_fragments',
+    rset.GameFlags.CHRONOSANITY: 'mystery_chronosanity',
+    rset.GameFlags.BOSS_RANDO: 'mystery_boss_rando',
+    rset.GameFlags.BOSS_SCALE: 'mystery_boss_scale',
+    rset.GameFlags.LOCKED_CHARS: 'mystery_locked_characters',
+    rset.GameFlags.DUPLICATE_CHARS: 'mystery_duplicate_characters',
+    rset.GameFlags.EPOCH_FAIL: 'mystery_epoch_fail',
+    rset.GameFlags.GEAR_RANDO: 'mystery_gear_rando',
+    rset.GameFlags.HEALING_ITEM_RANDO: 'mystery_heal_rando'
+}
+
+# Precompiled views of the tables above, built once at import.
+_enum_fields = tuple(enum_field_map.items())
+_flag_fields = tuple(flag_field_map.items())
+_reverse_enum_maps = {
+    field: {value: key for key, value in value_map.items()}
+    for field, (attribute, value_map) in _enum_fields
+}
+
+
+@functools.cache
+def _read_base_rom() -> bytes:
+    """
+    Read the server's vanilla ROM from the input store once per process.
+
+    :return: bytes containing the vanilla Chrono Trigger ROM data
+    """
+    return get_input('ct.sfc')
+
+
+@functools.cache
+def _read_seed_names() -> tuple[str, ...]:
+    """
+    Read the list of names used to build random seed strings once per process.
+
+    :return: Tuple of seed names from names.txt
+    """
+    first_line = get_input('names.txt').decode().partition("\n")[0]
+    return tuple(first_line.split(","))
+
+
+def _set_random_config(rom_data: bytearray, settings: rset.Settings) -> tuple[rset.Settings, randoconfig.RandoConfig]:
+    """
+    Generate a RandoConfig in a sandboxed child process.
+
+    :param rom_data: ROM data the parent's randomizer was created with
+    :param settings: RandoSettings object to generate the config for
+    :return: Tuple of the settings, which the randomizer may change, and the new config
+    """
+    rando = randomizer.Randomizer(rom_data, is_vanilla=True)
+    rando.settings = settings
+    rando.set_random_config()
+    return rando.settings, rando.config
+
+
+def _generate_rom(rom_data: bytearray, settings: rset.Settings, config: randoconfig.RandoConfig) -> bytearray:
+    """
+    Create a ROM in a sandboxed child process.
+
+    :param rom_data: ROM data the parent's randomizer was created with
+    :param settings: RandoSettings object for the ROM
+    :param config: RandoConfig object for the ROM
+    :return: bytearray object with the modified ROM data
+    """
+    rando = randomizer.Randomizer(rom_data, is_vanilla=True)
+    rando.settings = settings
+    rando.set_config(config)
+    rando.generate_rom()
+    return rando.get_generated_rom()
+
+
 class InvalidSettingsException(Exception):
     pass
 
@@ -68,6 +235,8 @@ class RandomizerInterface:
 
         :param rom_data: bytearray containing vanilla ROM data used to construct a randomizer object
         """
+        # Sandboxed children build their own randomizer from the same ROM data.
+        self.rom_data = rom_data
         self.randomizer = randomizer.Randomizer(rom_data, is_vanilla=True)
 
     def configure_seed_from_form(self, form: GenerateForm) -> str:
@@ -76,23 +245,29 @@ class RandomizerInterface:
         This will convert the form data into the appropriate randomizer settings and config
         objects and then tell the randomizer to generate a seed.
 
+        When GENERATION_SANDBOX is enabled this runs in a sandboxed child process and may
+        raise GenerationTimeoutException or GenerationFailedException.
+
         :param form: GenerateForm with the user's settings
 
         :return: string of a nonce, if any, that was used to obfuscate the seed
         """
+        return self.__configure_seed_from_form(form)
+
+    def __configure_seed_from_form(self, form: GenerateForm) -> str:
         self.randomizer.settings = self.__convert_form_to_settings(form)
         nonce = ''
         # If this is a race seed, modify the seed value  before sending it through
         # the randomizer.  This will ensure that race ROMs and non-race ROMs with the same
         # seed value are not identical.
         if form.cleaned_data['spoiler_log']:
-            self.randomizer.set_random_config()
+            self.__set_random_config()
         else:
             # Use the current timestamp's number of microseconds as an arbitrary nonce value
             nonce = str(datetime.datetime.now().microsecond)
             seed = self.randomizer.settings.seed
             self.randomizer.settings.seed = seed + nonce
-            self.randomizer.set_random_config()
+            self.__set_random_config()
             self.randomizer.settings.seed = seed
         return nonce
 
@@ -103,12 +278,17 @@ class RandomizerInterface:
 
         This method will fail if the given settings object is for a mystery seed.
 
+        When GENERATION_SANDBOX is enabled this runs in a sandboxed child process and may
+        raise GenerationTimeoutException or GenerationFailedException.
+
         :param settings: Settings object to copy for this new game
         :param is_race_seed: Whether or not this is a race seed
 
         :return: string of a nonce, if any, that was used to obfuscate the seed
         """
+        return self.__configure_seed_from_settings(settings, is_race_seed)
 
+    def __configure_seed_from_settings(self, settings: rset.Settings, is_race_seed: bool) -> str:
         if rset.GameFlags.MYSTERY in settings.gameflags:
             raise InvalidSettingsException("Mystery seeds cannot be cloned.")
 
@@ -127,31 +307,92 @@ class RandomizerInterface:
         if is_race_seed:
             nonce = str(datetime.datetime.now().microsecond)
             self.randomizer.settings.seed = new_seed + nonce
-            self.randomizer.set_random_config()
+            self.__set_random_config()
             self.randomizer.settings.seed = new_seed
         else:
-            self.randomizer.set_random_config()
+            self.__set_random_config()
         return nonce
 
+    def replay_config(self, settings: rset.Settings, nonce: str) -> randoconfig.RandoConfig:
+        """
+        Rebuild the RandoConfig for a previously generated seed.
+
+        The randomizer is deterministic for a given settings object and seed value, so
+        re-running it with the stored settings and nonce reproduces the original config
+        as long as the randomizer version has not changed.
+
+        Mystery seeds cannot be replayed since the randomizer overwrites the mystery
+        settings when the seed is generated.
+
+        :param settings: Settings object stored with the seed
+        :param nonce: Nonce stored with the seed, if any
+        :return: RandoConfig object for the seed
+        """
+        if rset.GameFlags.MYSTERY in settings.gameflags:
+            raise InvalidSettingsException("Mystery seeds cannot be replayed.")
+
+        self.randomizer.settings = settings
+        seed = settings.seed
+        settings.seed = seed + nonce
+        self.__set_random_config()
+        self.randomizer.settings.seed = seed
+        return self.randomizer.config
+
     def generate_rom(self) -> bytearray:
         """
         Create a ROM from the settings and config objects previously generated or set.
 
+        When GENERATION_SANDBOX is enabled this runs in a sandboxed child process and may
+        raise GenerationTimeoutException or GenerationFailedException.
+
         :return: bytearray object with the modified ROM data
         """
+        if conf.GENERATION_SANDBOX:
+            return run_sandboxed(_generate_rom, self.rom_data, self.randomizer.settings, self.randomizer.config)
         self.randomizer.generate_rom()
         return self.randomizer.get_generated_rom()
 
-    def set_settings_and_config(self, settings: rset.Settings, config: randoconfig.RandoConfig, form: RomForm):
+    def __set_random_config(self):
+        """
+        Generate a config for the randomizer's settings, in a sandboxed child process if enabled.
+
+        The child's resulting settings and config objects are copied back into this
+        interface's randomizer.
+        """
+        if not conf.GENERATION_SANDBOX:
+            self.randomizer.set_random_config()
+            return
+
+        self.randomizer.settings, self.randomizer.config = run_sandboxed(
+            _set_random_config, self.rom_data, self.randomizer.settings)
+
+    def set_settings_and_config(self, settings: rset.Settings, config: randoconfig.RandoConfig,
+                                form: RomForm | None = None):
         """
         Populate the randomizer with a pre-populated RandoSettings object and a
         preconfigured RandoSettings object.
 
         :param settings: RandoSettings object
         :param config: RandoConfig object
+        :param form: RomForm with cosmetic settings, or None to keep the settings' cosmetics
+        """
+        if form is not None:
+            self.apply_cosmetic_options(settings, form)
+        self.randomizer.settings = settings
+        self.randomizer.set_config(config)
+
+    @staticmethod
+    def apply_cosmetic_flags(settings: rset.Settings, form: RomForm):
+        """
+        Apply the cosmetic flags (music, quiet mode, and flash reduction) from the ROM
+        form to a RandoSettings object.
+
+        These change event scripts, so unlike the names and in-game options they can't
+        be layered onto a generated ROM and are part of the seed's base image instead.
+
+        :param settings: RandoSettings object to update
         :param form: RomForm with cosmetic settings
         """
-        # Cosmetic settings
         if form.cleaned_data['reduce_flashes']:
             settings.cosmetic_flags = settings.cosmetic_flags | rset.CosmeticFlags.REDUCE_FLASH
 
@@ -164,15 +405,25 @@ class RandomizerInterface:
         if form.cleaned_data['quiet_mode']:
             settings.cosmetic_flags = settings.cosmetic_flags | rset.CosmeticFlags.QUIET_MODE
 
+    @classmethod
+    def apply_cosmetic_options(cls, settings: rset.Settings, form: RomForm):
+        """
+        Apply the cosmetic choices from the ROM form to a RandoSettings object.
+
+        :param settings: RandoSettings object to update
+        :param form: RomForm with cosmetic settings
+        """
+        cls.apply_cosmetic_flags(settings, form)
+
         # Character/Epoch renames
-        settings.char_names[0] = self.get_character_name(form.cleaned_data['crono_name'], 'Crono')
-        settings.char_names[1] = self.get_character_name(form.cleaned_data['marle_name'], 'Marle')
-        settings.char_names[2] = self.get_character_name(form.cleaned_data['lucca_name'], 'Lucca')
-        settings.char_names[3] = self.get_character_name(form.cleaned_data['robo_name'], 'Robo')
-        settings.char_names[4] = self.get_character_name(form.cleaned_data['frog_name'], 'Frog')
-        settings.char_names[5] = self.get_character_name(form.cleaned_data['ayla_name'], 'Ayla')
-        settings.char_names[6] = self.get_character_name(form.cleaned_data['magus_name'], 'Magus')
-        settings.char_names[7] = self.get_character_name(form.cleaned_data['epoch_name'], 'Epoch')
+        settings.char_names[0] = cls.get_character_name(form.cleaned_data['crono_name'], 'Crono')
+        settings.char_names[1] = cls.get_character_name(form.cleaned_data['marle_name'], 'Marle')
+        settings.char_names[2] = cls.get_character_name(form.cleaned_data['lucca_name'], 'Lucca')
+        settings.char_names[3] = cls.get_character_name(form.cleaned_data['robo_name'], 'Robo')
+        settings.char_names[4] = cls.get_character_name(form.cleaned_data['frog_name'], 'Frog')
+        settings.char_names[5] = cls.get_character_name(form.cleaned_data['ayla_name'], 'Ayla')
+        settings.char_names[6] = cls.get_character_name(form.cleaned_data['magus_name'], 'Magus')
+        settings.char_names[7] = cls.get_character_name(form.cleaned_data['epoch_name'], 'Epoch')
 
         # In-game options
         # Boolean options
@@ -194,22 +445,39 @@ class RandomizerInterface:
         # Integer options
         if form.cleaned_data['battle_speed']:
             settings.ctoptions.battle_speed = \
-                self.clamp((form.cleaned_data['battle_speed'] - 1), 0, 7)
+                cls.clamp((form.cleaned_data['battle_speed'] - 1), 0, 7)
 
         if form.cleaned_data['background_selection']:
             settings.ctoptions.menu_background = \
-                self.clamp((form.cleaned_data['background_selection'] - 1), 0, 7)
+                cls.clamp((form.cleaned_data['background_selection'] - 1), 0, 7)
 
         if form.cleaned_data['battle_message_speed']:
             settings.ctoptions.battle_msg_speed = \
-                self.clamp((form.cleaned_data['battle_message_speed'] - 1), 0, 7)
+                cls.clamp((form.cleaned_data['battle_message_speed'] - 1), 0, 7)
 
         if form.cleaned_data['battle_gauge_style'] is not None:
             settings.ctoptions.battle_gauge_style = \
-                self.clamp((form.cleaned_data['battle_gauge_style']), 0, 2)
+                cls.clamp((form.cleaned_data['battle_gauge_style']), 0, 2)
 
-        self.randomizer.settings = settings
-        self.randomizer.set_config(config)
+    @staticmethod
+    def apply_cosmetic_layer(rom: bytearray, settings: rset.Settings) -> bytearray:
+        """
+        Apply the character names and in-game options directly to a generated ROM.
+
+        Both are written to fixed locations that the rest of the generation never
+        touches, so layering them onto a seed's base image gives the same ROM as a full
+        generation with the same settings.  The base image must have been generated with
+        the same cosmetic flags (see apply_cosmetic_flags).
+
+        :param rom: Generated ROM data for the seed's base image
+        :param settings: RandoSettings object with the desired cosmetic settings
+        :return: bytearray with the names and in-game options applied
+        """
+        ct_rom = ctrom.CTRom(rom, ignore_checksum=True)
+        cosmetichacks.set_pc_names(ct_rom, *settings.char_names)
+        settings.ctoptions.write_to_ctrom(ct_rom)
+        ct_rom.fix_snes_checksum()
+        return bytearray(ct_rom.rom_data.getvalue())
 
     def get_settings(self) -> rset.Settings:
         """
@@ -234,10 +502,31 @@ class RandomizerInterface:
         :param share_id: Share ID os the seed in question
         :return: String containing the name of the ROM for this seed
         """
-        if rset.GameFlags.MYSTERY in self.randomizer.settings.gameflags:
-            return "ctjot_mystery_" + share_id + ".sfc"
+        return self.get_rom_file_name(self.randomizer.settings, share_id)
+
+    @classmethod
+    def get_rom_file_name(cls, settings: rset.Settings, share_id: str) -> str:
+        """
+        Get the ROM name for a seed from its settings.
+
+        :param settings: RandoSettings object describing the seed
+        :param share_id: Share ID of the seed in question
+        :return: String containing the name of the ROM for the seed
+        """
+        return "ctjot_" + cls.get_flag_string(settings) + "_" + share_id + ".sfc"
+
+    @staticmethod
+    def get_flag_string(settings: rset.Settings) -> str:
+        """
+        Get the flag string for a seed.  Mystery seeds do not expose their flags.
+
+        :param settings: RandoSettings object describing the seed
+        :return: String containing the flags for the seed, or "mystery" for mystery seeds
+        """
+        if rset.GameFlags.MYSTERY in settings.gameflags:
+            return "mystery"
         else:
-            return "ctjot_" + self.randomizer.settings.get_flag_string() + "_" + share_id + ".sfc"
+            return settings.get_flag_string()
 
     @classmethod
     def __convert_form_to_settings(cls, form: GenerateForm) -> rset.Settings:
@@ -247,191 +536,159 @@ class RandomizerInterface:
         :param form: GenerateForm object from the web interface
         :return: RandoSettings object with flags/settings from the form applied
         """
+        return cls.convert_data_to_settings(form.cleaned_data)
 
+    @classmethod
+    def convert_data_to_settings(cls, data: dict) -> rset.Settings:
+        """
+        Convert a dictionary of flag/settings data into a RandoSettings object.
+
+        The dictionary uses the same keys and value types as GenerateForm.cleaned_data,
+        so this can be used for form, JSON, or batch input alike.  All conversion is
+        driven by the field mapping tables defined at the top of this module.
+
+        :param data: Dictionary of validated settings data keyed by GenerateForm field name
+        :return: RandoSettings object with flags/settings from the data applied
+        """
         settings = rset.Settings()
 
         # Seed
-        if form.cleaned_data['seed'] == "":
+        if not data.get('seed'):
             # get a random seed
             settings.seed = cls.get_random_seed()
         else:
-            settings.seed = form.cleaned_data['seed']
-
-        # Difficulties
-        settings.item_difficulty = difficulty_map[form.cleaned_data['item_difficulty']]
-        settings.enemy_difficulty = difficulty_map[form.cleaned_data['enemy_difficulty']]
-
-        # game mode
-        settings.game_mode = game_mode_map[form.cleaned_data['game_mode']]
-
-        # shops
-        settings.shopprices = shop_price_map[form.cleaned_data['shop_prices']]
-
-        # techs
-        settings.techorder = tech_order_map[form.cleaned_data['tech_rando']]
-
-        if form.cleaned_data['disable_glitches']:
-            settings.gameflags = settings.gameflags | rset.GameFlags.FIX_GLITCH
-
-        if form.cleaned_data['boss_rando']:
-            settings.gameflags = settings.gameflags | rset.GameFlags.BOSS_RANDO
-
-        if form.cleaned_data['boss_scaling']:
-            settings.gameflags = settings.gameflags | rset.GameFlags.BOSS_SCALE
-
-        if form.cleaned_data['zeal']:
-            settings.gameflags = settings.gameflags | rset.GameFlags.ZEAL_END
-
-        if form.cleaned_data['early_pendant']:
-            settings.gameflags = settings.gameflags | rset.GameFlags.FAST_PENDANT
-
-        if form.cleaned_data['locked_chars']:
-            settings.gameflags = settings.gameflags | rset.GameFlags.LOCKED_CHARS
-
-        if form.cleaned_data['unlocked_magic']:
-            settings.gameflags = settings.gameflags | rset.GameFlags.UNLOCKED_MAGIC
-
-        if form.cleaned_data['tab_treasures']:
-            settings.gameflags = settings.gameflags | rset.GameFlags.TAB_TREASURES
+            settings.seed = data['seed']
 
-        if form.cleaned_data['chronosanity']:
-            settings.gameflags = settings.gameflags | rset.GameFlags.CHRONOSANITY
+        # Single value enum selections (difficulty, game mode, shops, techs)
+        for field, (attribute, value_map) in _enum_fields:
+            setattr(settings, attribute, value_map[data[field]])
 
-        if form.cleaned_data['duplicate_characters']:
-            settings.gameflags = settings.gameflags | rset.GameFlags.DUPLICATE_CHARS
-
-        if form.cleaned_data['healing_item_rando']:
-            settings.gameflags = settings.gameflags | rset.GameFlags.HEALING_ITEM_RANDO
-
-        if form.cleaned_data['gear_rando']:
-            settings.gameflags = settings.gameflags | rset.GameFlags.GEAR_RANDO
-
-        if form.cleaned_data['mystery_seed']:
-            settings.gameflags = settings.gameflags | rset.GameFlags.MYSTERY
-
-        if form.cleaned_data['epoch_fail']:
-            settings.gameflags = settings.gameflags | rset.GameFlags.EPOCH_FAIL
+        # All boolean game flags are OR'd into the bitmask in one pass
+        settings.gameflags = settings.gameflags | functools.reduce(
+            operator.or_, (flag for field, flag in _flag_fields if data[field]), rset.GameFlags(0))
 
         # Duplicate characters
-        char_choices = []
-        duplicate_char_assignments = form.cleaned_data['duplicate_char_assignments']
-        # duplicate character assignments comes in as a stringified hex number.
-        # Decode the hex string into the char_choices list.
-        # Loop through the characters
-        for i in range(7):
-            char_choices.append([])
-            choices = int(duplicate_char_assignments[(i * 2):(i * 2) + 2], 16)
-            # Loop through the assignments for the current character
-            for j in range(7):
-                if choices & (1 << j) > 0:
-                    char_choices[i].append(j)
-        settings.char_choices = char_choices
-
-        if form.cleaned_data['duplicate_duals']:
-            settings.gameflags = settings.gameflags | rset.GameFlags.DUPLICATE_TECHS
+        settings.char_choices = cls.decode_char_choices(data['duplicate_char_assignments'])
 
         # Boss rando settings
         # TODO - Boss and location lists are just default for now. Only update the other options.
-        settings.ro_settings.preserve_parts = form.cleaned_data['legacy_boss_placement']
-
-        if form.cleaned_data['boss_spot_hp']:
-            settings.gameflags = settings.gameflags | rset.GameFlags.BOSS_SPOT_HP
+        settings.ro_settings.preserve_parts = data['legacy_boss_placement']
 
         # Tab randomization settings
         # TODO - Currently defaulting to UNIFORM distribution
         settings.tab_settings = rset.TabSettings(
             scheme=rset.TabRandoScheme.UNIFORM,
             binom_success=.5,
-            power_min=form.cleaned_data['power_tab_min'],
-            power_max=form.cleaned_data['power_tab_max'],
-            magic_min=form.cleaned_data['magic_tab_min'],
-            magic_max=form.cleaned_data['magic_tab_max'],
-            speed_min=form.cleaned_data['speed_tab_min'],
-            speed_max=form.cleaned_data['speed_tab_max']
+            **{attribute: data[field] for attribute, field in tab_field_map.items()}
         )
 
-        # Quality of life settings
-        if form.cleaned_data['sightscope_always_on']:
-            settings.gameflags = settings.gameflags | rset.GameFlags.VISIBLE_HEALTH
+        # Bucket Fragments
+        settings.bucket_settings = rset.BucketSettings(
+            num_fragments=data['fragments_required'] + data['extra_fragments'],
+            needed_fragments=data['fragments_required']
+        )
 
-        if form.cleaned_data['boss_sightscope']:
-            settings.gameflags = settings.gameflags | rset.GameFlags.BOSS_SIGHTSCOPE
+        # Mystery
+        for attribute, freq_fields in mystery_freq_field_map.items():
+            setattr(settings.mystery_settings, attribute,
+                    {value: data[field] for value, field in freq_fields.items()})
 
-        if form.cleaned_data['fast_tabs']:
-            settings.gameflags = settings.gameflags | rset.GameFlags.FAST_TABS
+        settings.mystery_settings.flag_prob_dict = \
+            {flag: data[field]/100 for flag, field in mystery_flag_field_map.items()}
 
-        if form.cleaned_data['free_menu_glitch']:
-            settings.gameflags = settings.gameflags | rset.GameFlags.FREE_MENU_GLITCH
+        return settings
+    # End convert_data_to_settings
 
-        # Bucket Fragments
-        if form.cleaned_data['bucket_fragments']:
-            settings.gameflags = settings.gameflags | rset.GameFlags.BUCKET_FRAGMENTS
+    @classmethod
+    def convert_settings_to_data(cls, settings: rset.Settings) -> dict:
+        """
+        Convert a RandoSettings object back into a dictionary of form data.
 
-        num_fragments = \
-            form.cleaned_data['fragments_required'] + form.cleaned_data['extra_fragments']
-        settings.bucket_settings = rset.BucketSettings(
-            num_fragments=num_fragments,
-            needed_fragments=form.cleaned_data['fragments_required']
-        )
+        This is the reverse of convert_data_to_settings and is driven by the same
+        mapping tables.  The spoiler_log field is not part of the settings object
+        and is not included in the output.
 
-        # Extra settings
-        if form.cleaned_data['use_antilife']:
-            settings.gameflags = settings.gameflags | rset.GameFlags.USE_ANTILIFE
+        NOTE - The randomizer overwrites the mystery settings when a mystery seed is
+               generated, so the mystery fields only round trip for settings that have
+               not been through the randomizer yet.
 
-        if form.cleaned_data['tackle_effects']:
-            settings.gameflags = settings.gameflags | rset.GameFlags.TACKLE_EFFECTS_ON
+        :param settings: RandoSettings object to convert
+        :return: Dictionary of settings data keyed by GenerateForm field name
+        """
+        data = {'seed': settings.seed}
 
-        if form.cleaned_data['starters_sufficient']:
-            settings.gameflags = settings.gameflags | rset.GameFlags.STARTERS_SUFFICIENT
+        for field, (attribute, value_map) in _enum_fields:
+            data[field] = _reverse_enum_maps[field][getattr(settings, attribute)]
 
-        # Mystery
-        settings.mystery_settings.game_mode_freqs: dict[rset.GameMode, int] = {
-            rset.GameMode.STANDARD: form.cleaned_data['mystery_game_mode_standard'],
-            rset.GameMode.LOST_WORLDS: form.cleaned_data['mystery_game_mode_lw'],
-            rset.GameMode.LEGACY_OF_CYRUS: form.cleaned_data['mystery_game_mode_loc'],
-            rset.GameMode.ICE_AGE: form.cleaned_data['mystery_game_mode_ia']
-        }
+        for field, flag in _flag_fields:
+            data[field] = flag in settings.gameflags
 
-        settings.mystery_settings.item_difficulty_freqs: dict[rset.Difficulty, int] = {
-            rset.Difficulty.EASY: form.cleaned_data['mystery_item_difficulty_easy'],
-            rset.Difficulty.NORMAL: form.cleaned_data['mystery_item_difficulty_normal'],
-            rset.Difficulty.HARD: form.cleaned_data['mystery_item_difficulty_hard']
-        }
+        data['duplicate_char_assignments'] = cls.encode_char_choices(settings.char_choices)
+        data['legacy_boss_placement'] = settings.ro_settings.preserve_parts
 
-        settings.mystery_settings.enemy_difficulty_freqs: dict[rset.Difficulty, int] = {
-            rset.Difficulty.NORMAL: form.cleaned_data['mystery_enemy_difficulty_normal'],
-            rset.Difficulty.HARD: form.cleaned_data['mystery_enemy_difficulty_hard']
-        }
+        for attribute, field in tab_field_map.items():
+            data[field] = getattr(settings.tab_settings, attribute)
 
-        settings.mystery_settings.tech_order_freqs: dict[rset.TechOrder, int] = {
-            rset.TechOrder.NORMAL: form.cleaned_data['mystery_tech_order_normal'],
-            rset.TechOrder.BALANCED_RANDOM: form.cleaned_data['mystery_tech_order_full_random'],
-            rset.TechOrder.FULL_RANDOM: form.cleaned_data['mystery_tech_order_balanced_random']
-        }
+        data['fragments_required'] = settings.bucket_settings.needed_fragments
+        data['extra_fragments'] = \
+            settings.bucket_settings.num_fragments - settings.bucket_settings.needed_fragments
 
-        settings.mystery_settings.shop_price_freqs: dict[rset.ShopPrices, int] = {
-            rset.ShopPrices.NORMAL: form.cleaned_data['mystery_shop_prices_normal'],
-            rset.ShopPrices.MOSTLY_RANDOM: form.cleaned_data['mystery_shop_prices_random'],
-            rset.ShopPrices.FULLY_RANDOM: form.cleaned_data['mystery_shop_prices_mostly_random'],
-            rset.ShopPrices.FREE: form.cleaned_data['mystery_shop_prices_free']
-        }
+        for attribute, freq_fields in mystery_freq_field_map.items():
+            freqs = getattr(settings.mystery_settings, attribute)
+            for value, field in freq_fields.items():
+                data[field] = freqs.get(value, 0)
 
-        settings.mystery_settings.flag_prob_dict: dict[rset.GameFlags, int] = {
-            rset.GameFlags.TAB_TREASURES: form.cleaned_data['mystery_tab_treasures']/100,
-            rset.GameFlags.UNLOCKED_MAGIC: form.cleaned_data['mystery_unlock_magic']/100,
-            rset.GameFlags.BUCKET_FRAGMENTS: form.cleaned_data['mystery_bucket_fragments']/100,
-            rset.GameFlags.CHRONOSANITY: form.cleaned_data['mystery_chronosanity']/100,
-            rset.GameFlags.BOSS_RANDO: form.cleaned_data['mystery_boss_rando']/100,
-            rset.GameFlags.BOSS_SCALE: form.cleaned_data['mystery_boss_scale']/100,
-            rset.GameFlags.LOCKED_CHARS: form.cleaned_data['mystery_locked_characters']/100,
-            rset.GameFlags.DUPLICATE_CHARS: form.cleaned_data['mystery_duplicate_characters']/100,
-            rset.GameFlags.EPOCH_FAIL: form.cleaned_data['mystery_epoch_fail']/100,
-            rset.GameFlags.GEAR_RANDO: form.cleaned_data['mystery_gear_rando']/100,
-            rset.GameFlags.HEALING_ITEM_RANDO: form.cleaned_data['mystery_heal_rando']/100
-        }
+        for flag, field in mystery_flag_field_map.items():
+            data[field] = round(settings.mystery_settings.flag_prob_dict.get(flag, 0) * 100)
 
-        return settings
-    # End __convert_form_to_settings
+        return data
+    # End convert_settings_to_data
+
+    @classmethod
+    @functools.cache
+    def get_default_settings_data(cls) -> dict:
+        """
+        Get the form data for the randomizer's default settings, without a seed.
+
+        This is used to fill in any fields that are missing from an API settings document.
+
+        :return: Dictionary of default settings data keyed by GenerateForm field name
+        """
+        data = cls.convert_settings_to_data(rset.Settings())
+        del data['seed']
+        return data
+
+    @staticmethod
+    def decode_char_choices(duplicate_char_assignments: str) -> list[list[int]]:
+        """
+        Decode the duplicate character assignments from the form into a list of choices.
+
+        The assignments come in as a stringified hex number, two hex digits per character,
+        where each bit marks a character that the recruit can become.
+
+        :param duplicate_char_assignments: Hex string of character assignments
+        :return: List of character choices for each of the seven characters
+        """
+        char_choices = []
+        # Loop through the characters
+        for i in range(7):
+            char_choices.append([])
+            choices = int(duplicate_char_assignments[(i * 2):(i * 2) + 2], 16)
+            # Loop through the assignments for the current character
+            for j in range(7):
+                if choices & (1 << j) > 0:
+                    char_choices[i].append(j)
+        return char_choices
+
+    @staticmethod
+    def encode_char_choices(char_choices: list[list[int]]) -> str:
+        """
+        Encode a list of character choices into the hex string format used by the form.
+
+        :param char_choices: List of character choices for each of the seven characters
+        :return: Hex string of character assignments
+        """
+        return ''.join('%02X' % sum(1 << choice for choice in choices) for choices in char_choices)
 
     @classmethod
     def get_spoiler_log(cls, config: randoconfig.RandoConfig, settings: rset.Settings) -> io.StringIO:
@@ -509,18 +766,32 @@ class RandomizerInterface:
         return spoiler_log
     # End get_web_spoiler_log
 
+    @staticmethod
+    @functools.cache
+    def get_randomizer_version() -> str:
+        """
+        Get an identifier for the version of the randomizer code being run.
+
+        This is a hash of the randomizer's python source files, so it changes
+        whenever the randomizer submodule is updated.
+
+        :return: Hex digest identifying the randomizer version
+        """
+        hasher = hashlib.sha1()
+        for path in sorted(pathlib.Path(randomizer.__file__).parent.glob('**/*.py')):
+            hasher.update(path.read_bytes())
+        return hasher.hexdigest()
+
     @staticmethod
     def get_random_seed() -> str:
         """
         Get a random seed string for a ROM.
         This seed string is built up from a list of names bundled with the randomizer.  This method
-        expects the names.txt file to be accessible in the web app's root directory.
+        expects the names.txt file to be in the input store.
 
         :return: Random seed string.
         """
-        with open("names.txt", "r") as names_file:
-            names = names_file.readline()
-            names = names.split(",")
+        names = _read_seed_names()
         return "".join(random.choice(names) for i in range(2))
 
     @staticmethod
@@ -531,14 +802,12 @@ class RandomizerInterface:
         be used when applying the config and sending the seed to a user.  The user's ROM will
         be used for that process instead.
 
-        The unheadered, vanilla Chrono Trigger ROM must be located in the web app's BASE_DIR
-        and must be named ct.sfc.
+        The unheadered, vanilla Chrono Trigger ROM must be in the input store (by default the
+        web app's BASE_DIR) and must be named ct.sfc.
 
         :return: bytearray containing the vanilla Chrono Trigger ROM data
         """
-        with open(str("ct.sfc"), 'rb') as infile:
-            rom = bytearray(infile.read())
-        return rom
+        return bytearray(_read_base_rom())
 
     @classmethod
     def get_share_details(cls, config: randoconfig.RandoConfig, settings: rset.Settings) -> io.StringIO:
@@ -0,0 +1,176 @@
+# Django libraries
+from django.conf import settings as conf
+from django.core.cache import caches
+from django.http import JsonResponse
+from django.shortcuts import render
+
+# Python standard libraries
+import functools
+import math
+import time
+
+
+#
+# Token bucket rate limiting and admission control for the expensive endpoints.
+#
+# Every scope (ex: "generate", "download") has a per-IP bucket and a global bucket.
+# A request is only admitted when both buckets have a token available.  Bucket
+# state lives in the cache alias named by RATELIMIT_CACHE, which defaults to a
+# file based cache so that all gunicorn workers on a node share the same buckets
+# without needing Redis.
+#
+# NOTE - Bucket updates are read-modify-write and are not atomic across workers.
+#        Under heavy contention a few extra requests may be admitted, which is
+#        acceptable for load shedding purposes.
+#
+
+
+def get_client_ip(request) -> str:
+    """
+    Get the IP address of the client that made a request.
+
+    When running behind the nginx proxy, RATELIMIT_TRUST_X_FORWARDED_FOR must be set
+    so that the client address is read from the X-Forwarded-For header.
+
+    :param request: Django request object
+    :return: String containing the client's IP address
+    """
+    if conf.RATELIMIT_TRUST_X_FORWARDED_FOR:
+        forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+        if forwarded_for:
+            return forwarded_for.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _refill(state: tuple[float, float] | None, rate: float, burst: float, now: float) -> float:
+    """
+    Get the number of tokens currently in a bucket.
+
+    :param state: Stored (tokens, timestamp) tuple for the bucket, or None if it is new
+    :param rate: Tokens added to the bucket per second
+    :param burst: Maximum number of tokens the bucket can hold
+    :param now: Current time in seconds
+    :return: Number of tokens available in the bucket
+    """
+    if state is None:
+        return burst
+    tokens, stamp = state
+    return min(burst, tokens + (now - stamp) * rate)
+
+
+def try_admit(scope: str, client_ip: str, cost: int = 1) -> float:
+    """
+    Try to take tokens from the per-IP and global buckets for the given scope.
+
+    :param scope: Name of the rate limit scope in the RATELIMIT_SCOPES setting
+    :param client_ip: IP address of the client making the request
+    :param cost: Number of tokens the request takes
+    :return: 0 if the request was admitted, otherwise the number of seconds to wait
+    """
+    limits = conf.RATELIMIT_SCOPES[scope]
+    cache = caches[conf.RATELIMIT_CACHE]
+    now = time.time()
+
+    buckets = {
+        f'ratelimit:{scope}:ip:{client_ip}': (limits['ip_rate'], limits['ip_burst']),
+        f'ratelimit:{scope}:global': (limits['global_rate'], limits['global_burst']),
+    }
+    states = cache.get_many(buckets.keys())
+    tokens = {key: _refill(states.get(key), rate, burst, now) for key, (rate, burst) in buckets.items()}
+
+    if all(available >= cost for available in tokens.values()):
+        cache.set_many({key: (available - cost, now) for key, available in tokens.items()},
+                       conf.RATELIMIT_STATE_TIMEOUT)
+        _count(cache, scope, 'admitted')
+        return 0
+
+    # Not enough tokens.  Save the refilled state and report how long until
+    # every bucket will have enough tokens again.
+    cache.set_many({key: (available, now) for key, available in tokens.items()}, conf.RATELIMIT_STATE_TIMEOUT)
+    _count(cache, scope, 'rejected')
+    return max((cost - available) / buckets[key][0] for key, available in tokens.items() if available < cost)
+
+
+def get_max_cost(scope: str) -> float:
+    """
+    Get the largest cost that a request in the given scope can ever be admitted with.
+
+    :param scope: Name of the rate limit scope in the RATELIMIT_SCOPES setting
+    :return: Size of the smallest bucket of the scope
+    """
+    limits = conf.RATELIMIT_SCOPES[scope]
+    return min(limits['ip_burst'], limits['global_burst'])
+
+
+def _count(cache, scope: str, outcome: str):
+    """
+    Increment an admission counter for the metrics endpoint.
+
+    :param cache: Cache holding the counters
+    :param scope: Name of the rate limit scope
+    :param outcome: Either "admitted" or "rejected"
+    """
+    key = f'ratelimit:{scope}:{outcome}'
+    if not cache.add(key, 1, None):
+        cache.incr(key)
+
+
+def get_admission_metrics() -> dict:
+    """
+    Get the current admission state for every rate limit scope.
+
+    :return: Dictionary of scope name to configured limits, global tokens, and counters
+    """
+    cache = caches[conf.RATELIMIT_CACHE]
+    now = time.time()
+    metrics = {'enabled': bool(conf.RATELIMIT_ENABLED), 'scopes': {}}
+    for scope, limits in conf.RATELIMIT_SCOPES.items():
+        state = cache.get(f'ratelimit:{scope}:global')
+        metrics['scopes'][scope] = {
+            'limits': limits,
+            'global_tokens': _refill(state, limits['global_rate'], limits['global_burst'], now),
+            'admitted': cache.get(f'ratelimit:{scope}:admitted', 0),
+            'rejected': cache.get(f'ratelimit:{scope}:rejected', 0),
+        }
+    return metrics
+
+
+def rate_limit(scope: str, json: bool = False):
+    """
+    View decorator that sheds load with an HTTP 429 before the view does any work.
+
+    :param scope: Name of the rate limit scope in the RATELIMIT_SCOPES setting
+    :param json: Whether to respond with JSON instead of the HTML error page
+    :return: Decorator for a view function
+    """
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapped_view(request, *args, **kwargs):
+            # HEAD and OPTIONS requests never reach the randomizer.
+            if not conf.RATELIMIT_ENABLED or request.method in ('HEAD', 'OPTIONS'):
+                return view_func(request, *args, **kwargs)
+
+            retry_after = try_admit(scope, get_client_ip(request))
+            if retry_after == 0:
+                return view_func(request, *args, **kwargs)
+            return rate_limited_response(request, retry_after, json)
+        return wrapped_view
+    return decorator
+
+
+def rate_limited_response(request, retry_after: float, json: bool = False):
+    """
+    Build the HTTP 429 response for a request that was not admitted.
+
+    :param request: Django request object
+    :param retry_after: Number of seconds the client should wait, from try_admit
+    :param json: Whether to respond with JSON instead of the HTML error page
+    :return: Response with a Retry-After header
+    """
+    error_text = 'The server is busy. Please try again in a few seconds.'
+    if json:
+        response = JsonResponse({'error': error_text}, status=429)
+    else:
+        response = render(request, 'generator/error.html', {'error_text': error_text}, status=429)
+    response['Retry-After'] = str(math.ceil(retry_after))
+    return response
@@ -0,0 +1,97 @@
+# Django libraries
+from django.conf import settings as conf
+
+from .models import Game
+from .randomizerinterface import RandomizerInterface, rset
+
+# Python standard libraries
+import functools
+import pickle
+
+
+#
+# Storage of game configs.
+#
+# In the default "full" storage mode every game stores its pickled RandoConfig.
+# In "replay" mode only the settings, seed, nonce, and randomizer version are
+# stored, and the config is rebuilt by re-running the randomizer the first time
+# it is needed.  Rebuilt configs are held in a bounded LRU cache.
+#
+
+
+class ReplayVersionException(Exception):
+    """
+    Exception that is raised when a game stored in replay mode was created with a
+    different randomizer version and has no stored config to fall back to.
+    """
+    pass
+
+
+def get_config_blob(settings: rset.Settings, config) -> bytes | None:
+    """
+    Get the configuration blob to store for a newly generated game.
+
+    :param settings: RandoSettings object used to generate the game
+    :param config: RandoConfig object for the game
+    :return: Pickled config, or None if the config can be rebuilt on demand
+    """
+    if conf.GAME_STORAGE_MODE == 'replay' and rset.GameFlags.MYSTERY not in settings.gameflags:
+        return None
+    return pickle.dumps(config)
+
+
+def get_config_data(game: Game) -> bytes:
+    """
+    Get the pickled config for a game, rebuilding it if it was stored in replay mode.
+
+    :param game: Game object
+    :return: Pickled RandoConfig data for the game
+    """
+    configuration = game.get_configuration_data()
+    if configuration is not None:
+        return configuration
+
+    check_replay_version(game)
+    return _replay_config_data(game.share_id, game.get_settings_data(), game.seed_nonce)
+
+
+def check_replay_version(game: Game):
+    """
+    Check that the config of a game can be loaded without running the randomizer.
+
+    Raises a ReplayVersionException if the game was stored in replay mode with a
+    different randomizer version.
+
+    :param game: Game object
+    """
+    if game.get_configuration_data() is None and \
+            game.randomizer_version != RandomizerInterface.get_randomizer_version():
+        raise ReplayVersionException(
+            'This seed was generated with a different version of the randomizer and can no longer be loaded.')
+
+
+def get_config(game: Game):
+    """
+    Get the RandoConfig object for a game.
+
+    :param game: Game object
+    :return: RandoConfig object for the game
+    """
+    return pickle.loads(get_config_data(game))
+
+
+@functools.lru_cache(maxsize=conf.REPLAY_CACHE_SIZE)
+def _replay_config_data(share_id: str, settings: bytes, nonce: str) -> bytes:
+    """
+    Rebuild the pickled config for a game stored in replay mode.
+
+    The share ID is only part of the cache key.  The pickled config is cached rather
+    than the config object so that callers always get their own copy.
+
+    :param share_id: Share ID of the game
+    :param settings: Pickled RandoSettings object stored with the game
+    :param nonce: Nonce stored with the game
+    :return: Pickled RandoConfig data
+    """
+    interface = RandomizerInterface(RandomizerInterface.get_base_rom())
+    return pickle.dumps(interface.replay_config(pickle.loads(settings), nonce))
@@ -0,0 +1,74 @@
+# Python standard libraries
+import io
+import struct
+
+
+#
+# Compact binary patches between a vanilla ROM and a generated ROM.
+#
+# A patch is the target length followed by (offset, length, data) records for every
+# run of changed blocks.  Comparing fixed size blocks keeps patch creation fast in
+# pure python at the cost of storing a few unchanged bytes around each change.
+#
+
+PATCH_MAGIC = b'CTJP'
+BLOCK_SIZE = 64
+HEADER = struct.Struct('<4sI')
+RECORD = struct.Struct('<II')
+
+
+def create_patch(source: bytes, target: bytes) -> bytes:
+    """
+    Create a patch that turns the source data into the target data.
+
+    :param source: Original data (ex: the vanilla ROM)
+    :param target: Modified data (ex: a generated ROM)
+    :return: Patch data
+    """
+    source = memoryview(source)
+    target = memoryview(target)
+    patch = io.BytesIO()
+    patch.write(HEADER.pack(PATCH_MAGIC, len(target)))
+
+    run_start = None
+    for offset in range(0, len(target), BLOCK_SIZE):
+        end = min(offset + BLOCK_SIZE, len(target))
+        changed = source[offset:end] != target[offset:end]
+        if changed and run_start is None:
+            run_start = offset
+        elif not changed and run_start is not None:
+            patch.write(RECORD.pack(run_start, offset - run_start))
+            patch.write(target[run_start:offset])
+            run_start = None
+
+    if run_start is not None:
+        patch.write(RECORD.pack(run_start, len(target) - run_start))
+        patch.write(target[run_start:])
+
+    return patch.getvalue()
+
+
+def apply_patch(source: bytes, patch: bytes) -> bytearray:
+    """
+    Apply a patch created by create_patch.
+
+    :param source: Original data the patch was created against
+    :param patch: Patch data
+    :return: bytearray with the patched data
+    """
+    magic, length = HEADER.unpack_from(patch, 0)
+    if magic != PATCH_MAGIC:
+        raise ValueError('Invalid patch data')
+
+    target = bytearray(source[:length])
+    if len(target) < length:
+        target.extend(bytes(length - len(target)))
+
+    position = HEADER.size
+    while position < len(patch):
+        offset, size = RECORD.unpack_from(patch, position)
+        position += RECORD.size
+        target[offset:offset + size] = patch[position:position + size]
+        position += size
+
+    return target
@@ -0,0 +1,98 @@
+# Django libraries
+from django.conf import settings as conf
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Python standard libraries
+import contextlib
+import contextvars
+import functools
+
+
+#
+# Read replica routing.
+#
+# Views wrapped with read_from_replica send their reads to the "replica" database
+# alias if one is configured.  Writes always go to the default database.  Everything
+# else reads from the default database as well.
+#
+# The replica lags behind the default database, so reads that must see a write go to
+# the default database too: reads inside a transaction, and every read after the
+# view's first write.
+#
+
+REPLICA_DB_ALIAS = 'replica'
+
+
+class _ReadRoute:
+    """
+    Where reads go inside one reads_from block.
+    """
+    def __init__(self, alias: str | None):
+        self.alias = alias
+        self.wrote = False
+
+
+_read_route = contextvars.ContextVar('read_route', default=None)
+
+
+def get_read_alias() -> str:
+    """
+    Get the database alias that reads are currently routed to.
+
+    :return: Database alias
+    """
+    route = _read_route.get()
+    if route is None or route.wrote or route.alias not in conf.DATABASES:
+        return DEFAULT_DB_ALIAS
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return DEFAULT_DB_ALIAS
+    return route.alias
+
+
+@contextlib.contextmanager
+def reads_from(alias: str | None):
+    """
+    Context manager that routes reads to the given database alias.
+
+    :param alias: Database alias, or None for the default database
+    """
+    token = _read_route.set(_ReadRoute(alias))
+    try:
+        yield
+    finally:
+        _read_route.reset(token)
+
+
+def read_from_replica(view_func):
+    """
+    Decorator for read-only views that routes their reads to the replica database.
+
+    Has no effect if no replica is configured.
+    """
+    @functools.wraps(view_func)
+    def wrapped_view(request, *args, **kwargs):
+        with reads_from(REPLICA_DB_ALIAS):
+            return view_func(request, *args, **kwargs)
+    return wrapped_view
+
+
+class ReplicaRouter:
+    """
+    Database router that sends reads to the alias chosen by read_from_replica.
+    """
+    def db_for_read(self, model, **hints):
+        return get_read_alias()
+
+    def db_for_write(self, model, **hints):
+        route = _read_route.get()
+        if route is not None:
+            route.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same data as the default database.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives its schema from the default database.
+        return db != REPLICA_DB_ALIAS
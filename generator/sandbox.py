@@ -0,0 +1,140 @@
+# Django libraries
+from django.conf import settings as conf
+
+# Python standard libraries
+import multiprocessing
+import os
+import resource
+import traceback
+from typing import Any, Callable
+
+
+#
+# Run randomizer work in a short-lived child process.
+#
+# Web workers run other threads (async jobs, bundle pools), and forking a process with
+# threads can leave the child stuck on a lock that another thread held at the time of
+# the fork.  Children are instead forked from a single-threaded forkserver process that
+# has Django and the randomizer modules preloaded, so the function and its arguments
+# must be picklable.  The child runs under an address space limit and a wall-clock
+# deadline, and all memory used by the randomizer is returned to the OS when it exits.
+#
+
+# Modules imported by the forkserver before it forks any children.  Importing the WSGI
+# module sets up Django so the randomizer interface can be imported.
+SANDBOX_PRELOAD = ['ctjot.wsgi', 'generator.randomizerinterface']
+
+
+class GenerationTimeoutException(Exception):
+    """
+    Exception that is raised when sandboxed seed generation does not finish before its deadline.
+    """
+    pass
+
+
+class GenerationFailedException(Exception):
+    """
+    Exception that is raised when the sandboxed generation process dies without a result
+    (ex: it hit its memory limit).
+    """
+    pass
+
+
+def get_context():
+    """
+    Get the multiprocessing context that sandboxed children are started from.
+
+    :return: Forkserver multiprocessing context
+    """
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(SANDBOX_PRELOAD)
+    return context
+
+
+def start_sandbox_server():
+    """
+    Start this process's forkserver ahead of the first sandboxed call.  This is run in
+    each gunicorn worker so that the first seed a worker generates doesn't wait for the
+    forkserver to import Django and the randomizer.
+    """
+    from multiprocessing import forkserver
+    get_context()
+    forkserver.ensure_running()
+
+
+def get_address_space() -> int:
+    """
+    Get the current size of this process's address space.
+
+    :return: Address space size in bytes, or 0 if it is not available on this platform
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+
+def _run_child(conn, func: Callable[..., Any], args: tuple, memory_limit: int):
+    """
+    Entry point of the sandboxed child process.
+
+    :param conn: Pipe connection used to send the result back to the parent
+    :param func: Function to run
+    :param args: Arguments for the function
+    :param memory_limit: Memory in bytes the function may allocate on top of what the
+                         child already uses, or 0 for no limit
+    """
+    try:
+        if memory_limit:
+            limit = get_address_space() + memory_limit
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        conn.send((True, func(*args)))
+    except MemoryError:
+        conn.send((False, GenerationFailedException('Seed generation ran out of memory.')))
+    except Exception as e:
+        # Send the original exception back so the caller can handle it as if the
+        # function had been run in process.
+        try:
+            conn.send((False, e))
+        except Exception:
+            conn.send((False, GenerationFailedException(traceback.format_exc())))
+    finally:
+        conn.close()
+
+
+def run_sandboxed(func: Callable[..., Any], *args) -> Any:
+    """
+    Run a function in a sandboxed child process and return its result.
+
+    The function must be defined at module level, and its arguments and return value
+    must be picklable.  Exceptions raised by the function are re-raised here.
+
+    :param func: Function to run
+    :param args: Arguments for the function
+    :return: Return value of the function
+    """
+    context = get_context()
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=_run_child,
+                              args=(child_conn, func, args, conf.GENERATION_SANDBOX_MEMORY_LIMIT * 1024 * 1024),
+                              daemon=True)
+    process.start()
+    # Close the parent's copy of the child end so a dead child shows up as EOF.
+    child_conn.close()
+
+    try:
+        if not parent_conn.poll(conf.GENERATION_SANDBOX_TIMEOUT):
+            raise GenerationTimeoutException('Seed generation took too long. Try different settings.')
+        success, result = parent_conn.recv()
+    except EOFError:
+        raise GenerationFailedException('Seed generation failed unexpectedly.')
+    finally:
+        parent_conn.close()
+        if process.is_alive():
+            process.kill()
+        process.join()
+
+    if not success:
+        raise result
+    return result
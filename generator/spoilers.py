@@ -0,0 +1,251 @@
+# Django libraries
+from django.conf import settings as conf
+from django.http import HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from wsgiref.util import FileWrapper
+
+from .artifacts import open_artifact, put_artifact
+from .compression import content_encodings, get_accepted_encoding, parse_quality_header
+from .models import Game
+from .randomizerinterface import RandomizerInterface
+from .replay import get_config
+
+# Python standard libraries
+import functools
+import json
+import pickle
+
+# Other libraries
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+#
+# Cached spoiler log artifacts.
+#
+# Spoiler logs never change once a seed is generated, so each log is written once
+# to the artifact store along with precompressed copies.  Requests are streamed from
+# the variant matching the client's Accept-Encoding instead of being rebuilt and
+# compressed on every call.
+#
+# Tools that poll the JSON log can request only some of its sections and a compact
+# encoding.  These are served from a per-worker cache of parsed logs.
+#
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Spoiler log format (file extension) to content type and the RandomizerInterface
+# method that writes the log.
+spoiler_log_formats = {
+    'txt': ('text/plain', RandomizerInterface.get_spoiler_log),
+    'json': ('application/json', RandomizerInterface.get_json_spoiler_log)
+}
+
+# Media types that select a MessagePack encoding of the JSON spoiler log.
+msgpack_media_types = ('application/msgpack', 'application/x-msgpack')
+
+
+def get_spoiler_log_key(share_id: str, log_format: str) -> str:
+    """
+    Get the artifact key of a seed's spoiler log.
+
+    :param share_id: Share ID of the seed
+    :param log_format: Spoiler log format, one of the keys of spoiler_log_formats
+    :return: Artifact key of the uncompressed spoiler log
+    """
+    return f'seeds/{share_id}/spoiler_log.{log_format}'
+
+
+def put_compressed_artifact(key: str, data: bytes):
+    """
+    Write an artifact along with a precompressed copy for each supported content encoding.
+
+    :param key: Artifact key
+    :param data: Uncompressed artifact data
+    """
+    for suffix, compress in content_encodings.values():
+        put_artifact(key + suffix, compress(data))
+    # The uncompressed artifact is written last so that its presence means all variants exist.
+    put_artifact(key, data)
+
+
+def build_spoiler_log(game: Game, log_format: str) -> bytes:
+    """
+    Write a seed's spoiler log and its compressed copies to the artifact store.
+
+    :param game: Game object for the seed
+    :param log_format: Spoiler log format, one of the keys of spoiler_log_formats
+    :return: Uncompressed spoiler log data
+    """
+    content_type, write_log = spoiler_log_formats[log_format]
+    data = write_log(get_config(game), pickle.loads(game.get_settings_data())).getvalue().encode()
+    put_compressed_artifact(get_spoiler_log_key(game.share_id, log_format), data)
+    return data
+
+
+def stream_artifact(request: HttpRequest, key: str, content_type: str, build) -> StreamingHttpResponse:
+    """
+    Stream a compressible artifact using the best encoding the client accepts.
+
+    :param request: Request being served
+    :param key: Artifact key of the uncompressed data
+    :param content_type: Content type of the uncompressed data
+    :param build: Function that writes the artifact and its compressed copies if it is not cached
+    :return: StreamingHttpResponse for the artifact
+    """
+    encoding = get_accepted_encoding(request)
+    variant_key = key + content_encodings[encoding][0] if encoding else key
+
+    artifact = open_artifact(variant_key)
+    if artifact is None:
+        build()
+        artifact = open_artifact(variant_key)
+
+    response = StreamingHttpResponse(FileWrapper(artifact, STREAM_CHUNK_SIZE), content_type=content_type)
+    response['Content-Length'] = artifact.size
+    if encoding:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def spoiler_log_response(request: HttpRequest, game: Game, log_format: str) -> StreamingHttpResponse:
+    """
+    Stream a seed's spoiler log from the artifact store, building it on first use.
+
+    May raise ReplayVersionException if the log has to be built and the seed's config
+    can no longer be rebuilt.
+
+    :param request: Request being served
+    :param game: Game object for the seed
+    :param log_format: Spoiler log format, one of the keys of spoiler_log_formats
+    :return: StreamingHttpResponse with the spoiler log
+    """
+    content_type, _ = spoiler_log_formats[log_format]
+    return stream_artifact(request, get_spoiler_log_key(game.share_id, log_format), content_type,
+                           lambda: build_spoiler_log(game, log_format))
+
+
+def build_web_spoiler_log(game: Game) -> bytes:
+    """
+    Write the spoiler tables shown on a seed's share page and their compressed copies
+    to the artifact store.
+
+    :param game: Game object for the seed
+    :return: Uncompressed JSON data
+    """
+    data = json.dumps(RandomizerInterface.get_web_spoiler_log(get_config(game)), separators=(',', ':')).encode()
+    put_compressed_artifact(f'seeds/{game.share_id}/web_spoiler_log.json', data)
+    return data
+
+
+def web_spoiler_log_response(request: HttpRequest, game: Game) -> StreamingHttpResponse:
+    """
+    Stream the spoiler tables for a seed's share page, building them on first use.
+
+    May raise ReplayVersionException if the tables have to be built and the seed's config
+    can no longer be rebuilt.
+
+    :param request: Request being served
+    :param game: Game object for the seed
+    :return: StreamingHttpResponse with the spoiler tables as JSON
+    """
+    return stream_artifact(request, f'seeds/{game.share_id}/web_spoiler_log.json', 'application/json',
+                           lambda: build_web_spoiler_log(game))
+
+
+def accepts_msgpack(request: HttpRequest) -> bool:
+    """
+    Check whether the client asked for a MessagePack response.
+
+    :param request: Request with an optional Accept header
+    :return: True if MessagePack is available and accepted by the client
+    """
+    if msgpack is None:
+        return False
+    accepted = parse_quality_header(request.headers.get('Accept', ''))
+    return any(accepted.get(media_type, 0) > 0 for media_type in msgpack_media_types)
+
+
+@functools.lru_cache(maxsize=conf.SPOILER_CACHE_SIZE)
+def _parse_json_spoiler_log(share_id: str) -> dict:
+    """
+    Load and parse a cached JSON spoiler log.
+
+    Raises LookupError if the log has not been built yet.  Exceptions are not cached,
+    so the log is picked up once it is built.
+
+    :param share_id: Share ID of the seed
+    :return: Parsed JSON spoiler log.  Callers must not modify it.
+    """
+    artifact = open_artifact(get_spoiler_log_key(share_id, 'json'))
+    if artifact is None:
+        raise LookupError(share_id)
+    with artifact:
+        return json.load(artifact)
+
+
+def get_json_spoiler_data(game: Game) -> dict:
+    """
+    Get a seed's parsed JSON spoiler log, building it on first use.
+
+    :param game: Game object for the seed
+    :return: Parsed JSON spoiler log.  Callers must not modify it.
+    """
+    try:
+        return _parse_json_spoiler_log(game.share_id)
+    except LookupError:
+        build_spoiler_log(game, 'json')
+        return _parse_json_spoiler_log(game.share_id)
+
+
+@functools.lru_cache(maxsize=conf.SPOILER_CACHE_SIZE)
+def _encode_json_spoiler_projection(share_id: str, fields: tuple[str, ...] | None, use_msgpack: bool) -> bytes:
+    """
+    Encode the requested sections of a cached JSON spoiler log.
+
+    Raises LookupError if the log has not been built yet.
+
+    :param share_id: Share ID of the seed
+    :param fields: Top level sections to include, or None for all of them
+    :param use_msgpack: Encode with MessagePack instead of minified JSON
+    :return: Encoded spoiler log data
+    """
+    spoiler_log = _parse_json_spoiler_log(share_id)
+    if fields is not None:
+        spoiler_log = {field: spoiler_log[field] for field in fields}
+    if use_msgpack:
+        return msgpack.packb(spoiler_log)
+    return json.dumps(spoiler_log, separators=(',', ':')).encode()
+
+
+def json_spoiler_projection_response(request: HttpRequest, game: Game) -> HttpResponse:
+    """
+    Respond with selected sections of a seed's JSON spoiler log in a compact encoding.
+
+    Sections are selected with a comma separated ?fields= query parameter.  The response
+    is MessagePack if the client's Accept header asks for it and minified JSON otherwise.
+
+    May raise ReplayVersionException if the log has to be built and the seed's config
+    can no longer be rebuilt.
+
+    :param request: Request being served
+    :param game: Game object for the seed
+    :return: HttpResponse with the encoded spoiler log sections
+    """
+    spoiler_log = get_json_spoiler_data(game)
+    fields = None
+    if request.GET.get('fields'):
+        fields = tuple(dict.fromkeys(field.strip() for field in request.GET['fields'].split(',') if field.strip()))
+        unknown_fields = [field for field in fields if field not in spoiler_log]
+        if unknown_fields:
+            return JsonResponse({'error': 'Unknown spoiler log fields: ' + ', '.join(unknown_fields),
+                                 'fields': list(spoiler_log)}, status=400)
+
+    use_msgpack = accepts_msgpack(request)
+    response = HttpResponse(_encode_json_spoiler_projection(game.share_id, fields, use_msgpack),
+                            content_type=msgpack_media_types[0] if use_msgpack else 'application/json')
+    patch_vary_headers(response, ('Accept',))
+    return response
@@ -0,0 +1,100 @@
+# Django libraries
+from django.conf import settings as conf
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+# Python standard libraries
+import contextlib
+import threading
+
+
+#
+# SQLite tuning for single-node deployments.
+#
+# Every new SQLite connection is switched to write-ahead logging so that readers don't
+# block behind writers, waits for locks instead of failing with "database is locked",
+# and gets a larger page cache and memory mapped reads.  Postgres connections are left
+# alone.
+#
+# The pragmas are applied once per connection.  With CONN_MAX_AGE set, Django keeps one
+# persistent connection per worker thread, so this is not a connection pool; it only
+# avoids reconnecting and re-running the pragmas on every request.
+#
+# SQLite only allows one writer at a time, so game inserts from the threads of a worker
+# are also serialized in-process with write_lock rather than contending for the
+# database lock.  Django starts SQLite transactions as DEFERRED, and a transaction that
+# reads before it writes fails right away with "database is locked" if another process
+# wrote in between; the busy timeout does not apply to that upgrade.  serialize_writes
+# therefore takes the database write lock as the first statement of the transaction,
+# which does wait for the busy timeout.
+#
+
+JOURNAL_MODES = ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF')
+SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+write_lock = threading.Lock()
+
+
+def get_sqlite_pragmas() -> list[str]:
+    """
+    Get the PRAGMA statements run on every new SQLite connection.
+
+    :return: List of PRAGMA statements
+    """
+    journal_mode = conf.SQLITE_JOURNAL_MODE.upper()
+    if journal_mode not in JOURNAL_MODES:
+        raise ImproperlyConfigured('SQLITE_JOURNAL_MODE must be one of ' + ', '.join(JOURNAL_MODES))
+    synchronous = conf.SQLITE_SYNCHRONOUS.upper()
+    if synchronous not in SYNCHRONOUS_MODES:
+        raise ImproperlyConfigured('SQLITE_SYNCHRONOUS must be one of ' + ', '.join(SYNCHRONOUS_MODES))
+
+    return [
+        f'PRAGMA journal_mode={journal_mode}',
+        f'PRAGMA synchronous={synchronous}',
+        f'PRAGMA busy_timeout={int(conf.SQLITE_BUSY_TIMEOUT)}',
+        f'PRAGMA mmap_size={int(conf.SQLITE_MMAP_SIZE)}',
+        f'PRAGMA cache_size={int(conf.SQLITE_CACHE_SIZE)}',
+    ]
+
+
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """
+    connection_created signal receiver that applies the SQLite pragmas to new connections.
+
+    :param sender: Database wrapper class
+    :param connection: Newly created database connection
+    """
+    if connection.vendor != 'sqlite':
+        return
+
+    with connection.cursor() as cursor:
+        for pragma in get_sqlite_pragmas():
+            cursor.execute(pragma)
+
+
+@contextlib.contextmanager
+def serialize_writes(using: str = DEFAULT_DB_ALIAS):
+    """
+    Context manager for a write transaction that is serialized on SQLite.
+
+    On SQLite, the in-process write lock is held for the whole transaction (unless
+    SQLITE_WRITE_LOCK is disabled) and the database write lock is taken up front.  On
+    other databases this is the same as transaction.atomic.
+
+    :param using: Alias of the database being written to
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    with write_lock if conf.SQLITE_WRITE_LOCK else contextlib.nullcontext():
+        outermost = not connection.in_atomic_block
+        with transaction.atomic(using=using):
+            if outermost:
+                # A write that changes nothing, so the transaction holds the write lock
+                # before its first read.
+                with connection.cursor() as cursor:
+                    cursor.execute('DELETE FROM django_migrations WHERE 0')
+            yield
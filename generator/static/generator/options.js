@@ -289,15 +289,32 @@ function validateDupCharChoices() {
  * Pre-submit preparation for the form.
  *   - Validate duplicate character choices
  *   - Populate the hidden field with duplicate character information
+ *   - Populate the CSRF token from its cookie
  */
 function prepareForm() {
   if (!validateDupCharChoices()) {
     return false;
   }
   encodeDuplicateCharacterChoices();
+  setCsrfToken();
   return true;
 }
 
+/*
+ * Copy the CSRF token from its cookie into the form.
+ * The options page is cached and shared by all users, so the token is not
+ * rendered into the page.
+ */
+function setCsrfToken() {
+  for (const cookie of document.cookie.split(';')) {
+    var [name, value] = cookie.trim().split('=');
+    if (name === 'csrftoken') {
+      $('#csrf_token_input').val(decodeURIComponent(value));
+      return;
+    }
+  }
+}
+
 /*
  * Called when a tab range slider is changed.  Update all tab values on the page.
  */
@@ -363,4 +380,108 @@ function updateMysterySettings() {
   for (const id of id_list_percentage) {
     document.getElementById(id + "_text").value = document.getElementById("id_" + id).value + "%"
   }
+
+  updateMysteryOdds();
+}
+
+var mysteryOddsTimer = null;
+var mysteryOddsQuery = null;
+var mysteryOdds = null;
+
+/*
+ * Request new mystery odds once the mystery sliders stop moving.
+ */
+function updateMysteryOdds() {
+  clearTimeout(mysteryOddsTimer);
+  mysteryOddsTimer = setTimeout(loadMysteryOdds, 200);
+}
+
+/*
+ * Fetch the odds for the current mystery weights from the server.
+ * Odds are only requested again when a weight has changed.
+ */
+function loadMysteryOdds() {
+  var query = $('#options-mystery input[type=range]').serialize();
+  if (query === mysteryOddsQuery) {
+    return;
+  }
+  mysteryOddsQuery = query;
+
+  $.getJSON($('#mystery_odds').data('url') + '?' + query)
+    .done(function(odds) {
+      // Ignore responses for weights that have since changed.
+      if (query === mysteryOddsQuery) {
+        showMysteryOdds(odds);
+      }
+    })
+    .fail(function(xhr) {
+      if (query !== mysteryOddsQuery) {
+        return;
+      }
+      // Ask again the next time a slider moves, even if the weights end up the same.
+      mysteryOddsQuery = null;
+      var errors = xhr.responseJSON ? xhr.responseJSON.errors : null;
+      $('#mystery_odds_status').text(errors ? Object.values(errors).flat().join(' ') : 'The odds could not be loaded.');
+    });
+}
+
+/*
+ * Get the label text of a mystery slider.
+ */
+function mysteryLabel(field) {
+  return $('label[for="id_' + field + '"]').text().replace(':', '');
+}
+
+/*
+ * Format a probability as a percentage.
+ */
+function formatOdds(probability) {
+  return (probability * 100).toFixed(1) + '%';
+}
+
+/*
+ * Show the mystery odds next to the weight sliders and fill in the flag summaries.
+ */
+function showMysteryOdds(odds) {
+  mysteryOdds = odds;
+  $('#mystery_odds_status').text('');
+
+  for (const group of Object.values(odds.choices)) {
+    for (const [field, probability] of Object.entries(group)) {
+      $('#' + field + '_odds').text(formatOdds(probability));
+    }
+  }
+
+  $('#mystery_flag_counts').text(odds.flag_counts
+    .map((probability, count) => count + ': ' + formatOdds(probability))
+    .filter((text, count) => odds.flag_counts[count] > 0)
+    .join(', '));
+
+  // Fill in the flag pair choices the first time the odds are shown.
+  for (const select of ['#mystery_pair_first', '#mystery_pair_second']) {
+    if ($(select).children().length === 0) {
+      $(select).append(odds.flag_fields.map(field => $('<option>').val(field).text(mysteryLabel(field))));
+    }
+  }
+  if ($('#mystery_pair_first').val() === $('#mystery_pair_second').val()) {
+    $('#mystery_pair_second').prop('selectedIndex', 1);
+  }
+  showMysteryPairOdds();
 }
+
+/*
+ * Show the odds of both of the chosen mystery flags being rolled.
+ */
+function showMysteryPairOdds() {
+  if (mysteryOdds === null) {
+    return;
+  }
+  var first = mysteryOdds.flag_fields.indexOf($('#mystery_pair_first').val());
+  var second = mysteryOdds.flag_fields.indexOf($('#mystery_pair_second').val());
+  $('#mystery_pair_odds').text('both rolled: ' + formatOdds(mysteryOdds.flag_pairs[first][second]));
+}
+
+// Load the mystery odds when the mystery tab is first opened.
+$(function() {
+  $('a[href="#options-mystery"]').on('shown.bs.tab', updateMysteryOdds);
+});
@@ -1,6 +1,7 @@
 // Change the spoiler log button between "Show" and "Hide"
 $(document).on('show.bs.collapse', '#spoiler_section', function(e) {
   document.getElementById('spoiler_log_button').value = 'Hide Spoiler Log';
+  loadSpoilerLog();
 });
 
 $(document).on('hide.bs.collapse', '#spoiler_section', function(e) {
@@ -32,3 +33,42 @@ function updateGameOptions() {
   preview = document.getElementById('background_selection_preview');
   preview.className = 'menuBackground' + selection;
 }
+
+/*
+ * Load the spoiler log tables the first time the spoiler section is shown.
+ * The share page is rendered without spoiler data so that it stays small and
+ * the spoilers are only computed for users that ask for them.
+ */
+var spoilerLogRequested = false;
+function loadSpoilerLog() {
+  if (spoilerLogRequested) {
+    return;
+  }
+  spoilerLogRequested = true;
+
+  $.getJSON($('#spoiler_section').data('url'))
+    .done(function(spoilerLog) {
+      addSpoilerRows('#key_item_table', spoilerLog.key_items, ['location', 'key']);
+      addSpoilerRows('#character_table', spoilerLog.characters, ['location', 'character', 'reassign']);
+      addSpoilerRows('#boss_table', spoilerLog.bosses, ['location', 'boss']);
+      $('#spoiler_log_status').remove();
+    })
+    .fail(function() {
+      spoilerLogRequested = false;
+      $('#spoiler_log_status').text('The spoiler log could not be loaded. Hide and show it again to retry.');
+    });
+}
+
+/*
+ * Append a row to a spoiler log table for each entry.
+ */
+function addSpoilerRows(table, entries, keys) {
+  var rows = entries.map(function(entry) {
+    var row = $('<tr>');
+    for (const key of keys) {
+      row.append($('<td>').text(entry[key]));
+    }
+    return row;
+  });
+  $(table).append(rows);
+}
@@ -0,0 +1,63 @@
+# Django libraries
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+from .compression import content_encodings
+
+# Python standard libraries
+import os
+
+
+#
+# Static file storage used in staging and production.
+#
+# Static files are collected once when the docker image is built.  File names get a
+# content hash so they can be cached indefinitely, and each compressible file gets a
+# precompressed .gz sibling that nginx serves with gzip_static.
+#
+
+# Encodings nginx can serve precompressed.  The nginx-proxy image has no brotli module,
+# so .br copies would never be sent.
+STATIC_ENCODINGS = ('gzip',)
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.html', '.json', '.svg', '.txt', '.ico')
+
+# Files smaller than this aren't worth compressing.
+COMPRESS_MIN_SIZE = 256
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage that also writes precompressed copies of the collected files.
+    """
+    # Missing manifest entries fall back to the unhashed name instead of raising an error.
+    manifest_strict = False
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        for name in list(paths) + list(self.hashed_files.values()):
+            if name and name.endswith(COMPRESSIBLE_EXTENSIONS) and self.exists(name):
+                self.compress_file(name)
+
+    def compress_file(self, name: str):
+        """
+        Write a precompressed copy of a collected file for each of STATIC_ENCODINGS.
+
+        Copies that would not be smaller than the original are skipped.
+
+        :param name: Name of the collected file
+        """
+        path = self.path(name)
+        if os.path.getsize(path) < COMPRESS_MIN_SIZE:
+            return
+
+        with open(path, 'rb') as infile:
+            data = infile.read()
+        for encoding in STATIC_ENCODINGS:
+            suffix, compress = content_encodings[encoding]
+            compressed = compress(data)
+            if len(compressed) < len(data):
+                with open(path + suffix, 'wb') as outfile:
+                    outfile.write(compressed)
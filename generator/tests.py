@@ -1,3 +1,1427 @@
-from django.test import TestCase
+from django.conf import settings as conf
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, TransactionTestCase, override_settings
 
-# Create your tests here.
+import copy
+import io
+import json
+import os
+import pathlib
+import random
+import tempfile
+import unittest
+
+from .artifacts import LocalStore
+from .rompatch import apply_patch, create_patch
+
+
+def randomizer_available() -> bool:
+    """
+    Check whether the randomizer submodule and the vanilla ROM are available.
+    Tests that run the randomizer are skipped without them.
+    """
+    return os.path.exists(os.path.join(conf.BASE_DIR, 'jetsoftime', 'sourcefiles', 'randomizer.py')) and \
+        os.path.exists(os.path.join(conf.INPUT_ROOT, 'ct.sfc'))
+
+
+class RomPatchTestCase(TestCase):
+    def test_patch_round_trip(self):
+        rgen = random.Random(0)
+        source = bytes(rgen.getrandbits(8) for _ in range(4096))
+        target = bytearray(source)
+        target[0:3] = b'abc'
+        target[1000:1200] = bytes(200)
+        target[-1] ^= 0xFF
+        patch = create_patch(source, target)
+        self.assertEqual(apply_patch(source, patch), target)
+        self.assertLess(len(patch), len(target))
+
+    def test_patch_changes_length(self):
+        source = bytes(range(256)) * 4
+        self.assertEqual(apply_patch(source, create_patch(source, source[:100])), source[:100])
+        longer = source + b'expanded'
+        self.assertEqual(apply_patch(source, create_patch(source, longer)), longer)
+
+
+class LocalStoreTestCase(TestCase):
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as root:
+            store = LocalStore(root)
+            self.assertIsNone(store.get('seeds/abc/base.patch'))
+            self.assertIsNone(store.open('seeds/abc/base.patch'))
+            store.put('seeds/abc/base.patch', b'patch data')
+            self.assertEqual(store.get('seeds/abc/base.patch'), b'patch data')
+            with store.open('seeds/abc/base.patch') as artifact:
+                self.assertEqual(artifact.size, 10)
+                self.assertEqual(artifact.read(), b'patch data')
+            self.assertTrue(store.exists('seeds/abc/base.patch'))
+            self.assertFalse(store.exists('seeds/abc'))
+
+    def test_key_outside_root(self):
+        with tempfile.TemporaryDirectory() as root:
+            with self.assertRaises(ValueError):
+                LocalStore(root).get('../outside')
+
+
+@unittest.skipUnless(os.environ.get('S3_TEST_ENDPOINT_URL'), 'Set S3_TEST_ENDPOINT_URL to test the S3 store')
+class S3StoreTestCase(TestCase):
+    def setUp(self):
+        from .artifacts import S3Store
+        import uuid
+
+        bucket = os.environ.get('S3_TEST_BUCKET', 'ctjot-test')
+        self.store = S3Store(bucket, f'test-{uuid.uuid4().hex}/', os.environ['S3_TEST_ENDPOINT_URL'],
+                             os.environ.get('S3_REGION', 'us-east-1'))
+        try:
+            self.store.client.head_bucket(Bucket=bucket)
+        except self.store.client.exceptions.ClientError:
+            self.store.client.create_bucket(Bucket=bucket)
+
+    def tearDown(self):
+        objects = self.store.client.list_objects_v2(Bucket=self.store.bucket, Prefix=self.store.prefix)
+        for s3_object in objects.get('Contents', []):
+            self.store.client.delete_object(Bucket=self.store.bucket, Key=s3_object['Key'])
+
+    def test_round_trip(self):
+        self.assertIsNone(self.store.get('seeds/abc/base.patch'))
+        self.assertIsNone(self.store.open('seeds/abc/base.patch'))
+        self.assertFalse(self.store.exists('seeds/abc/base.patch'))
+        self.store.put('seeds/abc/base.patch', b'patch data')
+        self.assertTrue(self.store.exists('seeds/abc/base.patch'))
+        self.assertEqual(self.store.get('seeds/abc/base.patch'), b'patch data')
+
+    def test_streaming(self):
+        data = os.urandom(3 * 1024 * 1024)
+        self.store.put('seeds/abc/base.sfc', data)
+        with self.store.open('seeds/abc/base.sfc') as artifact:
+            self.assertEqual(artifact.size, len(data))
+            chunks = iter(lambda: artifact.read(64 * 1024), b'')
+            self.assertEqual(b''.join(chunks), data)
+
+    def test_invalid_key(self):
+        with self.assertRaises(ValueError):
+            self.store.get('../outside')
+
+
+class StaticStorageTestCase(TestCase):
+    def test_compress_file(self):
+        from .storage import CompressedManifestStaticFilesStorage
+        import gzip
+
+        with tempfile.TemporaryDirectory() as root:
+            storage = CompressedManifestStaticFilesStorage(location=root)
+            data = b'body { color: red; }\n' * 100
+            pathlib.Path(root, 'site.css').write_bytes(data)
+            pathlib.Path(root, 'tiny.css').write_bytes(b'a{}')
+            storage.compress_file('site.css')
+            storage.compress_file('tiny.css')
+
+            # nginx only serves .gz copies.
+            self.assertEqual(sorted(os.listdir(root)), ['site.css', 'site.css.gz', 'tiny.css'])
+            self.assertEqual(gzip.decompress(pathlib.Path(root, 'site.css.gz').read_bytes()), data)
+
+
+@override_settings(RATELIMIT_ENABLED=0)
+class OptionsPageTestCase(TestCase):
+    def setUp(self):
+        from .views import _render_options_page
+
+        _render_options_page.cache_clear()
+        self.addCleanup(_render_options_page.cache_clear)
+
+    def test_rendered_once(self):
+        from django.template.loader import render_to_string
+        from unittest import mock
+        import gzip
+
+        with mock.patch('generator.views.render_to_string', wraps=render_to_string) as render:
+            page = self.client.get('/options/')
+            compressed_page = self.client.get('/options/', HTTP_ACCEPT_ENCODING='gzip')
+        render.assert_called_once()
+        self.assertEqual(page.status_code, 200)
+        self.assertIn('Accept-Encoding', page['Vary'])
+        self.assertEqual(compressed_page['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed_page.content), page.content)
+
+        # The cached page has no token in it, every visitor gets their own cookie instead.
+        self.assertIn(b'id="csrf_token_input" value=""', page.content)
+        self.assertTrue(page.cookies['csrftoken'].value)
+
+        with override_settings(DEBUG=True), mock.patch('generator.views.render_to_string',
+                                                       wraps=render_to_string) as render:
+            self.client.get('/options/')
+            self.client.get('/options/')
+        self.assertEqual(render.call_count, 2)
+
+    def test_csrf_token_from_cookie(self):
+        from django.test import Client
+
+        client = Client(enforce_csrf_checks=True)
+        token = client.get('/options/').cookies['csrftoken'].value
+
+        # options.js copies the cookie into the form's hidden token field on submit.
+        self.assertEqual(client.post('/generate-rom/', {}).status_code, 403)
+        response = client.post('/generate-rom/', {'csrfmiddlewaretoken': token})
+        self.assertNotEqual(response.status_code, 403)
+        self.assertTemplateUsed(response, 'generator/error.html')
+
+
+class ValidationTestCase(TestCase):
+    def test_fragment_total(self):
+        from .validation import FRAGMENT_TOTAL_MAX, validate_settings_data
+
+        data = {'bucket_fragments': True, 'fragments_required': 30, 'extra_fragments': FRAGMENT_TOTAL_MAX - 30}
+        self.assertEqual(validate_settings_data(data), {})
+        errors = validate_settings_data({**data, 'extra_fragments': FRAGMENT_TOTAL_MAX - 29})
+        self.assertEqual(list(errors), ['extra_fragments'])
+
+        # The total is only checked if bucket fragments can be turned on.
+        self.assertEqual(validate_settings_data({**data, 'bucket_fragments': False, 'extra_fragments': 50}), {})
+        self.assertIn('extra_fragments', validate_settings_data(
+            {**data, 'bucket_fragments': False, 'extra_fragments': 50, 'mystery_seed': True,
+             'mystery_bucket_fragments': 10}))
+
+    def test_choices_and_ranges(self):
+        from .validation import validate_settings_data
+
+        data = {'game_mode': 'standard', 'item_difficulty': 'normal', 'power_tab_min': 2, 'power_tab_max': 4,
+                'fragments_required': 10, 'extra_fragments': 5}
+        self.assertEqual(validate_settings_data(data), {})
+
+        errors = validate_settings_data({**data, 'game_mode': 'vanilla', 'power_tab_max': 10, 'fragments_required': -1})
+        self.assertEqual(sorted(errors), ['fragments_required', 'game_mode', 'power_tab_max'])
+        self.assertEqual(validate_settings_data({**data, 'power_tab_min': 5}),
+                         {'power_tab_min': ['Minimum tab value cannot be greater than the maximum.']})
+
+        # Fields that failed type checking are missing and are not checked again.
+        self.assertEqual(validate_settings_data({'power_tab_min': 5}), {})
+
+    def test_duplicate_chars(self):
+        from .validation import validate_settings_data
+
+        self.assertEqual(validate_settings_data({'duplicate_char_assignments': '7F7F7F7F7F7F7F'}), {})
+        self.assertIn('duplicate_char_assignments', validate_settings_data({'duplicate_char_assignments': 'xyz'}))
+
+        # A character with no selections only matters if duplicate characters can be on.
+        data = {'duplicate_char_assignments': '7F007F7F7F7F7F'}
+        self.assertEqual(validate_settings_data(data), {})
+        self.assertIn('duplicate_char_assignments', validate_settings_data({**data, 'duplicate_characters': True}))
+        self.assertIn('duplicate_char_assignments', validate_settings_data(
+            {**data, 'mystery_seed': True, 'mystery_duplicate_characters': 50}))
+
+    def test_mystery(self):
+        from .validation import validate_settings_data
+
+        data = {'mystery_item_difficulty_easy': 0, 'mystery_item_difficulty_normal': 0,
+                'mystery_item_difficulty_hard': 0, 'mystery_bucket_fragments': 150}
+        # Mystery settings are only checked for mystery seeds.
+        self.assertEqual(validate_settings_data(data), {})
+
+        errors = validate_settings_data({**data, 'mystery_seed': True})
+        self.assertEqual(sorted(errors), ['mystery_bucket_fragments', 'mystery_item_difficulty_easy'])
+        errors = validate_settings_data({**data, 'mystery_seed': True, 'mystery_item_difficulty_hard': -1,
+                                         'mystery_item_difficulty_normal': 1, 'mystery_bucket_fragments': 0})
+        self.assertEqual(errors, {'mystery_item_difficulty_hard': ['Mystery weights must be between 0 and 100.']})
+        errors = validate_settings_data({**data, 'mystery_seed': True, 'mystery_item_difficulty_hard': 10 ** 400,
+                                         'mystery_bucket_fragments': 0})
+        self.assertEqual(errors, {'mystery_item_difficulty_hard': ['Mystery weights must be between 0 and 100.']})
+
+
+class BlobTestCase(TestCase):
+    def test_store_dedup(self):
+        from .models import Blob, Game
+
+        first = Blob.store(b'settings')
+        self.assertEqual(Blob.store(b'settings'), first)
+        self.assertEqual((first.size, bytes(first.data)), (8, b'settings'))
+        self.assertNotEqual(Blob.store(b'other settings'), first)
+        self.assertEqual(Blob.objects.count(), 2)
+
+        one = Game.create(share_id='one', settings=b'settings', configuration=b'config')
+        two = Game.create(share_id='two', settings=b'settings', configuration=None)
+        self.assertEqual(one.settings_blob, two.settings_blob)
+        self.assertIsNone(two.configuration_blob)
+        self.assertEqual(Blob.objects.count(), 3)
+        self.assertEqual(bytes(Game.objects.get(share_id='one').get_configuration_data()), b'config')
+
+    def test_backfill_and_reverse(self):
+        from .models import Blob, Game
+        from django.apps import apps
+        import importlib
+
+        migration = importlib.import_module('generator.migrations.0009_backfill_blobs')
+        Game.objects.create(share_id='full', settings=b'settings', configuration=b'config')
+        Game.objects.create(share_id='replay', settings=b'settings', configuration=None)
+
+        migration.backfill_blobs(apps, None)
+        for game in Game.objects.all():
+            self.assertIsNone(game.settings)
+            self.assertIsNone(game.configuration)
+            self.assertEqual(bytes(game.get_settings_data()), b'settings')
+        self.assertEqual(bytes(Game.objects.get(share_id='full').get_configuration_data()), b'config')
+        self.assertIsNone(Game.objects.get(share_id='replay').configuration_blob)
+        self.assertEqual(Blob.objects.count(), 2)
+
+        migration.restore_inline_data(apps, None)
+        full = Game.objects.get(share_id='full')
+        self.assertEqual((bytes(full.settings), bytes(full.configuration)), (b'settings', b'config'))
+        self.assertIsNone(full.settings_blob)
+        self.assertIsNone(full.configuration_blob)
+        replay = Game.objects.get(share_id='replay')
+        self.assertEqual((bytes(replay.settings), replay.configuration), (b'settings', None))
+
+    def test_blob_stats(self):
+        from .models import Game
+        from django.core.management import call_command
+        import io
+
+        for share_id in ('one', 'two', 'three'):
+            Game.create(share_id=share_id, settings=b'settings', configuration=share_id.encode())
+        Game.objects.create(share_id='inline', settings=b'inline')
+
+        output = io.StringIO()
+        call_command('blob_stats', stdout=output)
+        lines = output.getvalue().splitlines()
+        self.assertIn('Blobs stored:      4 (19 bytes)', lines)
+        self.assertIn('Blob references:   6 (35 bytes)', lines)
+        self.assertIn('Dedupe ratio:      1.50x by count, 1.84x by size', lines)
+        self.assertIn('Games not yet backfilled: 1', lines)
+
+
+class ConcurrentInsertTestCase(TransactionTestCase):
+    def test_concurrent_game_inserts(self):
+        from .models import Blob, Game
+        from concurrent.futures import ThreadPoolExecutor
+        from django.db import connections
+        import pickle
+
+        def create_games(thread: int):
+            try:
+                for i in range(10):
+                    # Every game shares its settings blob with the games of the other threads.
+                    Game.create(share_id=f'{thread}-{i}', settings=pickle.dumps({'shared': i}),
+                                configuration=pickle.dumps({'config': (thread, i)}))
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(create_games, range(4)))
+
+        self.assertEqual(Game.objects.count(), 40)
+        self.assertEqual(Blob.objects.count(), 50)
+
+
+@override_settings(PRACTICE_POOL_CLAIM_ATTEMPTS=3)
+class PracticePoolTestCase(TransactionTestCase):
+    def setUp(self):
+        from .randomizerinterface import rset
+        from .views import get_cached_settings
+        from unittest import mock
+        import pickle
+
+        patcher = mock.patch('generator.randomizerinterface.RandomizerInterface.get_web_spoiler_log',
+                             return_value=PlacementTestCase.spoiler_log)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        get_cached_settings.cache_clear()
+        self.addCleanup(get_cached_settings.cache_clear)
+
+        self.create_game('parent', settings=pickle.dumps(rset.Settings()))
+        for i in range(4):
+            self.create_game(f'pooled-{i}', parent_share_id='parent', pooled=True)
+
+    @staticmethod
+    def create_game(share_id: str, **kwargs):
+        from .models import Game
+        import pickle
+
+        kwargs.setdefault('settings', pickle.dumps({}))
+        return Game.create(share_id=share_id, configuration=pickle.dumps({}), **kwargs)
+
+    def test_claim(self):
+        from .models import Game
+        from .views import claim_pooled_practice_seed
+
+        claimed = [claim_pooled_practice_seed('parent') for _ in range(4)]
+        self.assertEqual(sorted(game.share_id for game in claimed), [f'pooled-{i}' for i in range(4)])
+        self.assertFalse(Game.objects.filter(pooled=True).exists())
+        # Claimed seeds are added to the placement index.
+        self.assertEqual(PlacementTestCase.indexed_share_ids(), [f'pooled-{i}' for i in range(4)])
+
+        # A seed is never handed out twice, and an empty pool falls back to generation.
+        self.assertIsNone(claim_pooled_practice_seed('parent'))
+        self.assertIsNone(claim_pooled_practice_seed('other'))
+
+    def test_claimed_by_another_worker(self):
+        from .models import Game
+        from .views import claim_pooled_practice_seed
+        from django.db.models import QuerySet
+        from unittest import mock
+
+        # Another worker claims the first two candidates after this one has listed them.
+        update = QuerySet.update
+        lost = ['pooled-0', 'pooled-1']
+
+        def claim_first(queryset, **kwargs):
+            if lost:
+                update(Game.objects.filter(share_id=lost.pop(0)), pooled=False)
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', claim_first):
+            game = claim_pooled_practice_seed('parent')
+        self.assertEqual(game.share_id, 'pooled-2')
+        self.assertEqual(PlacementTestCase.indexed_share_ids(), ['pooled-2'])
+
+    def test_concurrent_claims(self):
+        from .views import claim_pooled_practice_seed
+        from concurrent.futures import ThreadPoolExecutor
+        from django.db import connections
+        from django.db.models import QuerySet
+        from unittest import mock
+        import threading
+
+        # Every worker lists the same candidates before any of them claims one.  The
+        # claims themselves are run one at a time, since the in-memory SQLite test
+        # database raises instead of waiting for a locked table.
+        barrier = threading.Barrier(8, timeout=10)
+        lock = threading.Lock()
+        claiming = threading.local()
+        update = QuerySet.update
+
+        def claim_after_listing(queryset, **kwargs):
+            if not getattr(claiming, 'locked', False):
+                barrier.wait()
+                lock.acquire()
+                claiming.locked = True
+            return update(queryset, **kwargs)
+
+        def claim(_):
+            try:
+                game = claim_pooled_practice_seed('parent')
+                return game and game.share_id
+            finally:
+                connections.close_all()
+                if getattr(claiming, 'locked', False):
+                    claiming.locked = False
+                    lock.release()
+
+        with mock.patch.object(QuerySet, 'update', claim_after_listing), ThreadPoolExecutor(max_workers=8) as executor:
+            claimed = list(executor.map(claim, range(8)))
+
+        # Each listed seed is handed out exactly once.  Workers that only listed seeds
+        # claimed by others give up after PRACTICE_POOL_CLAIM_ATTEMPTS.
+        self.assertEqual(sorted(filter(None, claimed)), ['pooled-0', 'pooled-1', 'pooled-2'])
+        self.assertEqual(claimed.count(None), 5)
+
+    def test_practice_seed_from_pool(self):
+        from .models import Game
+        from .views import generate_seed_from_id
+        from unittest import mock
+
+        with mock.patch('generator.views.RandomizerInterface') as interface:
+            game = generate_seed_from_id('parent')
+        interface.assert_not_called()
+        self.assertTrue(game.share_id.startswith('pooled-'))
+        self.assertEqual(Game.objects.count(), 5)
+
+
+@override_settings(RATELIMIT_ENABLED=0)
+class ApiTestCase(TestCase):
+    @staticmethod
+    def create_game(share_id: str, seed: str, race_seed: bool = False):
+        from .models import Game
+        from .randomizerinterface import rset
+        import pickle
+
+        settings = rset.Settings()
+        settings.seed = seed
+        return Game.create(share_id=share_id, race_seed=race_seed, settings=pickle.dumps(settings),
+                           configuration=pickle.dumps({}))
+
+    def post_generate(self, document):
+        return self.client.post('/api/generate/', json.dumps(document), content_type='application/json')
+
+    def test_invalid_documents(self):
+        response = self.client.post('/api/generate/', 'not json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
+        self.assertEqual(self.post_generate(['a list']).status_code, 400)
+
+        response = self.post_generate({'game_mode': 'not a mode'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('game_mode', response.json()['errors'])
+
+    def test_generate(self):
+        from .randomizerinterface import RandomizerInterface
+        from .sandbox import GenerationFailedException
+        from unittest import mock
+        import pickle
+
+        game = self.create_game('apigame', 'myseed')
+        with mock.patch('generator.views.generate_seed_from_form', return_value=game) as generate:
+            response = self.post_generate({'seed': 'myseed'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(generate.call_args.args[0].cleaned_data['seed'], 'myseed')
+        details = response.json()
+        self.assertEqual(details['share_id'], 'apigame')
+        self.assertEqual(details['seed'], 'myseed')
+        self.assertEqual(details['flag_string'],
+                         RandomizerInterface.get_flag_string(pickle.loads(game.get_settings_data())))
+        self.assertEqual(details['urls']['share'], 'http://testserver/share/apigame/')
+        self.assertIn('spoiler_log', details['urls'])
+
+        with mock.patch('generator.views.generate_seed_from_form', side_effect=GenerationFailedException('failed')):
+            response = self.post_generate({})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json(), {'error': 'failed'})
+
+    def test_race_seed_details(self):
+        from unittest import mock
+
+        game = self.create_game('racegame', 'myseed', race_seed=True)
+        with mock.patch('generator.views.generate_seed_from_form', return_value=game):
+            details = self.post_generate({'spoiler_log': False}).json()
+        self.assertTrue(details['race_seed'])
+        self.assertIsNone(details['seed'])
+        self.assertNotIn('spoiler_log', details['urls'])
+
+    def test_async_job(self):
+        from unittest import mock
+
+        submitted = []
+        with mock.patch('generator.views.job_executor.submit', lambda *args: submitted.append(args)):
+            response = self.post_generate({'async': True})
+        self.assertEqual(response.status_code, 202)
+        job = response.json()
+        self.assertEqual(job['status'], 'pending')
+        self.assertEqual(self.client.get(job['url']).json()['status'], 'pending')
+
+        # Run the queued job the way the executor would.
+        function, job_id, form = submitted[0]
+        game = self.create_game('asyncgame', 'seed')
+        with mock.patch('generator.views.generate_seed_from_form', return_value=game), \
+                mock.patch('generator.views.close_old_connections'):
+            function(job_id, form)
+        details = self.client.get(job['url']).json()
+        self.assertEqual(details['status'], 'complete')
+        self.assertEqual(details['game']['share_id'], 'asyncgame')
+
+        self.assertEqual(self.client.get('/api/job/missing/').status_code, 404)
+
+    def test_failed_and_orphaned_jobs(self):
+        from .models import GenerationJob
+        from .views import fail_orphaned_jobs, run_generation_job
+        from django.utils import timezone
+        from unittest import mock
+        import datetime
+
+        GenerationJob.objects.create(job_id='failing')
+        with mock.patch('generator.views.generate_seed_from_form', side_effect=ValueError('bad seed')), \
+                mock.patch('generator.views.close_old_connections'):
+            run_generation_job('failing', None)
+        self.assertEqual(self.client.get('/api/job/failing/').json(),
+                         {'job_id': 'failing', 'status': 'failed', 'url': 'http://testserver/api/job/failing/',
+                          'error': 'bad seed'})
+
+        # A job that outlived API_JOB_TIMEOUT was lost with its worker.
+        GenerationJob.objects.create(job_id='stale', status=GenerationJob.RUNNING)
+        GenerationJob.objects.create(job_id='recent')
+        GenerationJob.objects.filter(job_id='stale').update(
+            creation_date=timezone.now() - datetime.timedelta(seconds=conf.API_JOB_TIMEOUT + 1))
+        self.assertEqual(self.client.get('/api/job/stale/').json()['status'], 'failed')
+        self.assertEqual(self.client.get('/api/job/recent/').json()['status'], 'pending')
+
+        # On startup every unfinished job is failed.
+        self.assertEqual(fail_orphaned_jobs(), 1)
+        self.assertEqual(GenerationJob.objects.get(job_id='failing').error_text, 'bad seed')
+        self.assertEqual(set(GenerationJob.objects.values_list('status', flat=True)), {'failed'})
+
+
+class ArchiveTestCase(TestCase):
+    @staticmethod
+    def create_game(share_id: str, age_days: int, **kwargs):
+        from .models import Game
+        from django.utils import timezone
+        import datetime
+        import pickle
+
+        game = Game.create(share_id=share_id, settings=pickle.dumps({'settings': share_id}),
+                           configuration=pickle.dumps({'config': share_id}), **kwargs)
+        # creation_date is set on every save, so age the game with an update.
+        Game.objects.filter(id=game.id).update(creation_date=timezone.now() - datetime.timedelta(days=age_days))
+        return game
+
+    def test_archive_and_restore(self):
+        from .archive import archive_games, get_game
+        from .models import ArchivedGame, Game
+        from django.utils import timezone
+        import pickle
+
+        self.create_game('old1', 100, seed_nonce='nonce', randomizer_version='abc')
+        self.create_game('old2', 100, race_seed=True)
+        self.create_game('new', 1)
+        self.create_game('accessed', 100, last_access=timezone.now())
+        self.create_game('pooled', 100, pooled=True)
+
+        self.assertEqual(archive_games(30, 30, 1), 2)
+        self.assertEqual(sorted(ArchivedGame.objects.values_list('share_id', flat=True)), ['old1', 'old2'])
+        self.assertEqual(sorted(Game.objects.values_list('share_id', flat=True)), ['accessed', 'new', 'pooled'])
+
+        game = get_game('old1')
+        self.assertIsNone(game.id)
+        self.assertEqual((game.seed_nonce, game.randomizer_version, game.race_seed), ('nonce', 'abc', False))
+        self.assertEqual(pickle.loads(game.get_settings_data()), {'settings': 'old1'})
+        self.assertEqual(pickle.loads(game.get_configuration_data()), {'config': 'old1'})
+        self.assertTrue(get_game('old2').race_seed)
+        with self.assertRaises(Game.DoesNotExist):
+            get_game('missing')
+
+    def test_conflicting_share_id(self):
+        from .archive import archive_games
+        from .models import ArchivedGame, Game
+        from django.utils import timezone
+
+        ArchivedGame.objects.create(share_id='taken', creation_date=timezone.now(), data=b'')
+        self.create_game('taken', 100)
+        self.create_game('free', 100)
+
+        # The game whose share ID is already archived stays in the Game table.
+        self.assertEqual(archive_games(30, 30, 10), 1)
+        self.assertEqual(list(Game.objects.values_list('share_id', flat=True)), ['taken'])
+        self.assertEqual(ArchivedGame.objects.get(share_id='taken').data, b'')
+
+    def test_blob_pruning(self):
+        from .archive import archive_games
+        from .models import Blob, Game
+        from django.utils import timezone
+        import datetime
+
+        old = self.create_game('old', 100)
+        # The recent game shares the old game's settings blob.
+        Game.objects.filter(id=self.create_game('recent', 1).id).update(settings_blob=old.settings_blob)
+        Blob.objects.update(creation_date=timezone.now() - datetime.timedelta(days=2))
+        # A blob stored for a game that is being created right now.
+        new_blob = Blob.store(b'new game settings')
+
+        self.assertEqual(archive_games(30, 30, 10), 1)
+        recent = Game.objects.get(share_id='recent')
+        self.assertEqual(set(Blob.objects.values_list('digest', flat=True)),
+                         {old.settings_blob_id, recent.configuration_blob_id, new_blob.digest})
+
+    def test_share_id_not_reused(self):
+        from .models import ArchivedGame
+        from .views import get_share_id
+        from django.utils import timezone
+        from unittest import mock
+
+        ArchivedGame.objects.create(share_id='archived', creation_date=timezone.now(), data=b'')
+        with mock.patch('generator.views.nanoid.generate', side_effect=['archived', 'fresh']):
+            self.assertEqual(get_share_id(), 'fresh')
+
+    def test_access_log_flush(self):
+        from .archive import access_log
+        from .models import Game
+
+        self.create_game('viewed', 100)
+        access_log.flush()
+        with override_settings(ACCESS_LOG_FLUSH_SIZE=2):
+            access_log.record('viewed')
+            self.client.get('/ready/')
+            self.assertIsNone(Game.objects.get(share_id='viewed').last_access)
+            access_log.record('other')
+            # The buffer is full, so it is written when the next request finishes.
+            self.client.get('/ready/')
+            self.assertIsNotNone(Game.objects.get(share_id='viewed').last_access)
+
+    def test_access_log_fork(self):
+        from .archive import access_log
+
+        access_log.record('parent')
+        pid = os.fork()
+        if pid == 0:
+            # Only the parent owns the accesses recorded before the fork.
+            os._exit(0 if not access_log.share_ids else 1)
+        self.assertEqual(os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1]), 0)
+        self.assertIn('parent', access_log.share_ids)
+        access_log.reset()
+
+
+@override_settings(RATELIMIT_ENABLED=0)
+class PlacementTestCase(TestCase):
+    spoiler_log = {
+        'key_items': [{'location': 'Zenan Bridge', 'key': 'Gate Key'}, {'location': 'Denadoro', 'key': 'Hilt'}],
+        'characters': [{'location': 'Starting 1', 'character': 'Marle', 'reassign': 'Marle'}],
+        'bosses': [{'location': 'Zenan Bridge', 'boss': 'Zombor'}]
+    }
+
+    def setUp(self):
+        from unittest import mock
+
+        patcher = mock.patch('generator.randomizerinterface.RandomizerInterface.get_web_spoiler_log',
+                             return_value=self.spoiler_log)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def create_game(share_id: str, **kwargs):
+        from .models import Game
+        import pickle
+
+        return Game.create(share_id=share_id, settings=pickle.dumps({}), configuration=pickle.dumps({}), **kwargs)
+
+    @staticmethod
+    def indexed_share_ids() -> list[str]:
+        from .models import KeyItemPlacement
+        return sorted(set(KeyItemPlacement.objects.values_list('share_id', flat=True)))
+
+    def test_index(self):
+        from .models import BossPlacement, CharacterPlacement, KeyItemPlacement
+        from .placements import index_placements
+
+        index_placements(self.create_game('open'), None)
+        index_placements(self.create_game('race', race_seed=True), None)
+
+        self.assertEqual(self.indexed_share_ids(), ['open'])
+        self.assertEqual(sorted(KeyItemPlacement.objects.values_list('location', 'key_item')),
+                         [('Denadoro', 'Hilt'), ('Zenan Bridge', 'Gate Key')])
+        self.assertEqual(list(CharacterPlacement.objects.values_list('location', 'character')),
+                         [('Starting 1', 'Marle')])
+        self.assertEqual(list(BossPlacement.objects.values_list('location', 'boss')), [('Zenan Bridge', 'Zombor')])
+
+    def test_index_command(self):
+        from .models import KeyItemPlacement
+        from .placements import index_placements
+        from django.core.management import call_command
+
+        index_placements(self.create_game('indexed'), None)
+        self.create_game('open')
+        self.create_game('race', race_seed=True)
+        self.create_game('pooled', pooled=True)
+
+        call_command('index_placements', stdout=io.StringIO())
+        self.assertEqual(self.indexed_share_ids(), ['indexed', 'open'])
+        # Games that were already indexed are not indexed twice.
+        self.assertEqual(KeyItemPlacement.objects.filter(share_id='indexed').count(), 2)
+
+    def test_index_migration(self):
+        from .models import Game
+        from django.apps import apps
+        import importlib
+        import pickle
+
+        migration = importlib.import_module('generator.migrations.0011_index_placements')
+        self.create_game('open')
+        self.create_game('race', race_seed=True)
+        Game.create(share_id='replay', settings=pickle.dumps({}), configuration=None)
+
+        migration.index_existing_games(apps, None)
+        self.assertEqual(self.indexed_share_ids(), ['open'])
+
+    def test_search(self):
+        from .placements import index_placements
+
+        index_placements(self.create_game('first'), None)
+        index_placements(self.create_game('second'), None)
+        index_placements(self.create_game('race', race_seed=True), None)
+
+        response = self.client.get('/api/placements/key_items/', {'value': 'Gate Key'})
+        self.assertEqual(response.status_code, 200)
+        placements = response.json()['placements']
+        self.assertEqual([placement['share_id'] for placement in placements], ['second', 'first'])
+        self.assertEqual(placements[0]['location'], 'Zenan Bridge')
+
+        response = self.client.get('/api/placements/bosses/', {'location': 'Zenan Bridge', 'limit': 1})
+        self.assertEqual([placement['boss'] for placement in response.json()['placements']], ['Zombor'])
+
+        self.assertEqual(self.client.get('/api/placements/shops/', {'value': 'x'}).status_code, 404)
+        self.assertEqual(self.client.get('/api/placements/key_items/').status_code, 400)
+        self.assertEqual(self.client.get('/api/placements/key_items/', {'value': 'x', 'limit': 'all'}).status_code,
+                         400)
+
+    def test_archived_games_removed(self):
+        from .archive import archive_games
+        from .models import Game
+        from .placements import index_placements
+        from django.utils import timezone
+        import datetime
+
+        index_placements(self.create_game('old'), None)
+        index_placements(self.create_game('new'), None)
+        Game.objects.filter(share_id='old').update(creation_date=timezone.now() - datetime.timedelta(days=100))
+
+        self.assertEqual(archive_games(30, 30, 10), 1)
+        self.assertEqual(self.indexed_share_ids(), ['new'])
+
+
+class SeedStatsTestCase(TestCase):
+    def test_heatmap_merge(self):
+        from .management.commands.seed_stats import Heatmap
+
+        heatmap = Heatmap()
+        heatmap.add_placements([('Zenan Bridge', 'Gate Key'), ('Denadoro', 'Hilt'), ('Zenan Bridge', 'Gate Key')])
+        other = Heatmap()
+        other.add_placements([('Denadoro', 'Gate Key'), ('Zenan Bridge', 'Gate Key'), ('Giant\'s Claw', 'Tools')])
+        heatmap.merge(other)
+        heatmap.merge(Heatmap())
+
+        self.assertEqual(list(heatmap.rows), ['Zenan Bridge', 'Denadoro', 'Giant\'s Claw'])
+        self.assertEqual(list(heatmap.columns), ['Gate Key', 'Hilt', 'Tools'])
+        self.assertEqual(sorted(heatmap.nonzero()), [('Denadoro', 'Gate Key', 1), ('Denadoro', 'Hilt', 1),
+                                                     ('Giant\'s Claw', 'Tools', 1), ('Zenan Bridge', 'Gate Key', 3)])
+        self.assertEqual(heatmap.to_dict(4)['frequencies'][0], [0.75, 0.0, 0.0])
+
+    def test_csv_report(self):
+        from .randomizerinterface import RandomizerInterface
+        from django.core.management import call_command
+        from unittest import mock
+        import csv
+
+        spoiler_logs = [PlacementTestCase.spoiler_log,
+                        {**PlacementTestCase.spoiler_log, 'bosses': [{'location': 'Zenan Bridge', 'boss': 'Yakra'}]},
+                        ValueError('generation failed')]
+        with mock.patch('generator.management.commands.seed_stats.RandomizerInterface') as interface:
+            interface.get_default_settings_data = RandomizerInterface.get_default_settings_data
+            interface.get_web_spoiler_log.side_effect = spoiler_logs * 2
+            out, err = io.StringIO(), io.StringIO()
+            call_command('seed_stats', seeds=6, batch_size=4, workers=1, seed_prefix='stats-', format='csv',
+                         stdout=out, stderr=err)
+
+        self.assertEqual([call.args[0]['seed'] for call in interface.convert_data_to_settings.call_args_list],
+                         [f'stats-{number}' for number in range(6)])
+        self.assertIn('2 of 6 seeds failed to generate', err.getvalue())
+        self.assertIn('generation failed', err.getvalue())
+        rows = list(csv.reader(io.StringIO(out.getvalue())))
+        self.assertEqual(rows[0], ['category', 'location', 'value', 'count', 'frequency'])
+        self.assertIn(['key_items', 'Denadoro', 'Hilt', '4', '1.0'], rows)
+        self.assertIn(['bosses', 'Zenan Bridge', 'Zombor', '2', '0.5'], rows)
+        self.assertIn(['bosses', 'Zenan Bridge', 'Yakra', '2', '0.5'], rows)
+
+
+class ReplayVersionTestCase(TestCase):
+    def setUp(self):
+        from .models import Game
+        import pickle
+
+        # A game stored in replay mode by another randomizer version, with no config to fall back to.
+        self.game = Game.create(share_id='replay', settings=pickle.dumps({}), configuration=None,
+                                seed_nonce='nonce', randomizer_version='old')
+
+    def test_check_replay_version(self):
+        from .models import Game
+        from .randomizerinterface import RandomizerInterface
+        from .replay import ReplayVersionException, check_replay_version
+        import pickle
+
+        with self.assertRaises(ReplayVersionException):
+            check_replay_version(self.game)
+
+        self.game.randomizer_version = RandomizerInterface.get_randomizer_version()
+        check_replay_version(self.game)
+
+        # Games with a stored config never need the randomizer version to match.
+        check_replay_version(Game.create(share_id='full', settings=pickle.dumps({}),
+                                         configuration=pickle.dumps({}), randomizer_version='old'))
+
+    def test_gone_responses(self):
+        with tempfile.TemporaryDirectory() as artifact_root, override_settings(ARTIFACT_ROOT=artifact_root):
+            response = self.client.get('/share/replay/')
+            self.assertEqual(response.status_code, 410)
+            self.assertTemplateUsed(response, 'generator/error.html')
+
+            response = self.client.get('/share/replay/spoiler/')
+            self.assertEqual(response.status_code, 410)
+            self.assertIn('different version of the randomizer', response.json()['error'])
+
+    def test_rebuild_failure_responses(self):
+        from .randomizerinterface import RandomizerInterface
+        from .sandbox import GenerationTimeoutException
+        from unittest import mock
+
+        self.game.randomizer_version = RandomizerInterface.get_randomizer_version()
+        self.game.save()
+        with mock.patch('generator.replay._replay_config_data', side_effect=GenerationTimeoutException('timeout')):
+            response = self.client.get('/share/replay/')
+            self.assertEqual(response.status_code, 503)
+            self.assertTemplateUsed(response, 'generator/error.html')
+
+    def test_materialize_configs_version(self):
+        from .randomizerinterface import RandomizerInterface
+        from django.core.management import call_command
+        from unittest import mock
+
+        version = RandomizerInterface.get_randomizer_version()
+        out = io.StringIO()
+        call_command('materialize_configs', '--print-version', stdout=out)
+        self.assertEqual(out.getvalue().strip(), version)
+
+        with mock.patch('generator.management.commands.materialize_configs.get_config_data') as get_config_data:
+            call_command('materialize_configs', '--unless-version', version, stdout=io.StringIO())
+            get_config_data.assert_not_called()
+
+
+class SpoilerLogTestCase(TestCase):
+    def setUp(self):
+        from . import spoilers
+        from unittest import mock
+
+        artifact_root = tempfile.TemporaryDirectory()
+        self.addCleanup(artifact_root.cleanup)
+        self.artifact_root = pathlib.Path(artifact_root.name)
+        settings_override = override_settings(ARTIFACT_ROOT=artifact_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.write_txt_log = mock.Mock(side_effect=lambda config, settings: io.StringIO('Spoiler log\n'))
+        self.write_json_log = mock.Mock(side_effect=lambda config, settings: io.StringIO(json.dumps(
+            {'key_items': {'Zenan Bridge': 'Gate Key'}, 'characters': {'Starting 1': 'Marle'}, 'seed': 'spoiler'})))
+        patcher = mock.patch.dict(spoilers.spoiler_log_formats, {'txt': ('text/plain', self.write_txt_log),
+                                                                  'json': ('application/json', self.write_json_log)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        spoilers._parse_json_spoiler_log.cache_clear()
+        spoilers._encode_json_spoiler_projection.cache_clear()
+
+        self.create_game('open')
+        self.create_game('race', race_seed=True)
+
+    @staticmethod
+    def create_game(share_id: str, **kwargs):
+        from .models import Game
+        import pickle
+
+        return Game.create(share_id=share_id, settings=pickle.dumps({}), configuration=pickle.dumps({}), **kwargs)
+
+    def artifact_names(self) -> list[str]:
+        return sorted(path.name for path in self.artifact_root.rglob('*') if path.is_file())
+
+    def test_built_on_first_request(self):
+        import gzip
+
+        self.assertEqual(self.artifact_names(), [])
+        response = self.client.get('/spoiler_log/open.txt', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), b'Spoiler log\n')
+        self.assertIn('spoiler_log.txt', self.artifact_names())
+        self.assertIn('spoiler_log.txt.gz', self.artifact_names())
+
+        # Later requests stream the stored log, in any encoding, without rebuilding it.
+        response = self.client.get('/spoiler_log/open.txt')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(int(response['Content-Length']), len(b'Spoiler log\n'))
+        self.assertEqual(b''.join(response.streaming_content), b'Spoiler log\n')
+        self.write_txt_log.assert_called_once()
+
+        response = self.client.get('/spoiler_log/open.json')
+        self.assertEqual(json.loads(b''.join(response.streaming_content))['seed'], 'spoiler')
+        self.client.get('/spoiler_log/open.json')
+        self.write_json_log.assert_called_once()
+
+    def test_race_seed_refused(self):
+        response = self.client.get('/spoiler_log/race.txt')
+        self.assertEqual(response.status_code, 404)
+        self.assertTemplateUsed(response, 'generator/error.html')
+        self.assertEqual(self.client.get('/spoiler_log/race.json').json(), {'cheating': 'not_allowed'})
+        self.assertEqual(self.client.get('/share/race/spoiler/').status_code, 404)
+
+        # Nothing is built or stored for a race seed.
+        self.write_txt_log.assert_not_called()
+        self.write_json_log.assert_not_called()
+        self.assertEqual(self.artifact_names(), [])
+
+    def test_fields_projection(self):
+        response = self.client.get('/spoiler_log/open.json?fields=seed, key_items,seed')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.content, b'{"seed":"spoiler","key_items":{"Zenan Bridge":"Gate Key"}}')
+        self.assertIn('Accept', response['Vary'])
+
+        response = self.client.get('/spoiler_log/open.json?fields=seed,bosses')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['fields'], ['key_items', 'characters', 'seed'])
+        self.assertIn('bosses', response.json()['error'])
+
+        # The log is built once and then served from the parsed copy.
+        self.write_json_log.assert_called_once()
+        self.assertEqual(self.client.get('/spoiler_log/race.json?fields=seed').json(), {'cheating': 'not_allowed'})
+
+    def test_msgpack_negotiation(self):
+        from .spoilers import msgpack
+        from unittest import mock
+
+        if msgpack is None:
+            self.skipTest('requires msgpack')
+
+        response = self.client.get('/spoiler_log/open.json?fields=characters',
+                                   HTTP_ACCEPT='application/json;q=0.5, application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), {'characters': {'Starting 1': 'Marle'}})
+
+        # The whole log is sent when no fields are selected.
+        response = self.client.get('/spoiler_log/open.json', HTTP_ACCEPT='application/x-msgpack')
+        self.assertEqual(msgpack.unpackb(response.content)['seed'], 'spoiler')
+
+        # JSON is sent when MessagePack is refused or not installed.
+        response = self.client.get('/spoiler_log/open.json?fields=seed', HTTP_ACCEPT='application/msgpack;q=0')
+        self.assertEqual(response.json(), {'seed': 'spoiler'})
+        with mock.patch('generator.spoilers.msgpack', None):
+            response = self.client.get('/spoiler_log/open.json?fields=seed', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.json(), {'seed': 'spoiler'})
+
+
+RATELIMIT_TEST_SETTINGS = {
+    'RATELIMIT_ENABLED': 1,
+    'CACHES': {**conf.CACHES, 'ratelimit': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                            'LOCATION': 'ratelimit-tests'}},
+    'RATELIMIT_SCOPES': {scope: {'ip_rate': 1, 'ip_burst': 2, 'global_rate': 10, 'global_burst': 100}
+                         for scope in ('generate', 'download', 'bundle', 'mystery_odds')}
+}
+
+
+@override_settings(**RATELIMIT_TEST_SETTINGS)
+class RateLimitTestCase(TestCase):
+    def setUp(self):
+        from django.core.cache import caches
+        caches['ratelimit'].clear()
+
+    def test_bucket_refill(self):
+        from .ratelimit import try_admit
+        from unittest import mock
+
+        with mock.patch('generator.ratelimit.time.time', return_value=1000.0) as now:
+            self.assertEqual(try_admit('generate', '10.0.0.1'), 0)
+            self.assertEqual(try_admit('generate', '10.0.0.1'), 0)
+            self.assertEqual(try_admit('generate', '10.0.0.1'), 1)
+            # Other clients have their own bucket.
+            self.assertEqual(try_admit('generate', '10.0.0.2'), 0)
+
+            now.return_value = 1000.5
+            self.assertEqual(try_admit('generate', '10.0.0.1'), 0.5)
+            now.return_value = 1001.0
+            self.assertEqual(try_admit('generate', '10.0.0.1'), 0)
+
+            # The bucket never holds more than the burst.
+            now.return_value = 2000.0
+            self.assertEqual(try_admit('generate', '10.0.0.1', cost=2), 0)
+            self.assertEqual(try_admit('generate', '10.0.0.1', cost=3), 3)
+
+    def test_html_response(self):
+        from .ratelimit import try_admit
+
+        try_admit('download', '127.0.0.1', cost=2)
+        response = self.client.post('/seed/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertTemplateUsed(response, 'generator/error.html')
+
+    def test_json_response(self):
+        from .ratelimit import try_admit
+
+        try_admit('generate', '127.0.0.1', cost=2)
+        response = self.client.post('/api/generate/', {}, content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(response.json(), {'error': 'The server is busy. Please try again in a few seconds.'})
+
+    def test_bundle_cost(self):
+        from .ratelimit import try_admit
+
+        def post_bundle(share_ids):
+            return self.client.post('/api/bundle/', {
+                'share_ids': share_ids, 'battle_speed': 5, 'battle_message_speed': 5, 'background_selection': 1,
+                'battle_gauge_style': 1, 'rom_file': SimpleUploadedFile('ct.sfc', b'rom')})
+
+        # Bundles take one token per seed, so three seeds can never fit in a burst of two.
+        response = post_bundle('abc def ghi')
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(response.json(), {'error': 'A bundle can have at most 2 seeds.'})
+
+        try_admit('bundle', '127.0.0.1')
+        response = post_bundle('abc def')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertIn('error', response.json())
+
+    def test_metrics_access(self):
+        from django.contrib.auth.models import User
+
+        self.assertEqual(self.client.get('/admission/metrics/').status_code, 200)
+        response = self.client.get('/admission/metrics/', REMOTE_ADDR='203.0.113.5')
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_login(User.objects.create(username='staff', is_staff=True))
+        response = self.client.get('/admission/metrics/', REMOTE_ADDR='203.0.113.5')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('generate', response.json()['scopes'])
+
+
+class MemoryDiagnosticsTestCase(TestCase):
+    @staticmethod
+    def get_request(path: str):
+        from django.test import RequestFactory
+        from django.urls import resolve
+
+        request = RequestFactory().get(path)
+        request.resolver_match = resolve(path)
+        return request
+
+    @override_settings(MEMORY_DIAGNOSTICS=False, MEMORY_RECYCLE_RSS=0)
+    def test_disabled(self):
+        from .middleware import MemoryDiagnosticsMiddleware
+        from django.core.exceptions import MiddlewareNotUsed
+
+        with self.assertRaises(MiddlewareNotUsed):
+            MemoryDiagnosticsMiddleware(lambda request: None)
+
+    def test_view_growth(self):
+        from .middleware import MemoryDiagnosticsMiddleware
+        from django.http import HttpResponse
+        from unittest import mock
+
+        memory = {'rss_bytes': 400, 'pss_bytes': 300}
+        with tempfile.TemporaryDirectory() as diagnostics_dir, \
+                override_settings(MEMORY_DIAGNOSTICS=True, MEMORY_TRACEMALLOC=False, MEMORY_RECYCLE_RSS=0,
+                                  MEMORY_DIAGNOSTICS_DIR=diagnostics_dir, MEMORY_SNAPSHOT_INTERVAL=3), \
+                mock.patch('generator.middleware.get_rss', side_effect=[100, 150, 400, 350]), \
+                mock.patch('generator.middleware.get_memory_usage', return_value=memory):
+            middleware = MemoryDiagnosticsMiddleware(lambda request: HttpResponse('ok'))
+            for path in ('/options/', '/tracker/', '/options/'):
+                self.assertEqual(middleware(self.get_request(path)).content, b'ok')
+
+            # Diagnostics are written every MEMORY_SNAPSHOT_INTERVAL requests.
+            snapshots = list(pathlib.Path(diagnostics_dir).iterdir())
+            self.assertEqual(len(snapshots), 1)
+            lines = snapshots[0].read_text().splitlines()
+            self.assertIn('Requests: 3', lines)
+            self.assertIn('RSS: 400', lines)
+            self.assertIn('  generator:tracker: 1, 250', lines)
+            self.assertIn('  generator:options: 2, 0', lines)
+
+    def test_recycle(self):
+        from .middleware import MemoryDiagnosticsMiddleware
+        from django.http import HttpResponse
+        from unittest import mock
+        import signal
+
+        with override_settings(MEMORY_DIAGNOSTICS=False, MEMORY_RECYCLE_RSS=2), \
+                mock.patch('generator.middleware.get_rss', side_effect=[1 << 20, 1 << 20, 3 << 20, 3 << 20]), \
+                mock.patch('generator.middleware.os.kill') as kill:
+            middleware = MemoryDiagnosticsMiddleware(lambda request: HttpResponse('ok'))
+            middleware(self.get_request('/options/'))
+            kill.assert_not_called()
+
+            # The request that passes the limit is still answered, and the worker is
+            # only signalled once.
+            with self.assertLogs('generator.middleware', 'WARNING'):
+                self.assertEqual(middleware(self.get_request('/options/')).content, b'ok')
+            middleware(self.get_request('/options/'))
+        kill.assert_called_once_with(os.getpid(), signal.SIGTERM)
+
+
+@override_settings(GENERATION_SANDBOX_TIMEOUT=10, GENERATION_SANDBOX_MEMORY_LIMIT=32)
+class SandboxTestCase(TestCase):
+    def test_result(self):
+        from .sandbox import run_sandboxed
+
+        self.assertEqual(run_sandboxed(sum, [1, 2]), 3)
+        self.assertNotEqual(run_sandboxed(os.getpid), os.getpid())
+
+    def test_exception(self):
+        from .sandbox import run_sandboxed
+
+        with self.assertRaisesRegex(ValueError, 'invalid literal'):
+            run_sandboxed(int, 'x')
+
+    @override_settings(GENERATION_SANDBOX_TIMEOUT=1)
+    def test_timeout(self):
+        from .sandbox import GenerationTimeoutException, run_sandboxed
+        import time
+
+        start = time.monotonic()
+        with self.assertRaises(GenerationTimeoutException):
+            run_sandboxed(time.sleep, 30)
+        self.assertLess(time.monotonic() - start, 10)
+
+    def test_memory_limit(self):
+        from .sandbox import GenerationFailedException, run_sandboxed
+
+        # The limit is on top of what the child already uses, which is more than 32MB.
+        self.assertEqual(len(run_sandboxed(bytearray, 8 * 1024 * 1024)), 8 * 1024 * 1024)
+        with self.assertRaisesRegex(GenerationFailedException, 'ran out of memory'):
+            run_sandboxed(bytearray, 256 * 1024 * 1024)
+
+    def test_randomizer(self):
+        from .randomizerinterface import RandomizerInterface, rset
+        import pickle
+
+        def generate():
+            interface = RandomizerInterface(bytearray(b'rom'))
+            config = interface.replay_config(rset.Settings(), 'nonce')
+            return pickle.dumps(config), interface.generate_rom()
+
+        with override_settings(GENERATION_SANDBOX=0):
+            expected = generate()
+        with override_settings(GENERATION_SANDBOX=1):
+            self.assertEqual(generate(), expected)
+
+
+@override_settings(MYSTERY_ODDS_SAMPLES=2000)
+class MysteryOddsTestCase(TestCase):
+    def setUp(self):
+        from .mystery import get_mystery_odds, mystery_choice_fields, mystery_flag_fields
+
+        get_mystery_odds.cache_clear()
+        # The first choice of every group is never rolled, the others are equally likely.
+        self.weights = {field: 0 if index == 0 else 10
+                        for fields in mystery_choice_fields.values() for index, field in enumerate(fields)}
+        self.weights.update({field: 100 if index % 2 else 0 for index, field in enumerate(mystery_flag_fields)})
+
+    def test_odds(self):
+        from .mystery import get_mystery_odds, mystery_choice_fields, mystery_fields, mystery_flag_fields
+
+        odds = get_mystery_odds(tuple(self.weights[field] for field in mystery_fields))
+        self.assertEqual(odds['samples'], 2000)
+        for attribute, fields in mystery_choice_fields.items():
+            self.assertEqual(odds['choices'][attribute][fields[0]], 0)
+            self.assertAlmostEqual(sum(odds['choices'][attribute].values()), 1, places=3)
+            for field in fields[1:]:
+                self.assertAlmostEqual(odds['choices'][attribute][field], 1 / (len(fields) - 1), delta=0.05)
+
+        # Flags at 0% and 100% are never and always rolled, so the number of flags is fixed.
+        self.assertEqual(list(odds['flags'].values()), [self.weights[field] / 100 for field in mystery_flag_fields])
+        rolled = sum(1 for field in mystery_flag_fields if self.weights[field])
+        self.assertEqual(odds['flag_counts'][rolled], 1)
+        self.assertEqual(odds['flag_pairs'][1][1], 1)
+        self.assertEqual(odds['flag_pairs'][0][1], 0)
+
+    @override_settings(RATELIMIT_ENABLED=0)
+    def test_view(self):
+        response = self.client.get('/mystery_odds/', self.weights)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['samples'], 2000)
+        self.assertIn('max-age', response['Cache-Control'])
+
+        response = self.client.get('/mystery_odds/', {**self.weights, 'mystery_game_mode_lw': '1' + '0' * 400})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('mystery_game_mode_lw', response.json()['errors'])
+
+        response = self.client.get('/mystery_odds/', {**self.weights, 'mystery_boss_rando': 'many'})
+        self.assertEqual(response.json()['errors'], {'mystery_boss_rando': ['Enter a whole number.']})
+
+    @override_settings(**RATELIMIT_TEST_SETTINGS)
+    def test_rate_limit(self):
+        from django.core.cache import caches
+
+        caches['ratelimit'].clear()
+        for _ in range(2):
+            self.assertEqual(self.client.get('/mystery_odds/', self.weights).status_code, 200)
+        response = self.client.get('/mystery_odds/', self.weights)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('error', response.json())
+
+
+# Reads in a transaction never go to the replica, so the test case must not wrap each test in one.
+class RouterTestCase(TransactionTestCase):
+    def setUp(self):
+        from unittest import mock
+
+        # The replica alias is only routed to, never connected to.
+        patcher = mock.patch.dict(conf.DATABASES, {'replica': conf.DATABASES['default']})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_replica_reads(self):
+        from .models import Game
+        from .routers import reads_from
+
+        self.assertEqual(Game.objects.all().db, 'default')
+        with reads_from('replica'):
+            self.assertEqual(Game.objects.all().db, 'replica')
+        self.assertEqual(Game.objects.all().db, 'default')
+
+        # Nothing is routed to a replica that isn't configured.
+        del conf.DATABASES['replica']
+        with reads_from('replica'):
+            self.assertEqual(Game.objects.all().db, 'default')
+
+    def test_writes(self):
+        from .models import Game
+        from .routers import ReplicaRouter, reads_from
+        import pickle
+
+        with reads_from('replica'):
+            self.assertEqual(ReplicaRouter().db_for_write(Game), 'default')
+        with reads_from('replica'):
+            game = Game.create(share_id='routed', settings=pickle.dumps({}), configuration=pickle.dumps({}))
+            self.assertEqual(game._state.db, 'default')
+
+    def test_reads_in_transaction(self):
+        from .models import Game
+        from django.db import transaction
+        from .routers import reads_from
+
+        with reads_from('replica'):
+            with transaction.atomic():
+                self.assertEqual(Game.objects.all().db, 'default')
+            self.assertEqual(Game.objects.all().db, 'replica')
+
+    def test_reads_after_write(self):
+        from .models import Game
+        from .routers import reads_from
+
+        with reads_from('replica'):
+            Game.objects.filter(share_id='missing').update(pooled=False)
+            self.assertEqual(Game.objects.all().db, 'default')
+        # The next view starts on the replica again.
+        with reads_from('replica'):
+            self.assertEqual(Game.objects.all().db, 'replica')
+
+
+class ReadinessTestCase(TestCase):
+    def test_warm_up_on_first_request(self):
+        from . import warmup
+        from unittest import mock
+
+        steps = []
+        warmup_steps = (('first', lambda: steps.append('first')), ('second', lambda: steps.append('second')))
+        with mock.patch.object(warmup, 'warmup_steps', warmup_steps), \
+                mock.patch.dict(warmup.warm_state, {'started': False, 'warm': False, 'error': None, 'steps': {}}):
+            for _ in range(2):
+                response = self.client.get('/ready/')
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.json()['warm'])
+            self.assertEqual(steps, ['first', 'second'])
+
+    def test_failed_warm_up(self):
+        from . import warmup
+        from unittest import mock
+
+        def fail():
+            raise FileNotFoundError('ct.sfc')
+
+        with mock.patch.object(warmup, 'warmup_steps', (('base_rom', fail),)), \
+                mock.patch.dict(warmup.warm_state, {'started': False, 'warm': False, 'error': None, 'steps': {}}):
+            response = self.client.get('/ready/')
+            self.assertEqual(response.status_code, 503)
+            self.assertIn('base_rom', response.json()['error'])
+
+
+@unittest.skipUnless(randomizer_available(), 'requires the randomizer submodule and ct.sfc')
+class CosmeticLayerTestCase(TestCase):
+    def setUp(self):
+        from .forms import GenerateForm
+        from .randomizerinterface import RandomizerInterface
+
+        form = GenerateForm({**RandomizerInterface.get_default_settings_data(), 'seed': 'cosmetic', 'spoiler_log': True})
+        self.assertTrue(form.is_valid())
+        interface = RandomizerInterface(RandomizerInterface.get_base_rom())
+        interface.configure_seed_from_form(form)
+        self.settings = interface.get_settings()
+        self.config = interface.get_config()
+
+    @staticmethod
+    def get_rom_form(**cosmetics):
+        from .forms import RomForm
+
+        data = {'share_id': 'cosmetic', 'battle_speed': 5, 'battle_message_speed': 5,
+                'background_selection': 1, 'battle_gauge_style': 1, **cosmetics}
+        form = RomForm(data, {'rom_file': SimpleUploadedFile('ct.sfc', b'')})
+        form.is_valid()
+        return form
+
+    def generate(self, form=None, settings=None) -> bytes:
+        from .randomizerinterface import RandomizerInterface
+
+        interface = RandomizerInterface(RandomizerInterface.get_base_rom())
+        interface.set_settings_and_config(copy.deepcopy(settings or self.settings), copy.deepcopy(self.config), form)
+        return bytes(interface.generate_rom())
+
+    def test_layered_rom_matches_full_generation(self):
+        from .randomizerinterface import RandomizerInterface
+
+        for cosmetics in [{},
+                          {'crono_name': 'Cro', 'epoch_name': 'Jet', 'battle_speed': 8},
+                          {'quiet_mode': True, 'zenan_alt_battle_music': True, 'death_peak_alt_music': True,
+                           'magus_name': 'Janus'},
+                          {'reduce_flashes': True, 'background_selection': 4, 'stereo_audio': True}]:
+            form = self.get_rom_form(**cosmetics)
+            base_settings = copy.deepcopy(self.settings)
+            RandomizerInterface.apply_cosmetic_flags(base_settings, form)
+            base_rom = self.generate(settings=base_settings)
+            settings = copy.deepcopy(self.settings)
+            RandomizerInterface.apply_cosmetic_options(settings, form)
+            layered_rom = RandomizerInterface.apply_cosmetic_layer(bytearray(base_rom), settings)
+            self.assertEqual(bytes(layered_rom), self.generate(form), cosmetics)
+
+    def test_cached_download_matches_full_generation(self):
+        from .models import Game
+        from .randomizerinterface import RandomizerInterface
+        from .views import get_patched_rom
+        import pickle
+
+        game = Game.create(share_id='cosmetic', settings=pickle.dumps(self.settings),
+                           configuration=pickle.dumps(self.config))
+        form = self.get_rom_form(crono_name='Cro', quiet_mode=True)
+        with tempfile.TemporaryDirectory() as artifact_root, override_settings(ARTIFACT_ROOT=artifact_root):
+            # First call populates the cache, second call is served from it.
+            for _ in range(2):
+                patched_rom, _ = get_patched_rom(game, form, RandomizerInterface.get_base_rom())
+                self.assertEqual(bytes(patched_rom), self.generate(form))
+
+            # Other names and options reuse the cached base image.
+            form = self.get_rom_form(crono_name='Other', battle_speed=2, quiet_mode=True)
+            patched_rom, _ = get_patched_rom(game, form, RandomizerInterface.get_base_rom())
+            self.assertEqual(bytes(patched_rom), self.generate(form))
+            self.assertEqual(len(list(pathlib.Path(artifact_root).rglob('*.patch'))), 1)
+
+
+class StubCosmeticLayerTestCase(TestCase):
+    """
+    The cosmetic layer on a stub ROM, so that it is exercised without ct.sfc.
+    """
+    @staticmethod
+    def apply_layer(rom: bytes, **cosmetics) -> bytes:
+        from .randomizerinterface import RandomizerInterface, rset
+
+        settings = rset.Settings()
+        RandomizerInterface.apply_cosmetic_options(settings, CosmeticLayerTestCase.get_rom_form(**cosmetics))
+        return bytes(RandomizerInterface.apply_cosmetic_layer(bytearray(rom), settings))
+
+    def test_layer_writes_fixed_locations(self):
+        rom = random.Random('cosmetic').randbytes(0x400000)
+        cosmetics = {'crono_name': 'Cro', 'epoch_name': 'Jet', 'battle_speed': 8}
+        layered_rom = self.apply_layer(rom, **cosmetics)
+        self.assertEqual(len(layered_rom), len(rom))
+        self.assertNotEqual(layered_rom, rom)
+
+        # Only the names, in-game options and checksum are written.
+        changed = sum(a != b for a, b in zip(layered_rom, rom))
+        self.assertLess(changed, 1024)
+
+        # A layer overwrites whatever an earlier layer wrote, which is what lets it be
+        # applied to a cached base image.
+        other_rom = self.apply_layer(rom, crono_name='Other', magus_name='Janus', battle_speed=2)
+        self.assertNotEqual(other_rom, layered_rom)
+        self.assertEqual(self.apply_layer(other_rom, **cosmetics), layered_rom)
+
+    def test_layer_steps(self):
+        from .randomizerinterface import RandomizerInterface, rset
+        from unittest import mock
+
+        settings = rset.Settings()
+        settings.char_names[0] = 'Cro'
+        rom = bytearray(b'\x00' * 0x1000)
+        with mock.patch('generator.randomizerinterface.ctrom.CTRom') as ct_rom_class, \
+                mock.patch('generator.randomizerinterface.cosmetichacks.set_pc_names') as set_pc_names, \
+                mock.patch.object(settings.ctoptions, 'write_to_ctrom') as write_to_ctrom:
+            ct_rom = ct_rom_class.return_value
+            ct_rom.rom_data.getvalue.return_value = b'layered'
+            layered_rom = RandomizerInterface.apply_cosmetic_layer(rom, settings)
+
+        ct_rom_class.assert_called_once_with(rom, ignore_checksum=True)
+        set_pc_names.assert_called_once_with(ct_rom, *settings.char_names)
+        write_to_ctrom.assert_called_once_with(ct_rom)
+        ct_rom.fix_snes_checksum.assert_called_once_with()
+        self.assertEqual(layered_rom, bytearray(b'layered'))
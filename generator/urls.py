@@ -2,6 +2,8 @@ from django.urls import path
 from django.views.generic import TemplateView
 
 from . import views
+from .ratelimit import rate_limit
+from .routers import read_from_replica
 
 app_name = 'generator'
 
@@ -9,11 +11,21 @@ urlpatterns = [
     path('', TemplateView.as_view(template_name="generator/index.html"), name='index'),
     path('tracker/', TemplateView.as_view(template_name="tracker/tracker.html"), name='tracker'),
     path('options/', views.OptionsView.as_view(), name='options'),
-    path('generate-rom/', views.GenerateView.as_view(), name='generate'),
-    path('share/<str:share_id>/', views.ShareLinkView.as_view(), name='share'),
-    path('practice/<str:share_id>/', views.PracticeSeedView.as_view(), name='practice'),
-    path('seedimg/<str:share_id>.png', views.SeedImageView.as_view(), name='seedimg'),
-    path('seed/', views.DownloadSeedView.as_view(), name='seed'),
-    path('spoiler_log/<str:share_id>.txt', views.DownloadSpoilerLogView.as_view(), name='spoiler_log'),
-    path('spoiler_log/<str:share_id>.json', views.DownloadJSONSpoilerLogView.as_view(), name='json_spoiler_log'),
+    path('generate-rom/', rate_limit('generate')(views.GenerateView.as_view()), name='generate'),
+    path('share/<str:share_id>/', read_from_replica(views.ShareLinkView.as_view()), name='share'),
+    path('share/<str:share_id>/spoiler/', read_from_replica(views.WebSpoilerLogView.as_view()), name='web_spoiler_log'),
+    path('practice/<str:share_id>/', rate_limit('generate')(views.PracticeSeedView.as_view()), name='practice'),
+    path('seedimg/<str:share_id>.png', read_from_replica(views.SeedImageView.as_view()), name='seedimg'),
+    path('seed/', rate_limit('download')(views.DownloadSeedView.as_view()), name='seed'),
+    path('spoiler_log/<str:share_id>.txt', read_from_replica(views.DownloadSpoilerLogView.as_view()), name='spoiler_log'),
+    path('spoiler_log/<str:share_id>.json', read_from_replica(views.DownloadJSONSpoilerLogView.as_view()), name='json_spoiler_log'),
+    path('api/generate/', rate_limit('generate', json=True)(views.ApiGenerateView.as_view()), name='api_generate'),
+    path('api/job/<str:job_id>/', views.ApiJobView.as_view(), name='api_job'),
+    path('api/practice/<str:share_id>/', views.ApiPracticeFamilyView.as_view(), name='api_practice_family'),
+    path('api/placements/<str:category>/', read_from_replica(views.ApiPlacementSearchView.as_view()),
+         name='api_placement_search'),
+    path('api/bundle/', views.ApiBundleView.as_view(), name='api_bundle'),
+    path('admission/metrics/', views.AdmissionMetricsView.as_view(), name='admission_metrics'),
+    path('mystery_odds/', rate_limit('mystery_odds', json=True)(views.MysteryOddsView.as_view()), name='mystery_odds'),
+    path('ready/', views.ReadinessView.as_view(), name='ready'),
 ]
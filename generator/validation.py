@@ -0,0 +1,119 @@
+from .randomizerinterface import enum_field_map, mystery_flag_field_map, mystery_freq_field_map, tab_field_map
+
+# Python standard libraries
+import re
+
+
+#
+# Rule based validation of settings data.
+#
+# GenerateForm only checks field types.  These rules catch combinations that the
+# randomizer would reject (or fail on) only after a full Randomizer is built, so
+# doomed requests are turned away before they reach a generation worker.
+#
+# Each rule takes a dictionary of settings data keyed by GenerateForm field name and
+# yields (field, message) pairs for every problem found.  Fields that are missing
+# from the data already failed type checking and are skipped by the rules.
+#
+
+TAB_RANGE = (1, 9)
+FRAGMENT_RANGE = (0, 50)
+# Most fragments (required plus extra) the randomizer can place in a seed.
+FRAGMENT_TOTAL_MAX = 50
+FLAG_PERCENT_RANGE = (0, 100)
+# Range of the mystery weight sliders.  Larger weights only slow down the odds sampling.
+MYSTERY_WEIGHT_RANGE = (0, 100)
+DUPLICATE_CHAR_PATTERN = re.compile(r'[0-9A-Fa-f]{14}')
+
+
+def _check_choices(data: dict):
+    for field, (attribute, value_map) in enum_field_map.items():
+        if field in data and data[field] not in value_map:
+            yield field, f'"{data[field]}" is not a valid choice.'
+
+
+def _check_tabs(data: dict):
+    tab_fields = list(tab_field_map.values())
+    for field in tab_fields:
+        if field in data and not TAB_RANGE[0] <= data[field] <= TAB_RANGE[1]:
+            yield field, f'Must be between {TAB_RANGE[0]} and {TAB_RANGE[1]}.'
+
+    # tab_field_map lists each tab's min field followed by its max field
+    for min_field, max_field in zip(tab_fields[::2], tab_fields[1::2]):
+        if min_field in data and max_field in data and data[min_field] > data[max_field]:
+            yield min_field, 'Minimum tab value cannot be greater than the maximum.'
+
+
+def _check_fragments(data: dict):
+    for field in ('fragments_required', 'extra_fragments'):
+        if field in data and not FRAGMENT_RANGE[0] <= data[field] <= FRAGMENT_RANGE[1]:
+            yield field, f'Must be between {FRAGMENT_RANGE[0]} and {FRAGMENT_RANGE[1]}.'
+
+    # The total only matters if bucket fragments can actually be turned on for the seed.
+    fragments_possible = data.get('bucket_fragments') or \
+        (data.get('mystery_seed') and data.get('mystery_bucket_fragments', 0) > 0)
+    if fragments_possible and 'fragments_required' in data and 'extra_fragments' in data and \
+            data['fragments_required'] + data['extra_fragments'] > FRAGMENT_TOTAL_MAX:
+        yield 'extra_fragments', f'Required and extra fragments cannot add up to more than {FRAGMENT_TOTAL_MAX}.'
+
+
+def _check_duplicate_chars(data: dict):
+    assignments = data.get('duplicate_char_assignments')
+    if assignments is None:
+        return
+    if not DUPLICATE_CHAR_PATTERN.fullmatch(assignments):
+        yield 'duplicate_char_assignments', 'Invalid duplicate character assignments.'
+        return
+
+    # Every character needs at least one character it can become.  This only matters
+    # if duplicate characters can actually be turned on for the seed.
+    duplicates_possible = data.get('duplicate_characters') or \
+        (data.get('mystery_seed') and data.get('mystery_duplicate_characters', 0) > 0)
+    if duplicates_possible:
+        for i in range(7):
+            if int(assignments[i * 2:i * 2 + 2], 16) & 0x7F == 0:
+                yield 'duplicate_char_assignments', 'Each character must have at least one selection.'
+                return
+
+
+def _check_mystery(data: dict):
+    if not data.get('mystery_seed'):
+        return
+
+    for freq_fields in mystery_freq_field_map.values():
+        fields = [field for field in freq_fields.values() if field in data]
+        for field in fields:
+            if not MYSTERY_WEIGHT_RANGE[0] <= data[field] <= MYSTERY_WEIGHT_RANGE[1]:
+                yield field, f'Mystery weights must be between {MYSTERY_WEIGHT_RANGE[0]} and {MYSTERY_WEIGHT_RANGE[1]}.'
+        if len(fields) == len(freq_fields) and sum(max(data[field], 0) for field in fields) == 0:
+            yield fields[0], 'At least one mystery weight in this group must be greater than zero.'
+
+    for field in mystery_flag_field_map.values():
+        if field in data and not FLAG_PERCENT_RANGE[0] <= data[field] <= FLAG_PERCENT_RANGE[1]:
+            yield field, f'Must be between {FLAG_PERCENT_RANGE[0]} and {FLAG_PERCENT_RANGE[1]}.'
+
+
+rules = (
+    _check_choices,
+    _check_tabs,
+    _check_fragments,
+    _check_duplicate_chars,
+    _check_mystery
+)
+
+
+def validate_settings_data(data: dict) -> dict[str, list[str]]:
+    """
+    Check a dictionary of settings data against the validation rules.
+
+    This is shared by the HTML form, the API, and batch tooling, and runs before any
+    randomizer objects are created.
+
+    :param data: Dictionary of settings data keyed by GenerateForm field name
+    :return: Dictionary of field name to a list of error messages, empty if the data is valid
+    """
+    errors = {}
+    for rule in rules:
+        for field, message in rule(data):
+            errors.setdefault(field, []).append(message)
+    return errors
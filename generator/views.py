@@ -1,19 +1,47 @@
 # Django libraries
-from django.http import HttpResponse
+from django.conf import settings as conf
+from django.db import close_old_connections
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.middleware.csrf import get_token
 from django.shortcuts import render, redirect
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
 from wsgiref.util import FileWrapper
 
 # Site libraries
 from django.views import View
 from django.views.generic import FormView
 
-from .forms import GenerateForm, RomForm
-from .randomizerinterface import RandomizerInterface, InvalidSettingsException
-from .models import Game
+from .forms import BundleForm, GenerateForm, RomForm
+from .randomizerinterface import RandomizerInterface, InvalidSettingsException, rset
+from .sandbox import GenerationFailedException, GenerationTimeoutException
+from .archive import get_game
+from .artifacts import get_artifact, put_artifact
+from .bundles import stream_bundle
+from .compression import compress_variants, precompressed_response
+from .models import ArchivedGame, Game, GenerationJob
+from .mystery import get_mystery_odds, mystery_fields
+from .placements import PLACEMENT_SEARCH_LIMIT, PLACEMENT_SEARCH_MAX_LIMIT, find_placements, index_placements, \
+    placement_categories
+from .ratelimit import get_admission_metrics, get_client_ip, get_max_cost, rate_limited_response, try_admit
+from .replay import ReplayVersionException, check_replay_version, get_config, get_config_blob
+from .rompatch import apply_patch, create_patch
+from .warmup import get_readiness
+from .validation import validate_settings_data
+from .spoilers import accepts_msgpack, json_spoiler_projection_response, spoiler_log_response, \
+    web_spoiler_log_response
 
 # Python standard libraries
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import datetime
+import functools
 import hashlib
 import io
+import json
 import pickle
 import random
 
@@ -46,9 +74,10 @@ class OptionsView(View):
 
     @classmethod
     def get(cls, request):
-        form = GenerateForm()
-        context = {'form': form}
-        return render(request, 'generator/options.html', context)
+        # The page is the same for every user, so it is rendered once per worker.
+        # Make sure the CSRF cookie is set since options.js copies it into the form.
+        get_token(request)
+        return precompressed_response(request, get_options_page(), 'text/html; charset=utf-8')
 
 
 class GenerateView(FormView):
@@ -63,15 +92,18 @@ class GenerateView(FormView):
     def form_valid(self, form):
         # Generate a seed and create a DB entry for it.
         # Then redirect the user to the seed download page.
-        game = generate_seed_from_form(form)
+        try:
+            game = generate_seed_from_form(form)
+        except (GenerationTimeoutException, GenerationFailedException) as e:
+            return render(self.request, 'generator/error.html', {'error_text': str(e)}, status=503)
         return redirect('/share/' + game.share_id)
 
     def form_invalid(self, form):
         # TODO: Replace this error handling with something better eventually.
         buffer = io.StringIO()
         buffer.write("Errors in the following form fields:\n")
-        for error in form.errors:
-            buffer.write(str(error) + "\n")
+        for field, errors in form.errors.items():
+            buffer.write(field + ": " + " ".join(errors) + "\n")
         return render(self.request, 'generator/error.html', {'error_text': buffer.getvalue()}, status=404)
 
 
@@ -82,25 +114,52 @@ class ShareLinkView(View):
     @classmethod
     def get(cls, request, share_id):
         try:
-            game = Game.objects.get(share_id=share_id)
+            game = get_game(share_id)
+            config = get_config(game)
         except Game.DoesNotExist:
             return render(request, 'generator/error.html', {'error_text': 'Seed does not exist.'}, status=404)
+        except ReplayVersionException as e:
+            return render(request, 'generator/error.html', {'error_text': str(e)}, status=410)
+        except (GenerationTimeoutException, GenerationFailedException) as e:
+            return render(request, 'generator/error.html', {'error_text': str(e)}, status=503)
 
-        share_info = RandomizerInterface.get_share_details(
-            pickle.loads(game.configuration), pickle.loads(game.settings))
+        share_info = RandomizerInterface.get_share_details(config, pickle.loads(game.get_settings_data()))
 
         rom_form = RomForm()
         context = {'share_id': game.share_id,
                    'is_permalink': True,
                    'base_uri': request.build_absolute_uri('/')[:-1],
                    'form': rom_form,
-                   'spoiler_log': RandomizerInterface.get_web_spoiler_log(pickle.loads(game.configuration)),
                    'is_race_seed': game.race_seed,
                    'share_info': share_info.getvalue()}
 
         return render(request, 'generator/seed.html', context)
 
 
+class WebSpoilerLogView(View):
+    """
+    Send the spoiler log tables for the share page of the seed with the given share ID.
+
+    The share page loads these when the spoiler log section is first opened.
+    """
+    @classmethod
+    def get(cls, request, share_id):
+        try:
+            game = get_game(share_id)
+        except Game.DoesNotExist:
+            return JsonResponse({'error': 'Seed does not exist.'}, status=404)
+
+        if game.race_seed:
+            return JsonResponse({'error': 'No spoiler log available for this seed.'}, status=404)
+
+        try:
+            return web_spoiler_log_response(request, game)
+        except ReplayVersionException as e:
+            return JsonResponse({'error': str(e)}, status=410)
+        except (GenerationTimeoutException, GenerationFailedException) as e:
+            return JsonResponse({'error': str(e)}, status=503)
+
+
 class DownloadSeedView(FormView):
     """
     Apply the randomization and send the seed to the user.
@@ -139,16 +198,13 @@ class DownloadSeedView(FormView):
     def form_valid(self, form):
         share_id = form.cleaned_data['share_id']
         try:
-            game = Game.objects.get(share_id=share_id)
+            game = get_game(share_id)
         except Game.DoesNotExist:
             return render(self.request, 'generator/error.html', {'error_text': 'Seed does not exist.'}, status=404)
 
         try:
             rom_bytes = self.read_and_validate_rom_file(self.request.FILES['rom_file'])
-            interface = RandomizerInterface(rom_bytes)
-            interface.set_settings_and_config(pickle.loads(game.settings), pickle.loads(game.configuration), form)
-            patched_rom = interface.generate_rom()
-            file_name = interface.get_rom_name(share_id)
+            patched_rom, file_name = get_patched_rom(game, form, rom_bytes)
             content = FileWrapper(io.BytesIO(patched_rom))
             response = HttpResponse(content, content_type='application/octet-stream')
             response['Content-Length'] = len(patched_rom)
@@ -157,6 +213,10 @@ class DownloadSeedView(FormView):
         except InvalidRomException:
             return render(self.request, 'generator/error.html',
                           {'error_text': 'You must enter a valid Chrono Trigger ROM file.'}, status=400)
+        except (GenerationTimeoutException, GenerationFailedException) as e:
+            return render(self.request, 'generator/error.html', {'error_text': str(e)}, status=503)
+        except ReplayVersionException as e:
+            return render(self.request, 'generator/error.html', {'error_text': str(e)}, status=410)
 
     def form_invalid(self, form):
         return render(self.request, 'generator/error.html',
@@ -170,17 +230,19 @@ class DownloadSpoilerLogView(View):
     @classmethod
     def get(cls, request, share_id):
         try:
-            game = Game.objects.get(share_id=share_id)
+            game = get_game(share_id)
         except Game.DoesNotExist:
             return render(request, 'generator/error.html', {'error_text': 'Seed does not exist.'}, status=404)
 
         if not game.race_seed:
-            spoiler_log = RandomizerInterface.get_spoiler_log(
-                pickle.loads(game.configuration), pickle.loads(game.settings))
+            try:
+                response = spoiler_log_response(request, game, 'txt')
+            except ReplayVersionException as e:
+                return render(request, 'generator/error.html', {'error_text': str(e)}, status=410)
+            except (GenerationTimeoutException, GenerationFailedException) as e:
+                return render(request, 'generator/error.html', {'error_text': str(e)}, status=503)
             file_name = 'spoiler_log_' + share_id + '.txt'
-            response = HttpResponse(content_type='text/plain')
             response['Content-Disposition'] = 'attachment; filename=%s' % file_name
-            response.write(spoiler_log.getvalue())
             return response
         else:
             return render(request, 'generator/error.html', {'error_text': 'No spoiler log available for this seed.'},
@@ -190,22 +252,32 @@ class DownloadSpoilerLogView(View):
 class DownloadJSONSpoilerLogView(View):
     """
     Create and send a JSON spoiler log to the user for the seed with the given share ID.
+
+    Supports a comma separated ?fields= parameter to select top level sections of the log,
+    and MessagePack output through the Accept header.
     """
     @classmethod
     def get(cls, request, share_id):
         try:
-            game = Game.objects.get(share_id=share_id)
+            game = get_game(share_id)
         except Game.DoesNotExist:
             return render(request, 'generator/error.html', {'error_text': 'Seed does not exist.'}, status=404)
 
-        response = HttpResponse(content_type='application/json')
         if not game.race_seed:
-            spoiler_log = RandomizerInterface.get_json_spoiler_log(
-                pickle.loads(game.configuration), pickle.loads(game.settings))
-            response.write(spoiler_log.getvalue())
+            try:
+                # Tools that only need some sections, or a compact encoding, are served
+                # from the parsed log.  Everyone else gets the full log as written.
+                if request.GET.get('fields') or accepts_msgpack(request):
+                    return json_spoiler_projection_response(request, game)
+                return spoiler_log_response(request, game, 'json')
+            except ReplayVersionException as e:
+                return render(request, 'generator/error.html', {'error_text': str(e)}, status=410)
+            except (GenerationTimeoutException, GenerationFailedException) as e:
+                return render(request, 'generator/error.html', {'error_text': str(e)}, status=503)
         else:
+            response = HttpResponse(content_type='application/json')
             response.write(b'{"cheating": "not_allowed"}')
-        return response
+            return response
 
 
 class PracticeSeedView(View):
@@ -220,6 +292,8 @@ class PracticeSeedView(View):
             return render(request, 'generator/error.html', {'error_text': str(e)}, status=404)
         except InvalidSettingsException as e:
             return render(request, 'generator/error.html', {'error_text': str(e)}, status=404)
+        except (GenerationTimeoutException, GenerationFailedException) as e:
+            return render(request, 'generator/error.html', {'error_text': str(e)}, status=503)
 
         return redirect('/share/' + game.share_id)
 
@@ -231,33 +305,393 @@ class SeedImageView(View):
     @classmethod
     def get(cls, request, share_id):
         try:
-            game = Game.objects.get(share_id=share_id)
+            game = get_game(share_id)
         except Game.DoesNotExist:
             return render(request, 'generator/error.html', {'error_text': 'Seed does not exist.'}, status=404)
 
-        rgen = random.Random(share_id)
-        img = Image.new('RGB', (200,200))
-        d = ImageDraw.Draw(img)
-        squaresize = 50
-        for x in range(0,200,squaresize):
-            for y in range(0, 200, squaresize):
-                # Draw a square in a random color
-                d.polygon([(x,y),(x+squaresize,y),(x+squaresize,y+squaresize),(x,y+squaresize)],
-                        fill=(rgen.randint(0,31)*8, rgen.randint(0,31)*8, rgen.randint(0,31)*8))
-
-        with io.BytesIO() as f:
-            img.save(f, 'PNG')
-            l = len(f.getvalue())
-            response = HttpResponse(content_type='image/png')
-            response['Content-Length'] = l
-            response.write(f.getbuffer())
-            return response
+        image = get_seed_image(share_id)
+        response = HttpResponse(content_type='image/png')
+        response['Content-Length'] = len(image)
+        response.write(image)
+        return response
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ApiGenerateView(View):
+    """
+    Generate a seed from a JSON settings document.
+
+    The document uses the same field names as the options form.  Any fields that are
+    left out are filled in with the randomizer's default settings.  If the document
+    sets "async" to true then the seed is generated in the background and a job ID is
+    returned that can be polled with ApiJobView.
+    """
+    @classmethod
+    def post(cls, request):
+        try:
+            document = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'error': 'Request body must be a JSON object.'}, status=400)
+        if not isinstance(document, dict):
+            return JsonResponse({'error': 'Request body must be a JSON object.'}, status=400)
+
+        run_async = bool(document.pop('async', False))
+        form = GenerateForm({**RandomizerInterface.get_default_settings_data(), **document})
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+
+        if run_async:
+            job = GenerationJob.objects.create(job_id=get_share_id(model=GenerationJob, field='job_id'))
+            job_executor.submit(run_generation_job, job.job_id, form)
+            return JsonResponse(get_job_details(request, job), status=202)
+
+        try:
+            game = generate_seed_from_form(form)
+        except (GenerationTimeoutException, GenerationFailedException) as e:
+            return JsonResponse({'error': str(e)}, status=503)
+        return JsonResponse(get_game_details(request, game))
+
+
+class ApiJobView(View):
+    """
+    Report the status of an async seed generation job.
+    """
+    @classmethod
+    def get(cls, request, job_id):
+        try:
+            job = GenerationJob.objects.get(job_id=job_id)
+        except GenerationJob.DoesNotExist:
+            return JsonResponse({'error': 'Job does not exist.'}, status=404)
+
+        # A job that has been unfinished for too long was lost with the worker that queued it.
+        if job.creation_date < timezone.now() - datetime.timedelta(seconds=conf.API_JOB_TIMEOUT) and \
+                fail_orphaned_jobs(GenerationJob.objects.filter(id=job.id)):
+            job.refresh_from_db()
+
+        return JsonResponse(get_job_details(request, job))
+
+
+class ApiPracticeFamilyView(View):
+    """
+    List the practice seeds that have been created from the seed with the given share ID.
+    """
+    @classmethod
+    def get(cls, request, share_id):
+        practice_seeds = Game.objects.filter(parent_share_id=share_id, pooled=False) \
+            .order_by('-creation_date').values('share_id', 'creation_date')[:conf.PRACTICE_FAMILY_LIMIT]
+        return JsonResponse({'share_id': share_id, 'practice_seeds': list(practice_seeds)})
+
+
+class ApiPlacementSearchView(View):
+    """
+    Find the most recent non-race seeds with a key item, character, or boss placement.
+
+    The category is one of key_items, characters, or bosses.  The location and value
+    query parameters are matched exactly and at least one of them is required.
+    """
+    @classmethod
+    def get(cls, request, category):
+        if category not in placement_categories:
+            return JsonResponse({'error': 'Category must be one of: ' + ', '.join(placement_categories) + '.'},
+                                status=404)
+
+        location = request.GET.get('location') or None
+        value = request.GET.get('value') or None
+        if location is None and value is None:
+            return JsonResponse({'error': 'A location or value is required.'}, status=400)
+        try:
+            limit = min(int(request.GET.get('limit', PLACEMENT_SEARCH_LIMIT)), PLACEMENT_SEARCH_MAX_LIMIT)
+        except ValueError:
+            return JsonResponse({'error': 'Limit must be a whole number.'}, status=400)
+
+        return JsonResponse({'category': category,
+                             'placements': find_placements(category, location, value, max(limit, 0))})
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ApiBundleView(View):
+    """
+    Stream a ZIP file with the patched ROM, spoiler logs, and seed image of several seeds.
+
+    This is a multipart POST with the vanilla ROM as rom_file, the share IDs separated by
+    whitespace or commas as share_ids, and optionally the same cosmetic fields as the
+    seed download form.  The same cosmetic settings are applied to every seed.
+    """
+    @classmethod
+    def post(cls, request):
+        form = BundleForm(request.POST, request.FILES)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+
+        # Bundles have their own rate limit scope, which takes one token per seed.
+        if conf.RATELIMIT_ENABLED:
+            cost = len(form.cleaned_data['share_ids'])
+            # Waiting would never help a bundle that is bigger than the buckets.
+            if cost > get_max_cost('bundle'):
+                return JsonResponse({'error': f'A bundle can have at most {int(get_max_cost("bundle"))} seeds.'},
+                                    status=413)
+            retry_after = try_admit('bundle', get_client_ip(request), cost)
+            if retry_after:
+                return rate_limited_response(request, retry_after, json=True)
+
+        try:
+            rom_bytes = DownloadSeedView.read_and_validate_rom_file(request.FILES['rom_file'])
+        except InvalidRomException:
+            return JsonResponse({'error': 'You must enter a valid Chrono Trigger ROM file.'}, status=400)
+
+        games = []
+        missing = []
+        for share_id in form.cleaned_data['share_ids']:
+            try:
+                games.append(get_game(share_id))
+            except Game.DoesNotExist:
+                missing.append(share_id)
+        if missing:
+            return JsonResponse({'error': 'Seeds do not exist.', 'share_ids': missing}, status=404)
+
+        # Check this up front since the response can't be changed once the ZIP file starts streaming.
+        for game in games:
+            try:
+                check_replay_version(game)
+            except ReplayVersionException as e:
+                return JsonResponse({'error': str(e), 'share_ids': [game.share_id]}, status=410)
+
+        response = StreamingHttpResponse(stream_bundle(games, form, rom_bytes, get_seed_image),
+                                         content_type='application/zip')
+        response['Content-Disposition'] = 'attachment; filename=%s' % get_bundle_file_name()
+        return response
+
+
+class MysteryOddsView(View):
+    """
+    Report the odds of each mystery seed setting for the mystery weights in the query string.
+    Weights that are left out use their default values.
+    """
+    @classmethod
+    def get(cls, request):
+        defaults = RandomizerInterface.get_default_settings_data()
+        data = {'mystery_seed': True}
+        errors = {}
+        for field in mystery_fields:
+            try:
+                data[field] = int(request.GET.get(field, defaults[field]))
+            except ValueError:
+                errors[field] = ['Enter a whole number.']
+        errors = errors or validate_settings_data(data)
+        if errors:
+            return JsonResponse({'errors': errors}, status=400)
+
+        response = JsonResponse(get_mystery_odds(tuple(data[field] for field in mystery_fields)))
+        # The odds only depend on the query string.
+        response['Cache-Control'] = f'max-age={conf.MYSTERY_ODDS_MAX_AGE}'
+        return response
+
+
+class ReadinessView(View):
+    """
+    Report whether this worker has been warmed up, along with its warm-up timings
+    and memory usage.  The first request warms up a worker that was not preloaded.
+    Responds with 503 if warm-up failed.
+    """
+    @classmethod
+    def get(cls, request):
+        readiness = get_readiness()
+        return JsonResponse(readiness, status=200 if readiness['warm'] else 503)
+
+
+class AdmissionMetricsView(View):
+    """
+    Report the current rate limit and admission control state to staff users and
+    clients in INTERNAL_IPS.
+    """
+    @classmethod
+    def get(cls, request):
+        if not request.user.is_staff and get_client_ip(request) not in conf.INTERNAL_IPS:
+            return JsonResponse({'error': 'Forbidden'}, status=403)
+        return JsonResponse(get_admission_metrics())
+
+
+# Background executor for async API generation jobs.
+job_executor = ThreadPoolExecutor(max_workers=conf.API_JOB_WORKERS)
+
+
+def fail_orphaned_jobs(jobs=None) -> int:
+    """
+    Mark unfinished async jobs as failed.
+
+    Jobs only live in the executor of the worker that queued them, so a job that is
+    still pending or running when its worker exits will never finish.  This is called
+    for every job when the server starts, and for a single job when it is polled after
+    API_JOB_TIMEOUT.
+
+    :param jobs: GenerationJob queryset to check, or None for all jobs
+    :return: Number of jobs marked as failed
+    """
+    jobs = GenerationJob.objects.all() if jobs is None else jobs
+    return jobs.filter(status__in=[GenerationJob.PENDING, GenerationJob.RUNNING]).update(
+        status=GenerationJob.FAILED, error_text='The job was lost before it finished.  Please try again.')
+
+
+def run_generation_job(job_id: str, form: GenerateForm):
+    """
+    Generate a seed for an async API job and record the result on the job.
+
+    :param job_id: Job ID of the GenerationJob to run
+    :param form: Validated GenerateForm with the user's settings
+    """
+    close_old_connections()
+    try:
+        GenerationJob.objects.filter(job_id=job_id).update(status=GenerationJob.RUNNING)
+        game = generate_seed_from_form(form)
+        GenerationJob.objects.filter(job_id=job_id).update(status=GenerationJob.COMPLETE, share_id=game.share_id)
+    except Exception as e:
+        GenerationJob.objects.filter(job_id=job_id).update(status=GenerationJob.FAILED, error_text=str(e))
+    finally:
+        close_old_connections()
+
+
+def get_game_details(request, game: Game) -> dict:
+    """
+    Get the JSON API description of a generated game.
+
+    The seed is the same value that the share page shows.  It is left out (None) for
+    race seeds, whose seed value alone does not identify the game, and for mystery seeds,
+    whose stored settings no longer hold it.
+
+    :param request: Request used to build absolute artifact URLs
+    :param game: Game object to describe
+    :return: Dictionary with the game's share ID, seed, flags, and artifact URLs
+    """
+    settings = pickle.loads(game.get_settings_data())
+    urls = {
+        'share': request.build_absolute_uri(reverse('generator:share', args=[game.share_id])),
+        'practice': request.build_absolute_uri(reverse('generator:practice', args=[game.share_id])),
+        'seed_image': request.build_absolute_uri(reverse('generator:seedimg', args=[game.share_id])),
+        'download': request.build_absolute_uri(reverse('generator:seed')),
+    }
+    if not game.race_seed:
+        urls['spoiler_log'] = request.build_absolute_uri(reverse('generator:spoiler_log', args=[game.share_id]))
+        urls['json_spoiler_log'] = \
+            request.build_absolute_uri(reverse('generator:json_spoiler_log', args=[game.share_id]))
+
+    mystery = rset.GameFlags.MYSTERY in settings.gameflags
+    return {'share_id': game.share_id,
+            'race_seed': game.race_seed,
+            'seed': None if game.race_seed or mystery else settings.seed,
+            'flag_string': RandomizerInterface.get_flag_string(settings),
+            'urls': urls}
+
+
+def get_job_details(request, job: GenerationJob) -> dict:
+    """
+    Get the JSON API description of an async generation job.
+
+    :param request: Request used to build absolute URLs
+    :param job: GenerationJob object to describe
+    :return: Dictionary with the job's status and, once complete, the game details
+    """
+    details = {'job_id': job.job_id,
+               'status': job.status,
+               'url': request.build_absolute_uri(reverse('generator:api_job', args=[job.job_id]))}
+    if job.status == GenerationJob.COMPLETE:
+        details['game'] = get_game_details(request, Game.objects.get(share_id=job.share_id))
+    elif job.status == GenerationJob.FAILED:
+        details['error'] = job.error_text
+    return details
+
+
+def get_patched_rom(game: Game, form: RomForm, rom_bytes: bytearray) -> tuple[bytearray, str]:
+    """
+    Get the patched ROM for a seed with the user's cosmetic choices applied.
+
+    The seed's "base" image is generated once for each combination of cosmetic flags
+    and cached as a patch against the vanilla ROM.  There are only a handful of flag
+    combinations.  The character names and in-game options are free-form, so they are
+    never cached and are layered onto the base image on every request instead.
+
+    :param game: Game object for the seed
+    :param form: RomForm with the user's cosmetic settings
+    :param rom_bytes: Validated vanilla ROM data from the user
+    :return: Tuple of the patched ROM data and its file name
+    """
+    base_settings = pickle.loads(game.get_settings_data())
+    RandomizerInterface.apply_cosmetic_flags(base_settings, form)
+    base_key = f'seeds/{game.share_id}/base_{int(base_settings.cosmetic_flags)}.patch'
+
+    settings = pickle.loads(game.get_settings_data())
+    RandomizerInterface.apply_cosmetic_options(settings, form)
+    file_name = RandomizerInterface.get_rom_file_name(settings, game.share_id)
+
+    base_patch = get_artifact(base_key)
+    if base_patch is not None:
+        base_rom = apply_patch(rom_bytes, base_patch)
+    else:
+        interface = RandomizerInterface(rom_bytes)
+        interface.set_settings_and_config(base_settings, get_config(game))
+        base_rom = interface.generate_rom()
+        put_artifact(base_key, create_patch(rom_bytes, base_rom))
+
+    return RandomizerInterface.apply_cosmetic_layer(base_rom, settings), file_name
+
+
+def get_seed_image(share_id: str) -> bytes:
+    """
+    Draw the random image that represents a seed.
+
+    The image only depends on the share ID.
+
+    :param share_id: Share ID of the seed
+    :return: PNG image data
+    """
+    rgen = random.Random(share_id)
+    img = Image.new('RGB', (200,200))
+    d = ImageDraw.Draw(img)
+    squaresize = 50
+    for x in range(0,200,squaresize):
+        for y in range(0, 200, squaresize):
+            # Draw a square in a random color
+            d.polygon([(x,y),(x+squaresize,y),(x+squaresize,y+squaresize),(x,y+squaresize)],
+                    fill=(rgen.randint(0,31)*8, rgen.randint(0,31)*8, rgen.randint(0,31)*8))
+
+    with io.BytesIO() as f:
+        img.save(f, 'PNG')
+        return f.getvalue()
+
+
+def get_bundle_file_name() -> str:
+    """
+    Get the file name of a seed bundle.
+
+    :return: ZIP file name with the current date and time
+    """
+    return 'ctjot_bundle_' + timezone.now().strftime('%Y%m%d_%H%M%S') + '.zip'
+
+
+def get_options_page() -> dict[str | None, bytes]:
+    """
+    Get the rendered options page and its precompressed variants.
+
+    The page is rendered once per worker, or on every call when DEBUG is set so that
+    template changes show up during development.
+
+    :return: Dictionary of content encoding to page data, as returned by compress_variants
+    """
+    if conf.DEBUG:
+        return _render_options_page.__wrapped__()
+    return _render_options_page()
+
+
+@functools.cache
+def _render_options_page() -> dict[str | None, bytes]:
+    return compress_variants(render_to_string('generator/options.html', {'form': GenerateForm()}).encode())
 
 
-def get_share_id() -> str:
+def get_share_id(model=Game, field: str = 'share_id') -> str:
     """
     Get a unique share ID.
 
+    :param model: Model class the ID must be unique for
+    :param field: Name of the ID field on the model
     :return: A unique share ID string
     """
     id_exists = True
@@ -265,7 +699,10 @@ def get_share_id() -> str:
         # It is possible, though very unlikely to generate a duplicate share ID.
         # Verify this ID doesn't already exist in the database before continuing.
         share_id = nanoid.generate('0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ', 15)
-        id_exists = Game.objects.filter(share_id=share_id).exists()
+        id_exists = model.objects.filter(**{field: share_id}).exists()
+        # Archived games keep their share IDs, so a new game must not reuse one.
+        if model is Game and not id_exists:
+            id_exists = ArchivedGame.objects.filter(share_id=share_id).exists()
     return share_id
 
 
@@ -285,40 +722,93 @@ def generate_seed_from_form(form: GenerateForm) -> Game:
     share_id = get_share_id()
 
     # Store the newly generated config data in the database with its share ID
-    game = Game.objects.create(
+    game = Game.create(
         share_id=share_id,
         race_seed=not form.cleaned_data['spoiler_log'],
         seed_nonce=nonce,
+        randomizer_version=RandomizerInterface.get_randomizer_version(),
         settings=pickle.dumps(interface.get_settings()),
-        configuration=pickle.dumps(interface.get_config()))
+        configuration=get_config_blob(interface.get_settings(), interface.get_config()))
+    index_placements(game, interface.get_config())
 
     return game
 
 
-def generate_seed_from_id(existing_share_id: str) -> Game:
+@functools.lru_cache(maxsize=conf.SETTINGS_CACHE_SIZE)
+def get_cached_settings(share_id: str) -> rset.Settings:
+    """
+    Get the decoded settings object for an existing share ID.
+
+    Settings never change once a game is stored, so the decoded object is cached
+    per worker.  Callers must copy the returned object before modifying it.
+
+    :param share_id: Share ID of an existing seed
+    :return: RandoSettings object for the seed
+    """
+    try:
+        game = get_game(share_id)
+    except Game.DoesNotExist:
+        raise InvalidGameIdException("Share ID " + share_id + " does not exist.")
+    return pickle.loads(game.get_settings_data())
+
+
+def claim_pooled_practice_seed(existing_share_id: str) -> Game | None:
+    """
+    Claim a pre-generated practice seed from the pool for the given parent seed.
+
+    :param existing_share_id: Share ID of the parent seed
+    :return: Claimed Game object, or None if the pool is empty
+    """
+    candidates = Game.objects.filter(parent_share_id=existing_share_id, pooled=True).values_list('id', flat=True)
+    for game_id in candidates[:conf.PRACTICE_POOL_CLAIM_ATTEMPTS]:
+        # Another worker may claim the same seed.  Only the update that actually
+        # changes the row wins.
+        if Game.objects.filter(id=game_id, pooled=True).update(pooled=False, creation_date=timezone.now()):
+            game = Game.objects.get(id=game_id)
+            # Pooled seeds are not indexed until they are handed out.
+            try:
+                index_placements(game, get_config(game))
+            except ReplayVersionException:
+                pass
+            return game
+    return None
+
+
+def generate_seed_from_id(existing_share_id: str, pooled: bool = False) -> Game:
     """
     Generate a new game object from an existing share ID with identical
     settings and a new seed value.
 
+    A pre-generated practice seed is handed out instead when one is available
+    in the pool for the existing share ID.
+
     :param existing_share_id: Share ID of an existing seed
+    :param pooled: Whether the new game is being added to the practice pool
     :return: Game object that has been created and stored in the database
     """
-    try:
-        existing_game = Game.objects.get(share_id=existing_share_id)
-    except Game.DoesNotExist:
-        raise InvalidGameIdException("Share ID " + existing_share_id + " does not exist.")
+    settings = copy.deepcopy(get_cached_settings(existing_share_id))
+
+    if not pooled:
+        new_game = claim_pooled_practice_seed(existing_share_id)
+        if new_game is not None:
+            return new_game
 
     new_share_id = get_share_id()
     interface = RandomizerInterface(RandomizerInterface.get_base_rom())
     # Currently only used for practice seeds, so force race mode to False.
-    nonce = interface.configure_seed_from_settings(pickle.loads(existing_game.settings), False)
+    nonce = interface.configure_seed_from_settings(settings, False)
 
-    new_game = Game.objects.create(
+    new_game = Game.create(
         share_id=new_share_id,
         race_seed=False,
         seed_nonce=nonce,
+        parent_share_id=existing_share_id,
+        pooled=pooled,
+        randomizer_version=RandomizerInterface.get_randomizer_version(),
         settings=pickle.dumps(interface.get_settings()),
-        configuration=pickle.dumps(interface.get_config())
+        configuration=get_config_blob(interface.get_settings(), interface.get_config())
     )
+    if not pooled:
+        index_placements(new_game, interface.get_config())
 
     return new_game
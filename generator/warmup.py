@@ -0,0 +1,187 @@
+# Django libraries
+from django.conf import settings as conf
+
+# Python standard libraries
+import os
+import resource
+import threading
+import time
+import traceback
+
+
+#
+# Process warm-up.
+#
+# The randomizer loads its modules, the vanilla ROM, names.txt, and its pickled data
+# lazily, which makes the first requests handled by a fresh worker slow.  When gunicorn
+# runs with preload_app (see deploy/gunicorn.conf.py), warm_up is called in the master
+# process before the workers are forked so that every worker starts with this state
+# already loaded and shares its memory pages copy-on-write.
+#
+# Without the gunicorn hook (runserver, tests, other servers), warm-up runs on the first
+# call to the readiness endpoint instead.
+#
+
+PROCESS_START = time.monotonic()
+
+warm_state = {
+    'started': False,
+    'warm': False,
+    'error': None,
+    'warmup_seconds': None,
+    'steps': {},
+    'worker_start': PROCESS_START
+}
+
+
+# Imports are done inside the steps so that loading the randomizer modules is part
+# of the timings.
+def _load_randomizer():
+    from .randomizerinterface import RandomizerInterface
+    RandomizerInterface.get_randomizer_version()
+    RandomizerInterface.get_default_settings_data()
+
+
+def _load_base_rom():
+    from .randomizerinterface import RandomizerInterface
+    RandomizerInterface.get_base_rom()
+
+
+def _load_seed_names():
+    from .randomizerinterface import RandomizerInterface
+    RandomizerInterface.get_random_seed()
+
+
+def _load_randomizer_data():
+    # Generating a throwaway config pulls in the randomizer's pickled data and anything
+    # else it loads on first use.  This runs in-process even when the generation sandbox
+    # is enabled, since the point is to load the data into this process.
+    from .randomizerinterface import RandomizerInterface
+    interface = RandomizerInterface(RandomizerInterface.get_base_rom())
+    interface.randomizer.settings = RandomizerInterface.convert_data_to_settings(
+        {**RandomizerInterface.get_default_settings_data(), 'seed': 'warmup'})
+    interface.randomizer.set_random_config()
+
+
+def _render_options_page():
+    from .views import get_options_page
+    get_options_page()
+
+
+# Warm-up steps, in order.  Each step is timed separately.
+warmup_steps = (
+    ('randomizer', _load_randomizer),
+    ('base_rom', _load_base_rom),
+    ('seed_names', _load_seed_names),
+    ('randomizer_data', _load_randomizer_data),
+    ('options_page', _render_options_page)
+)
+
+
+def warm_up() -> dict:
+    """
+    Load the randomizer and its data into this process.
+
+    Failures are recorded in the warm state rather than raised so that a missing
+    file does not stop the server from starting.  The readiness endpoint reports it.
+
+    :return: The warm state dictionary
+    """
+    warm_state['started'] = True
+    start = time.monotonic()
+    for name, step in warmup_steps:
+        if name == 'randomizer_data' and not conf.WARMUP_GENERATE_SEED:
+            continue
+        step_start = time.monotonic()
+        try:
+            step()
+        except Exception:
+            warm_state['error'] = f'Warm-up step "{name}" failed:\n' + traceback.format_exc()
+            return warm_state
+        warm_state['steps'][name] = round(time.monotonic() - step_start, 3)
+
+    warm_state['warmup_seconds'] = round(time.monotonic() - start, 3)
+    warm_state['warm'] = True
+    return warm_state
+
+
+_warmup_lock = threading.Lock()
+
+
+def ensure_warm() -> dict:
+    """
+    Warm up this process if that has not been done yet, such as when the server did
+    not run the gunicorn on_starting hook.  A failed warm-up is not retried.
+
+    :return: The warm state dictionary
+    """
+    with _warmup_lock:
+        if not warm_state['started']:
+            warm_up()
+    return warm_state
+
+
+def mark_worker_started():
+    """
+    Record the start time of a forked worker process.
+    """
+    warm_state['worker_start'] = time.monotonic()
+
+
+def get_rss() -> int:
+    """
+    Get the current RSS of this process cheaply enough to call on every request.
+
+    :return: RSS in bytes
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, IndexError, ValueError):
+        # No /proc, fall back to the peak RSS.  ru_maxrss is in kilobytes on Linux.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def get_memory_usage() -> dict[str, int]:
+    """
+    Get the memory usage of this process.
+
+    The shared size counts pages that are also mapped by other processes, including
+    pages inherited copy-on-write from the gunicorn master.  The proportional set size
+    (PSS) splits shared pages evenly between the processes using them, so summing it
+    over the workers gives their real combined footprint.
+
+    :return: Dictionary with rss_bytes, pss_bytes and shared_bytes (the latter two are
+             None if the platform does not report them)
+    """
+    try:
+        with open('/proc/self/smaps_rollup') as smaps:
+            fields = {line.split(':')[0]: int(line.split()[1]) * 1024 for line in smaps if line.endswith('kB\n')}
+        return {'rss_bytes': fields['Rss'],
+                'pss_bytes': fields['Pss'],
+                'shared_bytes': fields['Shared_Clean'] + fields['Shared_Dirty']}
+    except (OSError, KeyError):
+        # No /proc, fall back to the peak RSS.  ru_maxrss is in kilobytes on Linux.
+        return {'rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+                'pss_bytes': None,
+                'shared_bytes': None}
+
+
+def get_readiness() -> dict:
+    """
+    Get the warm status of this process for the readiness endpoint, warming it up
+    first if needed.
+
+    :return: Dictionary of warm status, warm-up timings, and memory usage
+    """
+    ensure_warm()
+    return {
+        'warm': warm_state['warm'],
+        'error': warm_state['error'],
+        'pid': os.getpid(),
+        'warmup_seconds': warm_state['warmup_seconds'],
+        'steps': warm_state['steps'],
+        'process_uptime_seconds': round(time.monotonic() - PROCESS_START, 3),
+        'worker_uptime_seconds': round(time.monotonic() - warm_state['worker_start'], 3),
+        **get_memory_usage()
+    }
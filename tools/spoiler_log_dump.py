@@ -14,6 +14,12 @@ sys.path.append('/home/ctjot/web/jetsoftime/sourcefiles')
 
 import randomizer
 
+# Game data may be stored inline or in the content-addressed blob table.
+GAME_QUERY = "SELECT g.share_id, COALESCE(g.settings, s.data), COALESCE(g.configuration, c.data), " \
+             "g.creation_date, g.race_seed FROM generator_game g " \
+             "LEFT JOIN generator_blob s ON g.settings_blob_id = s.digest " \
+             "LEFT JOIN generator_blob c ON g.configuration_blob_id = c.digest"
+
 
 def create_connection() -> sqlite3.Connection:
     """
@@ -47,7 +53,7 @@ def get_seed_list(conn: sqlite3.Connection, count: int = 5):
     :param count: Number of seeds to list
     """
     cur = conn.cursor()
-    cur.execute("SELECT * FROM generator_game ORDER BY id DESC LIMIT " + str(count))
+    cur.execute(GAME_QUERY + " ORDER BY g.id DESC LIMIT " + str(count))
 
     rows = cur.fetchall()
 
@@ -55,11 +61,14 @@ def get_seed_list(conn: sqlite3.Connection, count: int = 5):
         rom = bytearray(infile.read())
 
     for row in reversed(rows):
-        share_id = row[1]
-        creation_time = row[4]
-        race_seed = row[5]
-        settings = pickle.loads(row[2])
-        config = pickle.loads(row[3])
+        share_id = row[0]
+        creation_time = row[3]
+        race_seed = row[4]
+        settings = pickle.loads(row[1])
+        if row[2] is None:
+            print(f'share_id: {share_id} was stored in replay mode, skipping')
+            continue
+        config = pickle.loads(row[2])
         rando = randomizer.Randomizer(rom, True, settings, config)
         buffer = io.StringIO()
         print(f'share_id: {share_id}, created: {creation_time}, race_seed: {race_seed}')
@@ -76,7 +85,7 @@ def dump_spoiler_log(conn: sqlite3.Connection, share_id: str):
     :param share_id: share id of the seed in question
     """
     cur = conn.cursor()
-    cur.execute("SELECT * FROM generator_game WHERE share_id ='" + share_id + "'")
+    cur.execute(GAME_QUERY + " WHERE g.share_id ='" + share_id + "'")
 
     rows = cur.fetchall()
 
@@ -84,8 +93,11 @@ def dump_spoiler_log(conn: sqlite3.Connection, share_id: str):
         rom = bytearray(infile.read())
 
     for row in rows:
-        settings = pickle.loads(row[2])
-        config = pickle.loads(row[3])
+        settings = pickle.loads(row[1])
+        if row[2] is None:
+            print(f'share_id: {share_id} was stored in replay mode and has no stored config')
+            continue
+        config = pickle.loads(row[2])
         rando = randomizer.Randomizer(rom, True, settings, config)
         output = io.StringIO()
         rando.write_spoiler_log(output)